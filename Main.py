@@ -1,10 +1,26 @@
+import argparse
+from pathlib import Path
+
 from src.gui import WeatherApp
 from src.data_handler import DataHandler
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="WeatherVision Pro+")
+    parser.add_argument("--profile", type=Path, metavar="DIR",
+                        help="write cProfile and tracemalloc results for each action to DIR")
+    args = parser.parse_args()
+    
     # Initialize data files
     DataHandler.init_files()
     
+    profiler = None
+    if args.profile:
+        from src.profiling import ActionProfiler
+        profiler = ActionProfiler(args.profile)
+    
     # Create and run application
-    app = WeatherApp()
-    app.mainloop()
\ No newline at end of file
+    app = WeatherApp(profiler=profiler)
+    app.mainloop()
+    if profiler:
+        profiler.close()
+        print(f"Profile summary: {args.profile / 'summary.txt'}")
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""Air quality refresh throughput against the local mock server.
+
+Two parts: AQI for N rows computed by compute_aqi in one pass versus a
+per-row loop over the same breakpoint tables, and a full
+AirQualityService.refresh of many synthetic locations at several
+concurrency levels. The first refresh of each level geocodes its
+locations; a second pass uses the cached coordinates.
+
+    python -m benchmarks.bench_air_quality --locations 300 --latency lognormal:80:0.5
+    python -m benchmarks.bench_air_quality --output air.json
+    python -m benchmarks.bench_air_quality --baseline air.json --max-regression 0.2
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks import report
+from benchmarks.mock_owm import MockOWM, use_api_root
+from src.air_quality import BREAKPOINTS, INDEX_BANDS, TRUNCATE, UNIT_FACTORS, AirQualityService, compute_aqi
+from src.quota import QuotaManager
+from src.weather_api import WeatherAPI
+
+
+def row_aqi(values: dict) -> float:
+    """One row at a time, the way a loop over readings would do it"""
+    best = -1
+    for name, table in BREAKPOINTS.items():
+        c = values[name] * UNIT_FACTORS.get(name, 1.0)
+        scale = 10 ** TRUNCATE[name]
+        c = int(c * scale + 1e-9) / scale
+        index = 500
+        for (c_lo, c_hi), (i_lo, i_hi) in zip(table, INDEX_BANDS.tolist()):
+            if c <= c_hi:
+                index = round((i_hi - i_lo) / (c_hi - c_lo) * (max(c, c_lo) - c_lo) + i_lo)
+                break
+        best = max(best, index)
+    return best
+
+
+def drop_air_quality_cache():
+    import src.weather_api as weather_api
+    with WeatherAPI._cache_lock:
+        for key in [key for key in WeatherAPI._cache if key[0] == weather_api.AIR_QUALITY_URL]:
+            del WeatherAPI._cache[key]
+
+
+def bench_aqi(rows: int) -> dict:
+    rng = np.random.default_rng(1)
+    columns = {name: rng.uniform(0, table[-1][1] / UNIT_FACTORS.get(name, 1.0), rows)
+               for name, table in BREAKPOINTS.items()}
+    started = time.perf_counter()
+    aqi, _ = compute_aqi(columns)
+    vectorized = time.perf_counter() - started
+    records = [{name: float(columns[name][i]) for name in BREAKPOINTS} for i in range(rows)]
+    started = time.perf_counter()
+    looped = [row_aqi(record) for record in records]
+    per_row = time.perf_counter() - started
+    assert aqi.tolist() == looped
+    return {"rows": rows, "vectorized_ms": round(vectorized * 1000, 3), "per_row_ms": round(per_row * 1000, 3),
+            "rows_per_s": round(rows / vectorized, 1), "speedup": round(per_row / vectorized, 1)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="rows for the AQI computation")
+    parser.add_argument("--locations", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 16, 32])
+    parser.add_argument("--latency", default="lognormal:50:0.5",
+                        help="mock latency: fixed:MS, uniform:LO:HI or lognormal:MEDIAN_MS:SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output", type=Path, help="save results as JSON")
+    parser.add_argument("--baseline", type=Path, help="compare against an earlier --output file")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    aqi = bench_aqi(args.rows)
+    print(f"AQI for {aqi['rows']} rows: {aqi['vectorized_ms']:.1f} ms vectorized, "
+          f"{aqi['per_row_ms']:.1f} ms per row ({aqi['speedup']:.0f}x)")
+
+    QuotaManager._default = QuotaManager(limits=(("minute", 1e9, 60),))
+    results = {}
+    with MockOWM(latency=args.latency, error_rate=args.error_rate, seed=1) as mock, \
+            tempfile.TemporaryDirectory() as scratch:
+        use_api_root(mock.root)
+        for concurrency in args.concurrency:
+            cities = [f"Air City {concurrency}-{i}" for i in range(args.locations)]
+            service = AirQualityService(Path(scratch) / f"c{concurrency}.csv", concurrency=concurrency)
+            for case in ("cold", "cached"):
+                # Pollution responses are cached too; only coordinates should carry over
+                drop_air_quality_cache()
+                summary = service.refresh(cities)
+                results[f"{case}_concurrency_{concurrency}"] = {
+                    "locations": len(summary["rows"]), "failed": len(summary["failed"]),
+                    "elapsed_s": summary["elapsed_s"], "locations_per_s": summary["locations_per_s"]}
+
+    print(f"\n{'case':<26}{'stored':>8}{'failed':>8}{'seconds':>9}{'loc/s':>9}")
+    for name, r in results.items():
+        print(f"{name:<26}{r['locations']:>8}{r['failed']:>8}{r['elapsed_s']:>9.2f}{r['locations_per_s']:>9.1f}")
+    results["aqi"] = aqi
+
+    params = vars(args).copy()
+    params.pop("output"), params.pop("baseline")
+    if args.output:
+        report.save(args.output, results, params)
+    if args.baseline:
+        regressions = report.compare(results, report.load(args.baseline), args.max_regression,
+                                     ("locations_per_s", "rows_per_s"))
+        if regressions:
+            print("Regressed: " + ", ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
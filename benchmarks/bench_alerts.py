@@ -0,0 +1,83 @@
+"""Alert engine throughput: python -m benchmarks.bench_alerts --cities 10000"""
+import argparse
+import random
+import time
+
+from src.alerts import AlertEngine
+from src.models import ObservationBatch
+
+CONDITIONS = ["Clear", "Clouds", "Rain", "Thunderstorm", "Snow", "Extreme", "Haze"]
+
+
+def make_payloads(n: int, seed: int = 1) -> list:
+    """Random payloads; like OpenWeatherMap's, readings have two decimals"""
+    rng = random.Random(seed)
+    return [
+        {
+            'main': {'temp': round(rng.uniform(-10, 45), 2), 'humidity': rng.randint(5, 100)},
+            'weather': [{'main': rng.choice(CONDITIONS)}],
+            'wind': {'speed': round(rng.uniform(0, 20), 2)}
+        }
+        for _ in range(n)
+    ]
+
+
+def legacy_check(data: dict) -> list:
+    """The per-payload checks WeatherApp used to run"""
+    alerts = []
+    temp = data['main']['temp']
+    if temp > 35:
+        alerts.append(f"High temperature warning: {temp}°C")
+    elif temp < 5:
+        alerts.append(f"Low temperature warning: {temp}°C")
+    condition = data['weather'][0]['main']
+    if condition in ['Thunderstorm', 'Extreme']:
+        alerts.append(f"Weather alert: {condition}")
+    wind_speed = data['wind']['speed']
+    if wind_speed > 10:
+        alerts.append(f"High wind warning: {wind_speed} m/s")
+    return alerts
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = AlertEngine.default()
+    payloads = make_payloads(args.cities)
+    # WeatherService.poll parses once and shares the batch with history logging
+    batch = ObservationBatch.from_payloads(payloads)
+    evaluations = args.cities * len(engine.rules)
+
+    # End to end, formatted messages out. Raw payloads are parsed into
+    # Observations first; the batch row is the poll path, where that parse
+    # is already done for logging
+    results = {
+        "parse + evaluate (payloads)": best_of(lambda: engine.evaluate(payloads), args.repeat),
+        "evaluate (ObservationBatch)": best_of(lambda: engine.evaluate(batch), args.repeat),
+        "alerts (ObservationBatch)": best_of(lambda: engine.alerts(batch), args.repeat),
+        "legacy per-payload loop": best_of(lambda: [legacy_check(p) for p in payloads], args.repeat),
+    }
+
+    print(f"{args.cities} observations x {len(engine.rules)} rules")
+    for name, seconds in results.items():
+        rate = evaluations / (seconds * 1000)
+        print(f"{name:28s} {seconds * 1000:9.3f} ms  {rate:12.0f} evaluations/ms")
+    legacy = results["legacy per-payload loop"]
+    for name in ("parse + evaluate (payloads)", "evaluate (ObservationBatch)"):
+        print(f"{name} vs legacy: {legacy / results[name]:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
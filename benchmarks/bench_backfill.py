@@ -0,0 +1,87 @@
+"""Backfill throughput against the local mock server.
+
+Runs BackfillJob for synthetic cities over a date range at several
+concurrency levels, each into a fresh history file and checkpoint, and
+reports chunks/s and rows/s. The resume case reruns the last job and
+should finish without a single request.
+
+    python -m benchmarks.bench_backfill --cities 20 --days 90 --latency lognormal:80:0.5
+    python -m benchmarks.bench_backfill --output backfill.json
+    python -m benchmarks.bench_backfill --baseline backfill.json --max-regression 0.2
+"""
+import argparse
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from benchmarks import report
+from benchmarks.mock_owm import MockOWM, use_api_root
+from src.backfill import BackfillJob, Checkpoint
+from src.quota import QuotaManager
+
+
+def use_data_dir(directory: Path):
+    """Send history and daily stats to a scratch directory"""
+    import config
+    import src.daily_stats as daily_stats
+    import src.data_handler as data_handler
+    from src.daily_stats import DailyStats
+    for module in (config, daily_stats, data_handler):
+        for name in ("WEATHER_HISTORY", "DAILY_STATS"):
+            if hasattr(module, name):
+                setattr(module, name, directory / getattr(config, name).name)
+    DailyStats._table = None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=10)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--latency", default="lognormal:50:0.5",
+                        help="mock latency: fixed:MS, uniform:LO:HI or lognormal:MEDIAN_MS:SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output", type=Path, help="save results as JSON")
+    parser.add_argument("--baseline", type=Path, help="compare against an earlier --output file")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    QuotaManager._default = QuotaManager(limits=(("minute", 1e9, 60),))
+    end = datetime(2025, 6, 1)
+    start = end - timedelta(days=args.days)
+    cities = [f"Backfill City {i}" for i in range(args.cities)]
+    results = {}
+    with MockOWM(latency=args.latency, error_rate=args.error_rate, seed=1) as mock, \
+            tempfile.TemporaryDirectory() as scratch:
+        use_api_root(mock.root)
+        for concurrency in args.concurrency:
+            directory = Path(scratch) / f"c{concurrency}"
+            directory.mkdir()
+            use_data_dir(directory)
+            checkpoint = Checkpoint(directory / "checkpoint.jsonl")
+            summary = BackfillJob(cities, start, end, concurrency=concurrency, checkpoint=checkpoint,
+                                  retry_delay=0.1).run()
+            results[f"concurrency_{concurrency}"] = summary
+        results["resume"] = BackfillJob(cities, start, end, checkpoint=checkpoint).run()
+
+    print(f"{'case':<16}{'chunks':>8}{'failed':>8}{'rows':>9}{'seconds':>9}{'chunks/s':>10}{'rows/s':>10}")
+    for name, r in results.items():
+        print(f"{name:<16}{r['fetched']:>8}{r['failed']:>8}{r['rows']:>9}{r['elapsed_s']:>9.2f}"
+              f"{r['chunks_per_s']:>10.1f}{r['rows_per_s']:>10.0f}")
+
+    params = vars(args).copy()
+    params.pop("output"), params.pop("baseline")
+    if args.output:
+        report.save(args.output, results, params)
+    if args.baseline:
+        regressions = report.compare(results, report.load(args.baseline), args.max_regression,
+                                     ("chunks_per_s", "rows_per_s"))
+        if regressions:
+            print("Regressed: " + ", ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+"""DataHandler cost across history sizes.
+
+Generates a synthetic multi-city weather_history.csv per size, then times
+each operation (best of --repeat) and measures its peak Python allocation
+with tracemalloc in a separate run so tracing does not skew the timings.
+Files are restored from a pristine copy before every run. Like a real
+history file, older rows are stamped with microseconds and recent ones
+from the observation time (dt) without; reads and clears must return the
+rows the file actually holds, or the run fails.
+
+    python -m benchmarks.bench_data_handler --sizes 1e3,1e4,1e5 --output dh.json
+    python -m benchmarks.bench_data_handler --sizes 1e3,1e4,1e5 --baseline dh.json --max-regression 0.25
+
+Sizes up to 1e7 work but need several GB of disk and RAM. Excel export is
+skipped above 1,048,575 rows, the most a worksheet can hold.
+"""
+import argparse
+import itertools
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import report
+
+CITIES = [
+    ("Islamabad", 22, 11), ("Lahore", 25, 12), ("Karachi", 27, 5), ("Peshawar", 23, 11),
+    ("Quetta", 16, 12), ("Multan", 26, 12), ("Jacobabad", 29, 11), ("Gilgit", 13, 12),
+    ("London", 11, 6), ("Paris", 12, 7), ("Berlin", 10, 9), ("Madrid", 15, 8),
+    ("Moscow", 6, 14), ("Cairo", 22, 6), ("Dubai", 28, 6), ("Mumbai", 27, 3),
+    ("Delhi", 25, 10), ("Beijing", 13, 14), ("Tokyo", 16, 9), ("Singapore", 27, 1),
+    ("Sydney", 18, 5), ("Toronto", 8, 14), ("New York", 13, 11), ("Chicago", 10, 14),
+    ("Los Angeles", 18, 4), ("Mexico City", 16, 3), ("Sao Paulo", 20, 3), ("Lagos", 27, 2),
+    ("Nairobi", 18, 2), ("Reykjavik", 4, 5),
+]
+COLUMNS = ["city", "temp", "humidity", "conditions", "pressure", "wind_speed", "visibility", "timestamp"]
+CHUNK = 1_000_000
+EXCEL_MAX_ROWS = 1_048_575
+# Timestamps in the file are naive local times; row times are seconds since this
+EPOCH = datetime(1970, 1, 1)
+# Share of the most recent rows stamped from dt, as observed_at and insert_history do
+DT_STAMPED = 0.25
+# Observation times for logged sample payloads, unique so none is dropped as a repeat
+_sample_dt = itertools.count(int(time.time()) - 86400)
+
+
+def generate_history(path: Path, rows: int, days: int = 365, seed: int = 0,
+                     end: datetime = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Write `rows` plausible observations spread over the last `days` days.
+
+    Each city gets its own mean temperature and seasonal swing plus a daily
+    cycle and noise; conditions follow temperature and humidity. Returns
+    every row's time (seconds since EPOCH, oldest first) and city.
+    """
+    rng = np.random.default_rng(seed)
+    end = end or datetime.now()
+    start_ts = (end - timedelta(days=days) - EPOCH).total_seconds()
+    span = days * 86400
+    dt_from = start_ts + span * (1 - DT_STAMPED)
+    times, cities = [], []
+    names = np.array([c[0] for c in CITIES], dtype=object)
+    means = np.array([c[1] for c in CITIES], dtype=float)
+    swings = np.array([c[2] for c in CITIES], dtype=float)
+
+    header = True
+    for offset in range(0, rows, CHUNK):
+        n = min(CHUNK, rows - offset)
+        # Evenly spaced in time so every chunk continues where the last ended
+        ts = start_ts + (np.arange(offset, offset + n) + rng.random(n)) * (span / rows)
+        idx = rng.integers(0, len(CITIES), n)
+        day_of_year = (ts / 86400) % 365.25
+        hour = (ts / 3600) % 24
+        temp = (means[idx] + swings[idx] * np.sin(2 * np.pi * (day_of_year - 110) / 365.25)
+                + 4 * np.sin(2 * np.pi * (hour - 9) / 24) + rng.normal(0, 2, n))
+        humidity = np.clip(70 - (temp - 15) * 1.2 + rng.normal(0, 12, n), 5, 100).round()
+        conditions = np.select(
+            [temp < 0, humidity > 85, humidity > 70, rng.random(n) < 0.02],
+            ["Snow", "Rain", "Clouds", "Thunderstorm"], "Clear").astype(object)
+        stamps = pd.to_datetime(ts, unit="s")
+        frame = pd.DataFrame({
+            "city": names[idx],
+            "temp": temp.round(2),
+            "humidity": humidity.astype(int),
+            "conditions": conditions,
+            "pressure": (1013 + rng.normal(0, 8, n)).round().astype(int),
+            "wind_speed": np.abs(rng.normal(3.5, 2.5, n)).round(2),
+            "visibility": np.clip(rng.normal(9, 2, n), 0.1, 10).round(1),
+            "timestamp": np.where(ts >= dt_from, stamps.strftime("%Y-%m-%dT%H:%M:%S"),
+                                  stamps.strftime("%Y-%m-%dT%H:%M:%S.%f")),
+        }, columns=COLUMNS)
+        frame.to_csv(path, mode="w" if header else "a", header=header, index=False)
+        header = False
+        times.append(ts)
+        cities.append(names[idx])
+    return np.concatenate(times), np.concatenate(cities)
+
+
+def rows_within(times: np.ndarray, days: int, now: datetime) -> int:
+    """Rows no older than days at the given moment"""
+    cutoff = (now - timedelta(days=days) - EPOCH).total_seconds()
+    return len(times) - int(np.searchsorted(times, cutoff))
+
+
+def expect_rows(times: np.ndarray, days: int):
+    """Check that an operation returned (or kept) the rows within days; the
+    cutoff moves while it runs, so anything between the two counts passes"""
+    def check(result, started: datetime, finished: datetime):
+        count = len(result) if isinstance(result, pd.DataFrame) else result
+        low, high = rows_within(times, days, finished), rows_within(times, days, started)
+        if not low <= count <= high:
+            raise AssertionError(f"returned {count} rows, expected {low}..{high}")
+    return check
+
+
+def use_data_dir(root: Path):
+    """Point DataHandler and DailyStats at files under root"""
+    import config
+    import src.daily_stats as daily_stats
+    import src.data_handler as data_handler
+    paths = {
+        "SAVED_LOCATIONS": root / "saved_locations.json",
+        "WEATHER_HISTORY": root / "weather_history.csv",
+        "DAILY_STATS": root / "daily_stats.json",
+        "BACKUP_DIR": root / "backups",
+    }
+    for module in (config, data_handler, daily_stats):
+        for name, value in paths.items():
+            if hasattr(module, name):
+                setattr(module, name, value)
+    daily_stats.DailyStats._table = None
+    return paths
+
+
+def sample_payload(i: int) -> dict:
+    return {"dt": next(_sample_dt), "main": {"temp": 20.5 + i % 10, "humidity": 40, "pressure": 1012},
+            "weather": [{"main": "Clear"}], "wind": {"speed": 3.1}, "visibility": 10000}
+
+
+def operations(rows: int, times: np.ndarray, cities: np.ndarray):
+    """name -> (operation, result check or None)"""
+    from src.data_handler import DataHandler
+    # Logging is write-behind; flush so the commit is part of the measurement
+    ops = {
+        "log_weather": (lambda: (DataHandler.log_weather("Lahore", sample_payload(0)),
+                                 DataHandler.flush_history()), None),
+        "log_weather_many_100": (lambda: (DataHandler.log_weather_many(
+            [(CITIES[i % len(CITIES)][0], sample_payload(i)) for i in range(100)]),
+            DataHandler.flush_history()), None),
+        "get_weather_history": (lambda: DataHandler.get_weather_history(), expect_rows(times, 30)),
+        "get_weather_history_city": (lambda: DataHandler.get_weather_history("Lahore", days=7),
+                                     expect_rows(times[cities == "Lahore"], 7)),
+        "clear_history": (lambda: DataHandler.clear_history(days=30), expect_rows(times, 30)),
+        "create_backup": (lambda: DataHandler.create_backup(), None),
+    }
+    if rows <= EXCEL_MAX_ROWS:
+        ops["export_to_excel"] = (lambda: DataHandler.export_to_excel(), None)
+    return ops
+
+
+def measure(fn, check, restore, repeat: int):
+    """(best seconds, peak MB) for one operation"""
+    times = []
+    for _ in range(repeat):
+        restore()
+        started = datetime.now()
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+        if check:
+            check(result, started, datetime.now())
+    restore()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak / 2 ** 20
+
+
+def bench_size(rows: int, work: Path, repeat: int, only=None) -> dict:
+    from src.daily_stats import DailyStats
+    paths = use_data_dir(work)
+    paths["BACKUP_DIR"].mkdir(parents=True, exist_ok=True)
+    pristine = work / "pristine.csv"
+
+    start = time.perf_counter()
+    times, cities = generate_history(pristine, rows)
+    print(f"generated {rows:,} rows ({pristine.stat().st_size / 2 ** 20:.1f} MB) "
+          f"in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+    shutil.copyfile(pristine, paths["WEATHER_HISTORY"])
+    DailyStats.rebuild()
+    stats_snapshot = work / "pristine_stats.json"
+    shutil.copyfile(paths["DAILY_STATS"], stats_snapshot)
+
+    def restore():
+        shutil.copyfile(pristine, paths["WEATHER_HISTORY"])
+        shutil.copyfile(stats_snapshot, paths["DAILY_STATS"])
+        paths["DAILY_STATS"].with_suffix(".journal").unlink(missing_ok=True)
+        # The app keeps the table loaded, so time operations against a warm one
+        DailyStats._table = None
+        DailyStats._load()
+        for old in paths["BACKUP_DIR"].iterdir():
+            old.unlink()
+
+    results = {}
+    for name, (fn, check) in operations(rows, times, cities).items():
+        if only and name not in only:
+            continue
+        seconds, peak_mb = measure(fn, check, restore, repeat if rows <= 100_000 else 1)
+        results[f"{name}@{rows}"] = {"rows": rows, "seconds": round(seconds, 5), "peak_mb": round(peak_mb, 2)}
+        print(f"{name:<26}{rows:>12,}{seconds * 1000:>12.2f} ms{peak_mb:>10.1f} MB")
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1e3,1e4,1e5", help="comma separated row counts, e.g. 1e3,1e6")
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs per operation (sizes up to 1e5)")
+    parser.add_argument("--ops", help="comma separated subset of operations")
+    parser.add_argument("--output", type=Path, help="save results as JSON")
+    parser.add_argument("--baseline", type=Path, help="compare against an earlier --output file")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="fail when time or peak memory grows by more than this share")
+    args = parser.parse_args()
+
+    sizes = [int(float(s)) for s in args.sizes.split(",")]
+    only = set(args.ops.split(",")) if args.ops else None
+    print(f"{'operation':<26}{'rows':>12}{'time':>15}{'peak':>13}")
+    results = {}
+    for rows in sizes:
+        with tempfile.TemporaryDirectory(prefix="bench_dh_") as tmp:
+            results.update(bench_size(rows, Path(tmp), args.repeat, only))
+
+    params = {"sizes": sizes, "repeat": args.repeat}
+    if args.output:
+        report.save(args.output, results, params)
+    if args.baseline:
+        regressions = report.compare(results, report.load(args.baseline), args.max_regression,
+                                     ("seconds", "peak_mb"))
+        if regressions:
+            print("Regressed: " + ", ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
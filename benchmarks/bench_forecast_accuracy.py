@@ -0,0 +1,115 @@
+"""Forecast verification cost: catching up on a long backlog, then daily updates.
+
+Writes a synthetic snapshot file (CITIES x DAYS, eight forecasts a day
+of 40 slots each) and an hourly history CSV straight to disk. Then it
+times ForecastAccuracy.update: first over the whole backlog, then once
+per extra day after that day's snapshots and history have been
+appended. Daily updates should stay flat however long the backlog is,
+because neither file is rescanned.
+
+    python -m benchmarks.bench_forecast_accuracy --cities 300 --days 30
+    python -m benchmarks.bench_forecast_accuracy --output accuracy.json
+    python -m benchmarks.bench_forecast_accuracy --baseline accuracy.json --max-regression 0.2
+"""
+import argparse
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks import report
+from src.forecast_store import FIELDS, HEADER, MAGIC, RECORD, VERSION, ForecastAccuracy, ForecastStore
+from src.history_writer import HISTORY_COLUMNS
+
+START = int(datetime(2025, 1, 1).timestamp())
+DAY = 86400
+
+
+def snapshots(cities: int, first_day: int, days: int, rng) -> np.ndarray:
+    issued = START + np.arange(first_day * 8, (first_day + days) * 8) * 3 * 3600
+    city, issue, slot = np.meshgrid(np.arange(cities), issued, np.arange(1, 41), indexing="ij")
+    records = np.zeros(city.size, dtype=RECORD)
+    records["city"], records["issued"] = city.ravel(), issue.ravel()
+    records["valid"] = issue.ravel() + slot.ravel() * 3 * 3600
+    for field in FIELDS:
+        records[field] = 20 + rng.normal(0, 1 + slot.ravel() / 10)
+    return records
+
+
+def history_text(cities: int, first_day: int, days: int) -> str:
+    hours = START + np.arange(first_day * 24, (first_day + days) * 24) * 3600
+    stamps = [datetime.fromtimestamp(h).isoformat() for h in hours.tolist()]
+    return "".join(f"City {c},20,20,Clear,20,20,10,{stamp}\n" for stamp in stamps for c in range(cities))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=300)
+    parser.add_argument("--days", type=int, default=30, help="backlog before the first update")
+    parser.add_argument("--increments", type=int, default=5, help="days added one at a time afterwards")
+    parser.add_argument("--output", type=Path, help="save results as JSON")
+    parser.add_argument("--baseline", type=Path, help="compare against an earlier --output file")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        scratch = Path(scratch)
+        snapshot_path, history = scratch / "snapshots.bin", scratch / "history.csv"
+        (scratch / "snapshots.cities").write_text("".join(f"City {c}\n" for c in range(args.cities)))
+        with open(snapshot_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, RECORD.itemsize))
+            f.write(snapshots(args.cities, 0, args.days, rng).tobytes())
+        history.write_text(",".join(HISTORY_COLUMNS) + "\n" + history_text(args.cities, 0, args.days))
+        accuracy = ForecastAccuracy(ForecastStore(snapshot_path), history, scratch / "accuracy.npz")
+
+        started = time.perf_counter()
+        summary = accuracy.update(now=START + args.days * DAY)
+        elapsed = time.perf_counter() - started
+        results["backlog"] = {"slots": summary["matched"] + summary["missed"], "elapsed_s": round(elapsed, 3),
+                              "slots_per_s": round((summary["matched"] + summary["missed"]) / elapsed, 1)}
+
+        times, settled = [], 0
+        for day in range(args.days, args.days + args.increments):
+            with open(snapshot_path, 'ab') as f:
+                f.write(snapshots(args.cities, day, 1, rng).tobytes())
+            with open(history, 'a') as f:
+                f.write(history_text(args.cities, day, 1))
+            started = time.perf_counter()
+            summary = accuracy.update(now=START + (day + 1) * DAY)
+            times.append(time.perf_counter() - started)
+            settled += summary["matched"] + summary["missed"]
+        results["daily"] = {"slots": settled, "elapsed_s": round(sum(times), 3),
+                            "update_ms": round(1000 * sum(times) / len(times), 1),
+                            "slots_per_s": round(settled / sum(times), 1)}
+
+        started = time.perf_counter()
+        rows = accuracy.report()
+        results["report"] = {"leads": len(rows), "report_ms": round((time.perf_counter() - started) * 1000, 3)}
+        size_mb = snapshot_path.stat().st_size / 1e6
+
+    print(f"{args.cities} cities, {args.days} days of snapshots ({size_mb:.0f} MB)")
+    print(f"backlog: {results['backlog']['slots']} slots in {results['backlog']['elapsed_s']:.2f} s")
+    print(f"daily:   {results['daily']['update_ms']:.0f} ms per update, "
+          f"{results['daily']['slots'] // args.increments} slots each")
+    print(f"report:  {results['report']['report_ms']:.2f} ms for {results['report']['leads']} lead hours")
+
+    params = vars(args).copy()
+    params.pop("output"), params.pop("baseline")
+    if args.output:
+        report.save(args.output, results, params)
+    if args.baseline:
+        regressions = report.compare(results, report.load(args.baseline), args.max_regression,
+                                     ("slots_per_s", "update_ms", "report_ms"))
+        if regressions:
+            print("Regressed: " + ", ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Mail throughput against a local SMTP stand-in.
+
+Requires aiosmtpd (pip install aiosmtpd):
+    python -m benchmarks.bench_mailer --messages 500
+"""
+import argparse
+import smtplib
+import socket
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from src.mailer import MailQueue, render_report
+
+
+class CountingHandler:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def sample_payloads(n: int) -> list:
+    return [
+        {
+            'name': f"City {i}", 'sys': {'country': 'PK', 'sunrise': 1700000000, 'sunset': 1700040000},
+            'main': {'temp': 20 + i % 10, 'feels_like': 19, 'humidity': 50, 'pressure': 1010},
+            'weather': [{'description': 'clear sky'}], 'wind': {'speed': 3.2}, 'visibility': 10000
+        }
+        for i in range(n)
+    ]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def connection_per_message(host: str, port: int, html: str, count: int):
+    """What WeatherApp used to do for every email"""
+    for i in range(count):
+        msg = MIMEMultipart()
+        msg['Subject'] = "Weather Report"
+        msg['From'] = "weather@localhost"
+        msg['To'] = f"user{i}@example.com"
+        msg.attach(MIMEText(html, 'html'))
+        with smtplib.SMTP(host, port) as server:
+            server.send_message(msg)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--cities", type=int, default=10)
+    args = parser.parse_args()
+
+    from aiosmtpd.controller import Controller
+    handler = CountingHandler()
+    host, port = "127.0.0.1", free_port()
+    controller = Controller(handler, hostname=host, port=port)
+    controller.start()
+    try:
+        payloads = sample_payloads(args.cities)
+        start = time.perf_counter()
+        html = render_report(payloads)
+        render_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        connection_per_message(host, port, html, args.messages)
+        legacy = time.perf_counter() - start
+
+        mailer = MailQueue(host, port, None, None, use_tls=False)
+        recipients = [f"user{i}@example.com" for i in range(args.messages)]
+        start = time.perf_counter()
+        mailer.send_report(recipients, "Weather Report", payloads).result()
+        queued = time.perf_counter() - start
+        mailer.close()
+    finally:
+        controller.stop()
+
+    print(f"report render ({args.cities} cities): {render_ms:.2f} ms")
+    print(f"connection per message: {args.messages / legacy:8.1f} msg/s")
+    print(f"queued, reused connection: {args.messages / queued:8.1f} msg/s "
+          f"({mailer.connects} connection(s))")
+    print(f"messages received by stand-in: {handler.received}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Load test for the local HTTP server on loopback.
+
+The server runs in a child process with a fake upstream (fixed latency), the
+parent drives it with keep-alive connections and reports throughput,
+latency percentiles and how many upstream fetches were made.
+
+    python -m benchmarks.bench_server --requests 20000 --connections 64
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import time
+
+from benchmarks.bench_mailer import free_port
+from src.service import percentile
+
+
+class FakeService:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def current(self, city, units="metric", priority=None):
+        time.sleep(self.latency)
+        return {'cod': 200, 'name': city, 'dt': int(time.time()),
+                'main': {'temp': 20, 'humidity': 50, 'pressure': 1012},
+                'weather': [{'main': 'Clear', 'description': 'clear sky'}],
+                'wind': {'speed': 3}, 'visibility': 10000}
+
+    def forecast(self, city, units="metric", priority=None):
+        return None
+
+
+def run_server(port: int, latency: float, ready):
+    from src.server import WeatherServer
+
+    async def main():
+        server = WeatherServer(FakeService(latency), host="127.0.0.1", port=port)
+        await server.start()
+        ready.set()
+        await server._server.serve_forever()
+    asyncio.run(main())
+
+
+async def client(port: int, paths: list, latencies: list, statuses: dict, etag: bool):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    etags = {}
+    for path in paths:
+        headers = f"GET {path} HTTP/1.1\r\nHost: bench\r\nAccept-Encoding: gzip\r\n"
+        if etag and path in etags:
+            headers += f"If-None-Match: {etags[path]}\r\n"
+        start = time.perf_counter()
+        writer.write((headers + "\r\n").encode())
+        status = int((await reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+            elif name.lower() == "etag":
+                etags[path] = value.strip()
+        await reader.readexactly(length)
+        latencies.append((time.perf_counter() - start) * 1000)
+        statuses[status] = statuses.get(status, 0) + 1
+    writer.close()
+
+
+async def load(port: int, requests: int, connections: int, cities: int, etag: bool):
+    rng = random.Random(1)
+    latencies, statuses = [], {}
+    per_conn = requests // connections
+    jobs = []
+    for _ in range(connections):
+        paths = [f"/weather?city=City{rng.randrange(cities)}" for _ in range(per_conn)]
+        jobs.append(client(port, paths, latencies, statuses, etag))
+    start = time.perf_counter()
+    await asyncio.gather(*jobs)
+    return time.perf_counter() - start, latencies, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--cities", type=int, default=50)
+    parser.add_argument("--upstream-latency", type=float, default=0.2, help="seconds per fake fetch")
+    parser.add_argument("--etag", action="store_true", help="send If-None-Match on repeat requests")
+    args = parser.parse_args()
+
+    port = free_port()
+    ready = multiprocessing.Event()
+    proc = multiprocessing.Process(target=run_server, args=(port, args.upstream_latency, ready), daemon=True)
+    proc.start()
+    ready.wait(10)
+    try:
+        elapsed, latencies, statuses = asyncio.run(
+            load(port, args.requests, args.connections, args.cities, args.etag))
+        stats = asyncio.run(health(port))
+    finally:
+        proc.terminate()
+        proc.join()
+
+    print(f"{len(latencies)} requests over {args.connections} connections in {elapsed:.2f} s")
+    print(f"throughput: {len(latencies) / elapsed:8.1f} req/s")
+    print(f"latency p50/p95/p99: {percentile(latencies, 50):.2f} / "
+          f"{percentile(latencies, 95):.2f} / {percentile(latencies, 99):.2f} ms")
+    print(f"statuses: {statuses}")
+    print(f"upstream fetches: {stats['upstream']} for {args.cities} cities")
+
+
+async def health(port: int) -> dict:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /health HTTP/1.1\r\nConnection: close\r\n\r\n")
+    raw = await reader.read()
+    writer.close()
+    return json.loads(raw.split(b"\r\n\r\n", 1)[1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""WeatherAPI latency and throughput against the local mock server.
+
+Paths measured:
+  single      sequential get_weather calls for distinct cities
+  cached      repeated get_weather for one city (response cache hits)
+  forecast    sequential get_forecast calls
+  batch       WeatherService.poll over many cities (fetch, alerts, no logging)
+  concurrent  get_weather from many threads at once
+
+    python -m benchmarks.bench_weather_api --latency lognormal:40:0.5 --output results.json
+    python -m benchmarks.bench_weather_api --baseline results.json --max-regression 0.2
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks import report
+from benchmarks.mock_owm import MockOWM, use_api_root
+from src.quota import QuotaManager
+from src.service import WeatherService
+from src.weather_api import WeatherAPI
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    ok = fn(*args, **kwargs) is not None
+    return (time.perf_counter() - start) * 1000, ok
+
+
+def run_calls(fn, args_list, concurrency: int = 1) -> dict:
+    start = time.perf_counter()
+    if concurrency == 1:
+        samples = [timed(fn, *args) for args in args_list]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(lambda args: timed(fn, *args), args_list))
+    elapsed = time.perf_counter() - start
+    return report.summarize([ms for ms, _ in samples], elapsed, sum(1 for _, ok in samples if not ok))
+
+
+def bench(requests: int, concurrency: int, tag: str) -> dict:
+    results = {}
+    results["single"] = run_calls(WeatherAPI.get_weather, [(f"{tag} single {i}",) for i in range(requests)])
+
+    WeatherAPI.get_weather(f"{tag} cached")
+    results["cached"] = run_calls(WeatherAPI.get_weather, [(f"{tag} cached",)] * requests * 10)
+
+    results["forecast"] = run_calls(WeatherAPI.get_forecast,
+                                    [(f"{tag} forecast {i}",) for i in range(max(1, requests // 4))])
+
+    cities = [f"{tag} batch {i}" for i in range(requests)]
+    summary = WeatherService().poll(cities, concurrency=concurrency, log=False)["summary"]
+    # poll only reports p50/p95 of its fetches
+    results["batch"] = {"count": summary["cities"], "errors": summary["failed"],
+                        "p50_ms": summary["fetch_p50_ms"], "p95_ms": summary["fetch_p95_ms"],
+                        "p99_ms": None, "throughput_per_s": summary["cities_per_s"]}
+
+    results["concurrent"] = run_calls(WeatherAPI.get_weather,
+                                      [(f"{tag} concurrent {i}",) for i in range(requests * 4)],
+                                      concurrency=concurrency)
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", default="lognormal:20:0.5",
+                        help="mock latency: fixed:MS, uniform:LO:HI or lognormal:MEDIAN_MS:SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="mock requests/s before 429")
+    parser.add_argument("--output", type=Path, help="save results as JSON")
+    parser.add_argument("--baseline", type=Path, help="compare against an earlier --output file")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="fail when a metric is this much worse than the baseline")
+    args = parser.parse_args()
+
+    # The benchmark measures the client, not the free plan quota
+    QuotaManager._default = QuotaManager(limits=(("minute", 1e9, 60),))
+    with MockOWM(latency=args.latency, error_rate=args.error_rate,
+                 rate_limit=args.rate_limit, seed=1) as mock:
+        use_api_root(mock.root)
+        results = bench(args.requests, args.concurrency, tag=str(int(time.time())))
+        server_stats = mock.stats
+
+    print(f"{'path':<12}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for name, r in results.items():
+        p99 = f"{r['p99_ms']:>10.2f}" if r["p99_ms"] is not None else f"{'-':>10}"
+        print(f"{name:<12}{r['count']:>7}{r['errors']:>8}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+              f"{p99}{r['throughput_per_s']:>10.1f}")
+    print(f"mock server: {server_stats}")
+
+    params = vars(args).copy()
+    params.pop("output"), params.pop("baseline")
+    if args.output:
+        report.save(args.output, results, params)
+    if args.baseline:
+        regressions = report.compare(results, report.load(args.baseline), args.max_regression,
+                                     ("p50_ms", "p95_ms", "p99_ms", "throughput_per_s"))
+        if regressions:
+            print("Regressed: " + ", ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+"""Local stand-in for the OpenWeatherMap endpoints WeatherAPI uses.
+
+Serves /data/2.5/weather, /data/2.5/forecast, /data/2.5/air_pollution,
+/data/2.5/history/city and /geo/1.0/direct with deterministic payloads
+per city, plus configurable latency, random server errors and 429
+throttling.
+
+    python -m benchmarks.mock_owm --port 8090 --latency lognormal:40:0.5 --error-rate 0.01
+    OWM_API_ROOT=http://127.0.0.1:8090 python -m src.cli poll Lahore Karachi
+
+Cities whose name starts with "Nowhere" answer 404 like an unknown city.
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+from urllib.parse import parse_qs, urlsplit
+
+CONDITIONS = [("Clear", "clear sky", "01d"), ("Clouds", "broken clouds", "04d"),
+              ("Rain", "light rain", "10d"), ("Thunderstorm", "thunderstorm", "11d"),
+              ("Snow", "light snow", "13d"), ("Mist", "mist", "50d")]
+
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog of 5 makes concurrent clients hit 1 s SYN retries
+    request_queue_size = 256
+    daemon_threads = True
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Latency sampler in seconds from "fixed:MS", "uniform:LO:HI" or "lognormal:MEDIAN:SIGMA" """
+    kind, *args = spec.split(":")
+    values = [float(a) / 1000 for a in args]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        median, sigma = values[0], float(args[1])
+        return lambda rng: rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+    raise ValueError(f"unknown latency distribution: {spec}")
+
+
+def _seed(city: str) -> int:
+    return int(hashlib.md5(city.strip().lower().encode("utf-8")).hexdigest()[:8], 16)
+
+
+def coordinates(city: str):
+    seed = _seed(city)
+    return round((seed % 14000) / 100 - 60, 4), round((seed // 14000 % 36000) / 100 - 180, 4)
+
+
+def weather_payload(city: str, dt: int, units: str = "metric") -> dict:
+    seed = _seed(city)
+    lat, lon = coordinates(city)
+    temp = (seed % 450) / 10 - 5 + 3 * ((dt // 3600) % 24 - 12) / 12
+    if units == "imperial":
+        temp = temp * 9 / 5 + 32
+    main, description, icon = CONDITIONS[(seed + dt // 10800) % len(CONDITIONS)]
+    return {
+        "coord": {"lon": lon, "lat": lat},
+        "weather": [{"id": 800, "main": main, "description": description, "icon": icon}],
+        "base": "stations",
+        "main": {"temp": round(temp, 2), "feels_like": round(temp - 1, 2),
+                 "temp_min": round(temp - 2, 2), "temp_max": round(temp + 2, 2),
+                 "pressure": 990 + seed % 40, "humidity": 20 + seed % 80},
+        "visibility": 10000 - seed % 5000,
+        "wind": {"speed": round((seed % 150) / 10, 1), "deg": seed % 360},
+        "clouds": {"all": seed % 100},
+        "dt": dt,
+        "sys": {"country": "PK", "sunrise": dt - dt % 86400 + 3600, "sunset": dt - dt % 86400 + 50400},
+        "timezone": 18000,
+        "id": seed % 10000000,
+        "name": city.strip().title(),
+        "cod": 200,
+    }
+
+
+class MockOWM:
+    """Threaded HTTP server faking OpenWeatherMap.
+
+    latency: sampler from parse_latency; error_rate: share of requests
+    answered with 500; rate_limit: requests per second above which 429 is
+    returned (0 disables); update_every: how often observations change dt.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: str = "fixed:0",
+                 error_rate: float = 0.0, rate_limit: float = 0.0, update_every: int = 600,
+                 seed: Optional[int] = None):
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.update_every = update_every
+        self.rng = random.Random(seed)
+        self.stats = {"requests": 0, "errors": 0, "throttled": 0, "not_found": 0}
+        self._lock = threading.Lock()
+        self._tokens = rate_limit
+        self._refilled = time.monotonic()
+        self.httpd = _Server((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def root(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _admit(self) -> Optional[int]:
+        """Status to fail this request with, or None to serve it"""
+        with self._lock:
+            self.stats["requests"] += 1
+            if self.rate_limit:
+                now = time.monotonic()
+                self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit)
+                self._refilled = now
+                if self._tokens < 1:
+                    self.stats["throttled"] += 1
+                    return 429
+                self._tokens -= 1
+            if self.error_rate and self.rng.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return 500
+            delay = self.latency(self.rng)
+        if delay > 0:
+            time.sleep(delay)
+        return None
+
+    def _observed_dt(self) -> int:
+        now = int(time.time())
+        return now - now % self.update_every
+
+    def respond(self, path: str, query: dict):
+        """(status, body) for one request"""
+        failure = self._admit()
+        if failure == 429:
+            return 429, {"cod": 429, "message": "Your account is temporary blocked due to exceeding of requests limitation"}
+        if failure:
+            return failure, {"cod": failure, "message": "Internal error"}
+
+        city = query.get("q", [""])[0]
+        units = query.get("units", ["metric"])[0]
+        if path in ("/data/2.5/weather", "/data/2.5/forecast", "/geo/1.0/direct"):
+            if not city or city.lower().startswith("nowhere"):
+                with self._lock:
+                    self.stats["not_found"] += 1
+                if path == "/geo/1.0/direct":
+                    return 200, []
+                return 404, {"cod": "404", "message": "city not found"}
+
+        if path == "/data/2.5/weather":
+            return 200, weather_payload(city, self._observed_dt(), units)
+        if path == "/data/2.5/forecast":
+            cnt = int(query.get("cnt", ["40"])[0])
+            start = self._observed_dt() - self._observed_dt() % 10800 + 10800
+            slots = []
+            for i in range(cnt):
+                dt = start + i * 10800
+                slot = weather_payload(city, dt, units)
+                slots.append({k: slot[k] for k in ("dt", "main", "weather", "clouds", "wind", "visibility")})
+                slots[-1]["dt_txt"] = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(dt))
+            lat, lon = coordinates(city)
+            return 200, {"cod": "200", "message": 0, "cnt": cnt, "list": slots,
+                         "city": {"name": city.strip().title(), "coord": {"lat": lat, "lon": lon},
+                                  "country": "PK", "timezone": 18000}}
+        if path == "/geo/1.0/direct":
+            lat, lon = coordinates(city)
+            return 200, [{"name": city.strip().title(), "lat": lat, "lon": lon, "country": "PK"}]
+        if path == "/data/2.5/history/city":
+            try:
+                lat, lon = float(query["lat"][0]), float(query["lon"][0])
+                start, end = int(query["start"][0]), int(query["end"][0])
+            except (KeyError, ValueError):
+                return 400, {"cod": "400", "message": "wrong latitude, longitude, start or end"}
+            # Hourly, at most a week per call like the real endpoint
+            first = start + (-start) % 3600
+            slots = []
+            for dt in range(first, min(end, first + 168 * 3600) + 1, 3600):
+                slot = weather_payload(f"{lat:.4f},{lon:.4f}", dt, units)
+                slots.append({k: slot[k] for k in ("dt", "main", "weather", "clouds", "wind", "visibility")})
+            return 200, {"message": "Count: %d" % len(slots), "cod": "200", "city_id": 0,
+                         "calctime": 0.01, "cnt": len(slots), "list": slots}
+        if path == "/data/2.5/air_pollution":
+            try:
+                lat, lon = float(query["lat"][0]), float(query["lon"][0])
+            except (KeyError, ValueError):
+                return 400, {"cod": "400", "message": "wrong latitude or longitude"}
+            seed = int(abs(lat * 1000 + lon * 10))
+            return 200, {"coord": {"lon": lon, "lat": lat}, "list": [{
+                "main": {"aqi": 1 + seed % 5},
+                "components": {"co": 200.0 + seed % 800, "no2": (seed % 900) / 10,
+                               "o3": (seed % 1800) / 10, "so2": (seed % 300) / 10,
+                               "pm2_5": (seed % 1500) / 10, "pm10": (seed % 2500) / 10,
+                               "nh3": (seed % 100) / 10, "no": (seed % 50) / 10},
+                "dt": self._observed_dt()}]}
+        return 404, {"cod": "404", "message": "Internal error: unknown endpoint"}
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                status, body = mock.respond(url.path, parse_qs(url.query))
+                raw = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(raw)))
+                if status == 429:
+                    self.send_header("Retry-After", "1")
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "MockOWM":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-owm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def use_api_root(root: str):
+    """Point an already imported WeatherAPI at another server"""
+    import config
+    import src.weather_api as weather_api
+    for name, path in (("BASE_URL", "/data/2.5/weather"), ("FORECAST_URL", "/data/2.5/forecast"),
+                       ("AIR_QUALITY_URL", "/data/2.5/air_pollution"), ("GEOCODING_URL", "/geo/1.0/direct"),
+                       ("HISTORY_URL", "/data/2.5/history/city")):
+        setattr(config, name, root + path)
+        setattr(weather_api, name, root + path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", default="lognormal:40:0.5",
+                        help="fixed:MS, uniform:LO:HI or lognormal:MEDIAN_MS:SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="requests/s before 429 (0 = off)")
+    args = parser.parse_args()
+
+    mock = MockOWM(args.host, args.port, args.latency, args.error_rate, args.rate_limit)
+    print(f"Mock OpenWeatherMap on {mock.root} (export OWM_API_ROOT={mock.root})")
+    try:
+        mock.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock.httpd.server_close()
+        print(json.dumps(mock.stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Shared helpers for benchmark results: summaries, JSON files and baselines"""
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+from src.service import percentile
+
+
+def summarize(latencies_ms: Sequence[float], elapsed_s: float, errors: int = 0) -> dict:
+    """Latency percentiles and throughput for one measured path"""
+    count = len(latencies_ms)
+    return {
+        "count": count,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies_ms, 50), 3),
+        "p95_ms": round(percentile(latencies_ms, 95), 3),
+        "p99_ms": round(percentile(latencies_ms, 99), 3),
+        "throughput_per_s": round(count / elapsed_s, 2) if elapsed_s else 0.0,
+    }
+
+
+def save(path: Path, results: Dict[str, dict], params: dict):
+    """Write results with enough context to judge a later comparison"""
+    document = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": sys.version.split()[0],
+        "machine": platform.platform(),
+        "params": params,
+        "results": results,
+    }
+    Path(path).write_text(json.dumps(document, indent=2), encoding="utf-8")
+
+
+def load(path: Path) -> Dict[str, dict]:
+    return json.loads(Path(path).read_text(encoding="utf-8"))["results"]
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float,
+            metrics: Sequence[str]) -> List[str]:
+    """Print old vs new for each metric; returns the regressions beyond threshold.
+
+    Metrics ending in _per_s are better when higher, everything else when lower.
+    """
+    regressions = []
+    print(f"\n{'case':<34}{'metric':<18}{'baseline':>12}{'current':>12}{'change':>9}")
+    for case, current in results.items():
+        old = baseline.get(case)
+        if not old:
+            continue
+        for metric in metrics:
+            if metric not in current or not old.get(metric):
+                continue
+            change = (current[metric] - old[metric]) / old[metric]
+            worse = -change if metric.endswith("_per_s") else change
+            flag = "  !" if worse > threshold else ""
+            print(f"{case:<34}{metric:<18}{old[metric]:>12.3f}{current[metric]:>12.3f}{change:>+8.1%}{flag}")
+            if worse > threshold:
+                regressions.append(f"{case} {metric} {change:+.1%}")
+    return regressions
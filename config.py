@@ -1,13 +1,57 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).parent
 
 # API Configuration
 API_KEY = "742ea15c539150b83db9c40b723660f8"  #your default 
-BASE_URL = "https://api.openweathermap.org/data/2.5/weather"
-FORECAST_URL = "https://api.openweathermap.org/data/2.5/forecast"
-AIR_QUALITY_URL = "http://api.openweathermap.org/data/2.5/air_pollution"
-GEOCODING_URL = "http://api.openweathermap.org/geo/1.0/direct"
+# Set OWM_API_ROOT to point the app at another server, e.g. benchmarks/mock_owm.py
+API_ROOT = os.environ.get("OWM_API_ROOT", "https://api.openweathermap.org").rstrip("/")
+BASE_URL = f"{API_ROOT}/data/2.5/weather"
+FORECAST_URL = f"{API_ROOT}/data/2.5/forecast"
+AIR_QUALITY_URL = f"{API_ROOT}/data/2.5/air_pollution"
+GEOCODING_URL = f"{API_ROOT}/geo/1.0/direct"
+# Hourly history lives on its own host; a stand-in set through OWM_API_ROOT serves it too
+HISTORY_ROOT = os.environ.get("OWM_HISTORY_ROOT",
+                              os.environ.get("OWM_API_ROOT", "https://history.openweathermap.org")).rstrip("/")
+HISTORY_URL = f"{HISTORY_ROOT}/data/2.5/history/city"
+
+# API Quota (free plan: 60 calls/minute, 1,000,000 calls/month)
+API_CALLS_PER_MINUTE = 60
+API_CALLS_PER_DAY = 30000
+
+# Response cache lifetimes (seconds); current weather updates about every 10 min
+API_CACHE_TTL = {
+    "weather": 300,
+    "forecast": 1800,
+    "air_quality": 1800,
+    "geocoding": 7 * 86400
+}
+# Responses kept at most; expired ones are dropped first, then the oldest
+API_CACHE_MAX_ENTRIES = 2000
+
+# Local HTTP server (python -m src.cli serve)
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_HISTORY_TTL = 30
+# Response bodies kept at most, evicted like API_CACHE_MAX_ENTRIES
+SERVER_CACHE_MAX_ENTRIES = 2000
+
+# Metrics (src/metrics.py); set WEATHERVISION_METRICS=0 to turn them off
+METRICS_ENABLED = os.environ.get("WEATHERVISION_METRICS", "1") != "0"
+METRICS_FILE = BASE_DIR / "data" / "metrics.prom"
+
+# Tracing (src/tracing.py): share of user actions traced, kept spans, export folder
+TRACE_SAMPLE_RATE = float(os.environ.get("WEATHERVISION_TRACE_SAMPLE", "0.05"))
+TRACE_BUFFER = 20000
+TRACE_DIR = BASE_DIR / "data" / "traces"
+
+# UI stall watchdog (src/watchdog.py), seconds; WEATHERVISION_WATCHDOG=0 turns it off
+WATCHDOG_ENABLED = os.environ.get("WEATHERVISION_WATCHDOG", "1") != "0"
+WATCHDOG_INTERVAL = 0.1  # heartbeat period
+WATCHDOG_THRESHOLD = 0.2  # heartbeat lateness counted as a stall
+WATCHDOG_HANG = 5.0  # print the full main thread stack once a stall lasts this long
+WATCHDOG_LOG = BASE_DIR / "data" / "ui_stalls.log"
 
 # Email Configuration
 EMAIL_HOST = "smtp.gmail.com"
@@ -19,16 +63,82 @@ EMAIL_PASSWORD = "abc@0334"  # Replace with your app password
 SAVED_LOCATIONS = BASE_DIR / "data" / "saved_locations.json"
 WEATHER_HISTORY = BASE_DIR / "data" / "weather_history.csv"
 BACKUP_DIR = BASE_DIR / "data" / "backups"
+DAILY_STATS = BASE_DIR / "data" / "daily_stats.json"
+ALERT_RULES = BASE_DIR / "assets" / "rules" / "alert_rules.json"
+ALERT_STATE = BASE_DIR / "data" / "alert_state.json"
+API_USAGE = BASE_DIR / "data" / "api_usage.json"
+
+# History writes (src/history_writer.py): rows are buffered and appended in
+# one locked commit once this many are pending or the oldest is this old
+HISTORY_BATCH_ROWS = 200
+HISTORY_FLUSH_SECONDS = 2.0
+HISTORY_FSYNC = "commit"  # "commit": every commit, "interval": at most every HISTORY_FSYNC_INTERVAL s, "never"
+HISTORY_FSYNC_INTERVAL = 30
+# Rows are keyed by (city, observation time); a row whose key is among the
+# last HISTORY_DEDUP_KEYS logged is a duplicate and dropped. The one-off
+# cleanup also treats identical readings of a city this many seconds
+# apart as one observation (OWM updates current weather about every 10 min)
+HISTORY_DEDUP_KEYS = 20000
+HISTORY_DEDUP_WINDOW = 600
+
+# Historical backfill (src/backfill.py): the history API returns at most a
+# week of hourly data per call; finished chunks are checkpointed per insert
+BACKFILL_CHUNK_HOURS = 168
+BACKFILL_CONCURRENCY = 4
+BACKFILL_BATCH_CHUNKS = 20
+BACKFILL_CHECKPOINT = BASE_DIR / "data" / "backfill_checkpoint.jsonl"
+
+# Air quality (src/air_quality.py), stored next to the weather history
+AIR_QUALITY_HISTORY = BASE_DIR / "data" / "air_quality_history.csv"
+AIR_QUALITY_CONCURRENCY = 16
+
+# Forecast verification (src/forecast_store.py): a city's forecast is kept at
+# most once per OWM model update, and a slot is matched to the history row
+# closest to its valid time, if one is this close
+FORECAST_SNAPSHOTS = BASE_DIR / "data" / "forecast_snapshots.bin"
+FORECAST_ACCURACY = BASE_DIR / "data" / "forecast_accuracy.npz"
+FORECAST_SNAPSHOT_MINUTES = 180
+FORECAST_MATCH_MINUTES = 90
+
+# Saved locations (src/locations.py): journal entries before it is folded into the JSON file
+LOCATIONS_COMPACT_OPS = 1000
+# Daily stats (src/daily_stats.py): journaled rows before they are folded into daily_stats.json
+DAILY_STATS_COMPACT_OPS = 2000
 
 # Assets Paths
 ICON_DIR = BASE_DIR / "assets" / "icons"
 BG_DIR = BASE_DIR / "assets" / "backgrounds"
 STYLES_DIR = BASE_DIR / "assets" / "styles"
+CITIES_FILE = BASE_DIR / "assets" / "data" / "cities.csv"  # name,country,lat,lon,population
+GAZETTEER_FILE = BASE_DIR / "assets" / "data" / "cities.bin"  # built from CITIES_FILE by src/gazetteer.py
+
+# City search suggestions (src/autocomplete.py)
+AUTOCOMPLETE_LIMIT = 8
+AUTOCOMPLETE_DEBOUNCE_MS = 120
 
 # Create directories if they don't exist
 for dir_path in [ICON_DIR, BG_DIR, STYLES_DIR, BACKUP_DIR, WEATHER_HISTORY.parent]:
     dir_path.mkdir(parents=True, exist_ok=True)
 
+# Background Refresh (seconds)
+AUTO_REFRESH = True
+POLL_INTERVAL = 600  # OpenWeatherMap updates current weather about every 10 min
+POLL_MIN_INTERVAL = 120
+POLL_MAX_BACKOFF = 3600
+POLL_JITTER = 0.1
+
+# Text-to-speech Cache
+TTS_CACHE_DIR = BASE_DIR / "data" / "tts_cache"
+TTS_CACHE_MAX_MB = 50
+
+# City time zones (src/timezones.py), memoized by coordinates rounded to this many decimals
+TIMEZONE_CACHE = BASE_DIR / "data" / "timezones.json"
+TIMEZONE_PRECISION = 2
+
+# Alert Notifications
+ALERT_WINDOW_HOURS = 6  # same alert type is notified once per window
+NOTIFY_MIN_INTERVAL = 300  # seconds between desktop notifications
+
 # Theme Configuration
 THEMES = {
     "light": {
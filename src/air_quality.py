@@ -0,0 +1,157 @@
+"""Air quality for many locations: batch fetch, US EPA AQI, CSV history.
+
+Coordinates come from WeatherAPI.get_coordinates. Bundled cities are
+answered by the gazetteer and others from the geocoding cache, so a
+refresh only costs air_pollution calls. These are fetched concurrently
+at SCHEDULED priority. The returned concentrations (ug/m3) are stacked
+into one array per pollutant, and every row's AQI is computed in a
+single NumPy pass: one searchsorted per pollutant into the EPA
+breakpoint table, then linear interpolation. Rows are appended to
+AIR_QUALITY_HISTORY, next to weather_history.csv, under the same kind
+of file lock.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from config import AIR_QUALITY_CONCURRENCY, AIR_QUALITY_HISTORY
+from src import metrics, tracing
+from src.data_handler import DataHandler
+from src.history_writer import append_rows, file_lock
+from src.quota import SCHEDULED
+from src.weather_api import WeatherAPI
+
+COMPONENTS = ["co", "no", "no2", "o3", "so2", "pm2_5", "pm10", "nh3"]
+AIR_QUALITY_COLUMNS = ["city", "lat", "lon", "owm_aqi"] + COMPONENTS + ["aqi", "dominant", "timestamp"]
+
+# ug/m3 to the unit of each EPA table (ppb, or ppm for CO) at 25 C: 24.45 / molar mass
+UNIT_FACTORS = {"o3": 24.45 / 48.00, "no2": 24.45 / 46.01, "so2": 24.45 / 64.07, "co": 24.45 / 28.01 / 1000}
+# Decimals each concentration is truncated to before the table lookup
+TRUNCATE = {"pm2_5": 1, "pm10": 0, "o3": 0, "no2": 0, "so2": 0, "co": 1}
+
+# (concentration low, high) per AQI band 0-50, 51-100, 101-150, 151-200, 201-300, 301-500
+INDEX_BANDS = np.array([[0, 50], [51, 100], [101, 150], [151, 200], [201, 300], [301, 500]], dtype=float)
+BREAKPOINTS = {
+    "pm2_5": [(0.0, 9.0), (9.1, 35.4), (35.5, 55.4), (55.5, 125.4), (125.5, 225.4), (225.5, 325.4)],
+    "pm10": [(0, 54), (55, 154), (155, 254), (255, 354), (355, 424), (425, 604)],
+    "o3": [(0, 54), (55, 70), (71, 85), (86, 105), (106, 200)],  # 8-hour ppb
+    "no2": [(0, 53), (54, 100), (101, 360), (361, 649), (650, 1249), (1250, 2049)],
+    "so2": [(0, 35), (36, 75), (76, 185), (186, 304), (305, 604), (605, 1004)],
+    "co": [(0.0, 4.4), (4.5, 9.4), (9.5, 12.4), (12.5, 15.4), (15.5, 30.4), (30.5, 50.4)],
+}
+POLLUTANTS = list(BREAKPOINTS)
+
+REFRESH_SECONDS = metrics.histogram("air_quality_refresh_seconds", "Whole air quality refresh", ["stage"])
+
+
+def sub_indices(concentrations: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """EPA sub-index of every row for each pollutant; NaN where it is missing.
+    Values above the table are reported as 500"""
+    result = {}
+    for name, table in BREAKPOINTS.items():
+        c = np.asarray(concentrations[name], dtype=float) * UNIT_FACTORS.get(name, 1.0)
+        scale = 10.0 ** TRUNCATE[name]
+        c = np.floor(c * scale + 1e-9) / scale
+        bands = np.asarray(table, dtype=float)
+        i = np.clip(np.searchsorted(bands[:, 1], c, side="left"), 0, len(bands) - 1)
+        c_lo, c_hi = bands[i, 0], bands[i, 1]
+        i_lo, i_hi = INDEX_BANDS[i, 0], INDEX_BANDS[i, 1]
+        index = (i_hi - i_lo) / (c_hi - c_lo) * (np.clip(c, c_lo, c_hi) - c_lo) + i_lo
+        index = np.where(c > bands[-1, 1], 500.0, np.rint(index))
+        result[name] = np.where(np.isnan(c), np.nan, index)
+    return result
+
+
+def compute_aqi(concentrations: Dict[str, np.ndarray]):
+    """(aqi, dominant pollutant) arrays for all rows at once"""
+    indices = sub_indices(concentrations)
+    stacked = np.vstack([indices[name] for name in POLLUTANTS])
+    missing = np.isnan(stacked).all(axis=0)
+    filled = np.where(np.isnan(stacked), -1.0, stacked)
+    aqi = np.where(missing, np.nan, filled.max(axis=0))
+    dominant = np.where(missing, "", np.array(POLLUTANTS, dtype=object)[filled.argmax(axis=0)])
+    return aqi, dominant
+
+
+def _fetch(city: str, priority: int) -> Optional[dict]:
+    coords = WeatherAPI.get_coordinates(city, priority=priority)
+    if not coords:
+        return None
+    data = WeatherAPI.get_air_quality(coords["lat"], coords["lon"], priority=priority)
+    if not data or not data.get("list"):
+        return None
+    entry = data["list"][0]
+    components = entry.get("components") or {}
+    row = {"city": city, "lat": coords["lat"], "lon": coords["lon"],
+           "owm_aqi": (entry.get("main") or {}).get("aqi"), "dt": entry.get("dt")}
+    row.update({name: components.get(name) for name in COMPONENTS})
+    return row
+
+
+def build_rows(readings: List[dict]) -> List[dict]:
+    """Add AQI and dominant pollutant to fetched readings, vectorized"""
+    if not readings:
+        return []
+    concentrations = {name: np.array([np.nan if r.get(name) is None else r[name] for r in readings], dtype=float)
+                      for name in POLLUTANTS}
+    aqi, dominant = compute_aqi(concentrations)
+    now = datetime.now().isoformat()
+    rows = []
+    for reading, value, pollutant in zip(readings, aqi.tolist(), dominant.tolist()):
+        row = {name: reading.get(name) for name in AIR_QUALITY_COLUMNS if name in reading}
+        row["aqi"] = None if np.isnan(value) else int(value)
+        row["dominant"] = pollutant
+        dt = reading.get("dt")
+        row["timestamp"] = datetime.fromtimestamp(dt).isoformat() if dt else now
+        rows.append(row)
+    return rows
+
+
+class AirQualityService:
+    def __init__(self, path: Path = AIR_QUALITY_HISTORY, concurrency: int = AIR_QUALITY_CONCURRENCY,
+                 priority: int = SCHEDULED):
+        self.path = Path(path)
+        self.concurrency = concurrency
+        self.priority = priority
+
+    def refresh(self, cities: Optional[Sequence[str]] = None, store: bool = True) -> Dict:
+        """Fetch, score and store air quality for cities (default: saved locations)"""
+        if cities is None:
+            cities = DataHandler.get_saved_locations()
+        fetched, rows = [], []
+        started = time.perf_counter()
+        with tracing.span("air_quality", cities=len(cities)), REFRESH_SECONDS.time(stage="total"):
+            with REFRESH_SECONDS.time(stage="fetch"), \
+                    ThreadPoolExecutor(max_workers=max(1, min(self.concurrency, len(cities) or 1))) as pool:
+                fetched = list(pool.map(tracing.wrap(self._safe_fetch), cities))
+            readings = [r for r in fetched if r]
+            with REFRESH_SECONDS.time(stage="aqi"):
+                rows = build_rows(readings)
+            if store and rows:
+                with REFRESH_SECONDS.time(stage="store"):
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    with file_lock(self.path):
+                        append_rows(self.path, rows, columns=AIR_QUALITY_COLUMNS)
+        elapsed = time.perf_counter() - started
+        return {"rows": rows, "failed": [city for city, r in zip(cities, fetched) if not r],
+                "elapsed_s": round(elapsed, 3),
+                "locations_per_s": round(len(rows) / elapsed, 1) if elapsed else 0.0}
+
+    def _safe_fetch(self, city: str) -> Optional[dict]:
+        try:
+            return _fetch(city, self.priority)
+        except Exception as e:
+            print(f"Air quality fetch error for {city}: {e}")
+            return None
+
+    def history(self) -> pd.DataFrame:
+        """Stored readings, empty if there are none yet"""
+        if not self.path.exists():
+            return pd.DataFrame(columns=AIR_QUALITY_COLUMNS)
+        with file_lock(self.path):
+            return pd.read_csv(self.path)
@@ -0,0 +1,338 @@
+import itertools
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+from string import Formatter
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from config import ALERT_RULES, ALERT_STATE, ALERT_WINDOW_HOURS, NOTIFY_MIN_INTERVAL
+from src.models import Observation, ObservationBatch, display_value, metric_columns
+
+# Observation fields a rule may test, in the order they are evaluated
+RULE_FIELDS = ("temp", "feels_like", "humidity", "pressure", "condition",
+               "wind_speed", "wind_gust", "visibility", "clouds")
+TEXT_FIELDS = {"condition"}
+
+
+# A fired rule: index is the position of the observation in the batch
+Alert = namedtuple("Alert", ["rule", "message", "index"])
+
+NUMERIC_OPS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+
+class AlertRule:
+    """One threshold rule compiled into a vectorized predicate"""
+
+    def __init__(self, name: str, field: str, op: str, value, message: str):
+        if field not in RULE_FIELDS:
+            raise ValueError(f"Unknown alert field: {field}")
+        if op not in NUMERIC_OPS and op not in ("in", "not in"):
+            raise ValueError(f"Unknown alert operator: {op}")
+        if field in TEXT_FIELDS and op not in ("==", "!=", "in", "not in"):
+            raise ValueError(f"Operator {op} is not supported for {field}")
+        self.name = name
+        self.field = field
+        self.op = op
+        self.value = value
+        self.message = message
+        self.message_fields = []
+        # message with its fields made positional, so hits can be formatted with map()
+        template = []
+        for literal, name, spec, conversion in Formatter().parse(message):
+            template.append(literal.replace("{", "{{").replace("}", "}}"))
+            if name is None:
+                continue
+            if name not in RULE_FIELDS:
+                raise ValueError(f"Unknown field in alert message: {name}")
+            self.message_fields.append(name)
+            template.append("{" + (f"!{conversion}" if conversion else "") + (f":{spec}" if spec else "") + "}")
+        self.template = "".join(template)
+
+        if op in ("in", "not in"):
+            members = np.array(list(value), dtype=object)
+            invert = op == "not in"
+            self.predicate = lambda col: np.isin(col, members, invert=invert)
+        elif field in TEXT_FIELDS:
+            members = np.array([value], dtype=object)
+            invert = op == "!="
+            self.predicate = lambda col: np.isin(col, members, invert=invert)
+        else:
+            ufunc = NUMERIC_OPS[op]
+            threshold = float(value)
+            self.predicate = lambda col: ufunc(col, threshold)
+
+    def messages(self, columns: Sequence[np.ndarray], count: int) -> List[str]:
+        """Messages for count hits from the hits' values of each message field.
+        A single numeric field is formatted once per distinct value"""
+        if not columns:
+            return [self.template.format()] * count
+        if len(columns) == 1:
+            values = columns[0].tolist()
+            texts = {value: self.template.format(display_value(value)) for value in set(values)}
+            return list(map(texts.__getitem__, values))
+        values = [list(map(display_value, column.tolist())) for column in columns]
+        return list(map(self.template.format, *values))
+
+    def __repr__(self):
+        return f"AlertRule({self.name!r}, {self.field} {self.op} {self.value!r})"
+
+
+class AlertEngine:
+    """Evaluates a set of alert rules over batches of observations"""
+    _default = None
+
+    def __init__(self, rules: Sequence[AlertRule]):
+        self.rules = list(rules)
+        used = {rule.field for rule in self.rules}
+        used.update(name for rule in self.rules for name in rule.message_fields)
+        self.fields = [field for field in RULE_FIELDS if field in used]
+
+    @classmethod
+    def from_file(cls, path: Path) -> "AlertEngine":
+        """Compile a JSON rule file"""
+        with open(path, 'r', encoding='utf-8') as f:
+            spec = json.load(f)
+        return cls([AlertRule(**rule) for rule in spec["rules"]])
+
+    @classmethod
+    def default(cls) -> "AlertEngine":
+        """Engine for the bundled rule file, compiled once"""
+        if cls._default is None:
+            cls._default = cls.from_file(ALERT_RULES)
+        return cls._default
+
+    @staticmethod
+    def extract(payload: dict, field: str):
+        """Read one rule field from a weather payload; None (or "") when missing"""
+        return getattr(Observation.from_payload(payload), field)
+
+    def batch(self, payloads, strict: bool = False) -> ObservationBatch:
+        """Payloads or Observations parsed into one batch, an ObservationBatch
+        as it is. With strict, a payload missing a rule field raises KeyError"""
+        if isinstance(payloads, ObservationBatch):
+            return payloads
+        batch = ObservationBatch.from_observations(
+            [obs if isinstance(obs, Observation) else Observation.from_payload(obs) for obs in payloads],
+            self.fields)
+        if strict:
+            for field in self.fields:
+                column = batch.column(field)
+                if (column == "" if field in TEXT_FIELDS else np.isnan(column)).any():
+                    raise KeyError(field)
+        return batch
+
+    def columns(self, payloads, strict: bool = False) -> Dict[str, np.ndarray]:
+        """Rule field arrays for a batch, NaN for missing numbers"""
+        batch = self.batch(payloads, strict=strict)
+        return {field: batch.column(field) for field in self.fields}
+
+    def mask(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        """Boolean matrix of shape (rules, observations)"""
+        n = len(next(iter(columns.values()))) if columns else 0
+        result = np.zeros((len(self.rules), n), dtype=bool)
+        for i, rule in enumerate(self.rules):
+            result[i] = rule.predicate(columns[rule.field]).astype(bool)
+        return result
+
+    def fired(self, payloads, strict: bool = False, units: str = "metric") -> List[tuple]:
+        """(observation indices, messages) of each rule, in rule order.
+        Messages are formatted from the masked columns, one rule at a time.
+        payloads is a list of API payloads or Observations, or an
+        ObservationBatch, whose columns are used as they are. Imperial
+        values are converted to metric first, like the rules"""
+        columns = metric_columns(self.columns(payloads, strict=strict), units)
+        hits = self.mask(columns)
+        result = []
+        for rule, row in zip(self.rules, hits):
+            idx = np.flatnonzero(row)
+            result.append((idx, rule.messages([columns[field][idx] for field in rule.message_fields], len(idx))))
+        return result
+
+    def alerts(self, payloads, strict: bool = False, units: str = "metric") -> List[Alert]:
+        """Every fired rule in the batch, ordered by observation then rule"""
+        per_rule = self.fired(payloads, strict=strict, units=units)
+        if not per_rule:
+            return []
+        indices = np.concatenate([idx for idx, _ in per_rule])
+        messages = np.array(list(itertools.chain.from_iterable(texts for _, texts in per_rule)), dtype=object)
+        names = np.repeat(np.array([rule.name for rule in self.rules], dtype=object),
+                          [len(idx) for idx, _ in per_rule])
+        # Stable, so hits of one observation stay in rule order
+        order = np.argsort(indices, kind="stable")
+        return list(map(Alert._make, zip(names[order].tolist(), messages[order].tolist(),
+                                         indices[order].tolist())))
+
+    def evaluate(self, payloads, strict: bool = False, units: str = "metric") -> List[List[str]]:
+        """Alert messages for each payload, in rule order"""
+        messages = [[] for _ in range(len(payloads))]
+        for idx, texts in self.fired(payloads, strict=strict, units=units):
+            for i, text in zip(idx.tolist(), texts):
+                messages[i].append(text)
+        return messages
+
+    def check(self, payload: dict) -> List[str]:
+        """Alert messages for a single payload"""
+        return self.evaluate([payload], strict=True)[0]
+
+
+def alert_window(dt: Optional[int], hours: int = ALERT_WINDOW_HOURS) -> Optional[int]:
+    """Start of the time window an observation time falls into"""
+    if dt is None:
+        return None
+    size = hours * 3600
+    return int(dt) // size * size
+
+
+def scan_forecast(forecast: dict, engine: Optional[AlertEngine] = None, units: str = "metric") -> List[dict]:
+    """Upcoming threshold crossings in a forecast response.
+
+    All forecast slots are evaluated in one batch; consecutive slots firing
+    the same rule are merged into a single event spanning start..end.
+    An imperial forecast is converted to metric first, like the rules.
+    """
+    engine = engine or AlertEngine.default()
+    slots = ObservationBatch.from_payloads(forecast.get("list", [])).to_metric(units)
+    city = forecast.get("city", {}).get("name", "")
+    events = []
+    open_events = {}
+    for alert in engine.alerts(slots):
+        dt = slots.value(alert.index, "dt")
+        current = open_events.get(alert.rule)
+        if current and current["last_index"] == alert.index - 1:
+            current["end"] = dt
+            current["last_index"] = alert.index
+            continue
+        event = {
+            "city": city, "rule": alert.rule, "message": alert.message,
+            "start": dt, "end": dt, "last_index": alert.index
+        }
+        open_events[alert.rule] = event
+        events.append(event)
+    for event in events:
+        del event["last_index"]
+    return events
+
+
+class AlertStateStore:
+    """Remembers which (city, alert type, time window) were already notified"""
+
+    def __init__(self, path: Path = ALERT_STATE, retention_hours: int = 48):
+        self.path = path
+        self.retention = retention_hours * 3600
+        self._lock = threading.Lock()
+        self._state = None
+
+    @staticmethod
+    def key(city: str, rule: str, window: int) -> str:
+        return f"{' '.join(city.split()).casefold()}|{rule}|{window}"
+
+    def _load(self) -> dict:
+        if self._state is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError):
+                self._state = {}
+        return self._state
+
+    def seen(self, key: str) -> bool:
+        with self._lock:
+            return key in self._load()
+
+    def mark(self, keys: Sequence[str]):
+        """Record keys as notified and drop expired entries"""
+        if not keys:
+            return
+        now = time.time()
+        with self._lock:
+            state = self._load()
+            for key in keys:
+                state[key] = now
+            for key in [k for k, ts in state.items() if now - ts > self.retention]:
+                del state[key]
+            try:
+                tmp_path = self.path.with_suffix(".tmp")
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"Alert state save error: {e}")
+
+
+def _desktop_notify(title: str, message: str):
+    from plyer import notification
+    notification.notify(title=title, message=message, timeout=10)
+
+
+class AlertNotifier:
+    """Deduplicates alerts and coalesces them into rate-limited notifications"""
+    MAX_LINES = 4
+
+    def __init__(self, store: Optional[AlertStateStore] = None,
+                 min_interval: float = NOTIFY_MIN_INTERVAL,
+                 notify: Callable[[str, str], None] = _desktop_notify):
+        self.store = store if store is not None else AlertStateStore()
+        self.min_interval = min_interval
+        self.notify = notify
+        self.pending = {}
+        self.last_sent = None
+        self._lock = threading.Lock()
+
+    def submit(self, city: str, alerts: Sequence[dict], flush: bool = True) -> bool:
+        """Queue alerts ({"rule", "message", "start"}) and send if allowed.
+
+        Alerts with a known time are dropped when their (city, rule, window)
+        was already notified; alerts without one are only coalesced.
+        """
+        with self._lock:
+            for alert in alerts:
+                window = alert_window(alert.get("start"))
+                key = None
+                if window is not None:
+                    key = AlertStateStore.key(city, alert["rule"], window)
+                    if self.store.seen(key):
+                        continue
+                self.pending.setdefault(key or (city, alert["message"]), (key, alert["message"]))
+        return self.flush() if flush else False
+
+    def pending_delay(self) -> Optional[float]:
+        """Seconds until queued alerts may be sent, None if nothing is queued"""
+        if not self.pending:
+            return None
+        if self.last_sent is None:
+            return 0.0
+        return max(0.0, self.min_interval - (time.monotonic() - self.last_sent))
+
+    def flush(self, force: bool = False) -> bool:
+        """Send queued alerts as one notification when the rate limit allows"""
+        with self._lock:
+            if not self.pending:
+                return False
+            if not force and self.pending_delay():
+                return False
+            entries = list(self.pending.values())
+            self.pending.clear()
+            self.last_sent = time.monotonic()
+
+        lines = [message for _, message in entries]
+        if len(lines) > self.MAX_LINES:
+            extra = len(lines) - self.MAX_LINES + 1
+            lines = lines[:self.MAX_LINES - 1] + [f"...and {extra} more"]
+        title = "Weather Alerts" if len(entries) == 1 else f"Weather Alerts ({len(entries)})"
+        try:
+            self.notify(title, "\n".join(lines))
+        except Exception as e:
+            print(f"Notification error: {e}")
+        self.store.mark([key for key, _ in entries if key])
+        return True
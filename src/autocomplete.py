@@ -0,0 +1,167 @@
+"""Offline city suggestions for the search box.
+
+Names from the bundled city list (CITIES_FILE), saved locations and
+the cities in history go into one sorted array of folded keys. Folding
+casefolds, strips accents and collapses spaces. Every word of a name
+is a key, so "york" finds New York. A prefix is two bisects. When a
+prefix finds too little, keys with the same first letter are compared
+with a bounded Levenshtein distance to catch typos ("lahroe").
+
+Ranking: how often the city was searched (saved-location usage), then
+cities already in history, then population.
+"""
+import bisect
+import csv
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from config import AUTOCOMPLETE_LIMIT, CITIES_FILE
+
+
+def fold(text: str) -> str:
+    """Case, accent and whitespace insensitive form used for matching"""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().split())
+
+
+def bounded_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, or limit + 1 as soon as it must exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        best = i
+        for j, cb in enumerate(b, 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            current.append(value)
+            best = min(best, value)
+        if best > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class City:
+    __slots__ = ("name", "country", "population", "usage", "in_history")
+
+    def __init__(self, name: str, country: str = "", population: int = 0):
+        self.name = name
+        self.country = country
+        self.population = population
+        self.usage = 0
+        self.in_history = False
+
+
+class Suggestion(NamedTuple):
+    label: str  # shown in the list, e.g. "Hyderabad, PK"
+    query: str  # sent to the API, e.g. "Hyderabad,PK" when the name alone is ambiguous
+
+
+def load_cities(path: Path = CITIES_FILE) -> List[City]:
+    """Bundled city list; empty if the file is missing"""
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            return [City(row["name"], row.get("country", ""), int(row.get("population") or 0))
+                    for row in csv.DictReader(f)]
+    except (OSError, KeyError, ValueError) as e:
+        print(f"City list load error: {e}")
+        return []
+
+
+class CityIndex:
+    def __init__(self, cities: Iterable[City] = ()):
+        self._by_name: Dict[str, List[City]] = {}
+        self._keys: List[str] = []
+        self._cities: List[City] = []
+        self._pending = []
+        for city in cities:
+            self.add(city)
+
+    @classmethod
+    def build(cls, saved: Iterable = (), history: Iterable[str] = (),
+              cities_file: Optional[Path] = CITIES_FILE) -> "CityIndex":
+        """saved holds (name, usage count) pairs, most recent first"""
+        index = cls(load_cities(cities_file) if cities_file else [])
+        for name, usage in saved:
+            for city in index.ensure(name):
+                city.usage = max(city.usage, usage)
+        for name in history:
+            for city in index.ensure(name):
+                city.in_history = True
+        return index
+
+    def add(self, city: City):
+        name_key = fold(city.name)
+        if not name_key:
+            return
+        self._by_name.setdefault(name_key, []).append(city)
+        words = name_key.split(" ")
+        # One key per word start, so later words of a name match too
+        for i in range(len(words)):
+            self._pending.append((" ".join(words[i:]), city))
+
+    def _sorted(self):
+        if self._pending:
+            pairs = sorted(list(zip(self._keys, self._cities)) + self._pending, key=lambda p: p[0])
+            self._keys = [key for key, _ in pairs]
+            self._cities = [city for _, city in pairs]
+            self._pending = []
+
+    def ensure(self, name: str) -> List[City]:
+        """Cities with this name, adding a country-less entry if unknown"""
+        found = self._by_name.get(fold(name))
+        if not found:
+            city = City(" ".join(str(name).split()))
+            self.add(city)
+            found = [city]
+        return found
+
+    def record_use(self, name: str):
+        """Rank a searched city higher from now on"""
+        for city in self.ensure(name.split(",")[0]):
+            city.usage += 1
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+    def _range(self, prefix: str):
+        lo = bisect.bisect_left(self._keys, prefix)
+        return lo, bisect.bisect_left(self._keys, prefix + "\uffff", lo)
+
+    def _prefix(self, prefix: str) -> List[City]:
+        lo, hi = self._range(prefix)
+        return self._cities[lo:hi]
+
+    def _fuzzy(self, text: str) -> List[City]:
+        limit = 1 if len(text) < 6 else 2
+        # Typos rarely hit the first letter; only keys sharing it are compared
+        lo, hi = self._range(text[0])
+        found = []
+        for key, city in zip(self._keys[lo:hi], self._cities[lo:hi]):
+            # Compare against the key's start, so "lahroe" still finds "lahore cantonment"
+            if bounded_distance(text, key[:len(text)], limit) <= limit:
+                found.append(city)
+        return found
+
+    def suggest(self, text: str, limit: int = AUTOCOMPLETE_LIMIT) -> List[Suggestion]:
+        query = fold(text)
+        if not query:
+            return []
+        self._sorted()
+        rank = lambda c: (-c.usage, not c.in_history, -c.population, c.name)
+        found = sorted(set(self._prefix(query)), key=rank)
+        if len(found) < limit and len(query) >= 3:
+            # Typo matches only fill the list after every prefix match
+            seen = set(found)
+            found += sorted((c for c in set(self._fuzzy(query)) if c not in seen), key=rank)
+        return [self._suggestion(city) for city in found[:limit]]
+
+    def _suggestion(self, city: City) -> Suggestion:
+        if not city.country:
+            return Suggestion(city.name, city.name)
+        label = f"{city.name}, {city.country}"
+        ambiguous = len(self._by_name.get(fold(city.name), ())) > 1
+        return Suggestion(label, f"{city.name},{city.country}" if ambiguous else city.name)
@@ -0,0 +1,200 @@
+"""Bulk historical backfill for many cities, resumable after a crash.
+
+Each (city, date range) is split into chunks of BACKFILL_CHUNK_HOURS,
+which is what one history API call returns. Chunks are fetched
+concurrently at BACKFILL priority, so the quota manager keeps its
+reserve for interactive and scheduled calls. Every BACKFILL_BATCH_CHUNKS
+finished chunks, their rows go into the history through
+DataHandler.insert_history, sorted by time, and are committed. The
+chunks are then appended to the checkpoint file. A job that is killed
+and started again skips every checkpointed chunk. Failed chunks are
+never checkpointed, so the next run retries them.
+
+    {"chunk": "lahore|1714521600|1715126400", "rows": 168, "at": 1716451200.0}
+"""
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Iterable, List, NamedTuple, Optional, Sequence
+
+from config import (BACKFILL_BATCH_CHUNKS, BACKFILL_CHECKPOINT, BACKFILL_CHUNK_HOURS,
+                    BACKFILL_CONCURRENCY)
+from src import metrics, tracing
+from src.daily_stats import normalize_city
+from src.data_handler import DataHandler
+from src.history_writer import file_lock
+from src.models import Observation, ObservationBatch
+from src.quota import BACKFILL
+from src.weather_api import WeatherAPI
+
+CHUNKS = metrics.counter("backfill_chunks_total", "Backfill chunks by outcome", ["outcome"])
+CHUNK_SECONDS = metrics.histogram("backfill_chunk_seconds", "History API call per chunk, quota wait included")
+
+
+class Chunk(NamedTuple):
+    city: str
+    lat: float
+    lon: float
+    start: int  # Unix seconds, inclusive
+    end: int  # exclusive, the next chunk's start
+
+    @property
+    def key(self) -> str:
+        return f"{normalize_city(self.city)}|{self.start}|{self.end}"
+
+
+def plan_chunks(city: str, lat: float, lon: float, start: datetime, end: datetime,
+                chunk_hours: int = BACKFILL_CHUNK_HOURS) -> List[Chunk]:
+    """Split one city's range into consecutive chunks. The ends are floored
+    to whole hours and inner boundaries fall on multiples of chunk_hours,
+    so a rerun plans the same chunks"""
+    size = chunk_hours * 3600
+    first, last = int(start.timestamp()) // 3600 * 3600, int(end.timestamp()) // 3600 * 3600
+    chunks = []
+    edge = first - first % size
+    while edge < last:
+        chunks.append(Chunk(city, lat, lon, max(edge, first), min(edge + size, last)))
+        edge += size
+    return chunks
+
+
+class Checkpoint:
+    """Append-only record of finished chunks"""
+
+    def __init__(self, path: Path = BACKFILL_CHECKPOINT):
+        self.path = Path(path)
+
+    def done(self) -> set:
+        keys = set()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        keys.add(json.loads(line)["chunk"])
+                    except (ValueError, KeyError, TypeError):
+                        continue  # torn last line of a killed run
+        except FileNotFoundError:
+            pass
+        return keys
+
+    def mark(self, chunks: Iterable[Chunk], rows: Sequence[int]):
+        now = time.time()
+        text = "".join(json.dumps({"chunk": chunk.key, "rows": count, "at": now}) + "\n"
+                       for chunk, count in zip(chunks, rows))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with file_lock(self.path), open(self.path, 'a', encoding='utf-8') as f:
+            f.write(text)
+
+    def reset(self):
+        with file_lock(self.path):
+            self.path.unlink(missing_ok=True)
+
+
+def fetch_chunk(chunk: Chunk, units: str = "metric", priority: int = BACKFILL) -> Optional[List[dict]]:
+    """Hourly payloads of one chunk, or None if the call failed"""
+    # The API's end is inclusive; stop short of the next chunk's first hour
+    data = WeatherAPI.get_historical(chunk.lat, chunk.lon, datetime.fromtimestamp(chunk.start),
+                                     datetime.fromtimestamp(chunk.end - 1), units=units, priority=priority)
+    if not data or str(data.get("cod", "200")) != "200":
+        return None
+    return data.get("list", [])
+
+
+class BackfillJob:
+    def __init__(self, cities: Sequence[str], start: datetime, end: Optional[datetime] = None,
+                 units: str = "metric", chunk_hours: int = BACKFILL_CHUNK_HOURS,
+                 concurrency: int = BACKFILL_CONCURRENCY, batch_chunks: int = BACKFILL_BATCH_CHUNKS,
+                 checkpoint: Optional[Checkpoint] = None, retries: int = 2, retry_delay: float = 1.0,
+                 fetch: Callable[[Chunk, str], Optional[List[dict]]] = fetch_chunk):
+        self.cities = list(cities)
+        self.start = start
+        self.end = end or datetime.now()
+        self.units = units
+        self.chunk_hours = chunk_hours
+        self.concurrency = concurrency
+        self.batch_chunks = batch_chunks
+        self.checkpoint = checkpoint or Checkpoint()
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.fetch = fetch
+        self.unknown: List[str] = []
+
+    def plan(self) -> List[Chunk]:
+        """Every chunk of the job, resolving coordinates (offline for bundled cities)"""
+        chunks = []
+        for city in self.cities:
+            coords = WeatherAPI.get_coordinates(city, priority=BACKFILL)
+            if not coords:
+                self.unknown.append(city)
+                continue
+            chunks += plan_chunks(city, coords["lat"], coords["lon"], self.start, self.end, self.chunk_hours)
+        return chunks
+
+    def _fetch(self, chunk: Chunk) -> Optional[List[dict]]:
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+            with CHUNK_SECONDS.time(), tracing.span("backfill_chunk", city=chunk.city):
+                try:
+                    slots = self.fetch(chunk, self.units)
+                except Exception as e:
+                    print(f"Backfill fetch error for {chunk.key}: {e}")
+                    slots = None
+            if slots is not None:
+                return slots
+        return None
+
+    def _commit(self, finished: List[tuple]) -> int:
+        """Insert finished chunks in one sorted batch, then checkpoint them"""
+        observations, counts = [], []
+        for chunk, slots in finished:
+            parsed = [Observation.from_payload(slot, chunk.city) for slot in slots]
+            parsed = [obs for obs in parsed if obs.temp is not None and obs.dt is not None]
+            observations += parsed
+            counts.append(len(parsed))
+        rows = DataHandler.insert_history(ObservationBatch.from_observations(observations), self.units)
+        # Rows must be on disk before the checkpoint says the chunk is done
+        DataHandler.flush_history()
+        self.checkpoint.mark([chunk for chunk, _ in finished], counts)
+        return rows
+
+    def run(self, progress: Optional[Callable[[dict], None]] = None) -> dict:
+        """Fetch and store every chunk not yet checkpointed; returns a summary"""
+        started = time.perf_counter()
+        chunks = self.plan()
+        done = self.checkpoint.done()
+        pending = [chunk for chunk in chunks if chunk.key not in done]
+        summary = {"cities": len(self.cities), "unknown": list(self.unknown), "chunks": len(chunks),
+                   "skipped": len(chunks) - len(pending), "fetched": 0, "failed": 0, "rows": 0}
+        finished = []
+        with ThreadPoolExecutor(max_workers=max(1, self.concurrency)) as pool:
+            futures = {pool.submit(tracing.wrap(self._fetch), chunk): chunk for chunk in pending}
+            for future in as_completed(futures):
+                chunk, slots = futures[future], future.result()
+                if slots is None:
+                    summary["failed"] += 1
+                    CHUNKS.inc(outcome="failed")
+                    continue
+                summary["fetched"] += 1
+                CHUNKS.inc(outcome="fetched")
+                finished.append((chunk, slots))
+                if len(finished) >= self.batch_chunks:
+                    summary["rows"] += self._commit(finished)
+                    finished = []
+                    if progress:
+                        progress(dict(summary))
+        if finished:
+            summary["rows"] += self._commit(finished)
+        elapsed = time.perf_counter() - started
+        summary.update(elapsed_s=round(elapsed, 3),
+                       chunks_per_s=round(summary["fetched"] / elapsed, 2) if elapsed else 0.0,
+                       rows_per_s=round(summary["rows"] / elapsed, 1) if elapsed else 0.0)
+        return summary
+
+
+def backfill(cities: Sequence[str], days: int, **kwargs) -> dict:
+    """Backfill hourly history for cities from midnight days ago until now"""
+    start = datetime.combine(datetime.now().date() - timedelta(days=days), datetime.min.time())
+    return BackfillJob(cities, start, **kwargs).run()
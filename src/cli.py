@@ -0,0 +1,246 @@
+"""Headless entry point: python -m src.cli poll --cities-file cities.txt --concurrency 32
+
+Other commands: daemon (keep saved locations fresh), serve (local HTTP API),
+gazetteer (offline city lookups, rebuild the bundled city table),
+backfill (load past hourly history, resumable),
+air (air quality and AQI for saved locations),
+accuracy (forecast error by lead time),
+dedup (drop history rows that repeat an observation)
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import List
+
+from config import (AIR_QUALITY_CONCURRENCY, BACKFILL_CONCURRENCY, HISTORY_DEDUP_WINDOW, METRICS_FILE,
+                    SERVER_HOST, SERVER_PORT)
+from src import metrics, tracing
+from src.data_handler import DataHandler
+from src.scheduler import PollScheduler
+from src.service import WeatherService
+
+
+def read_cities(path: Path) -> List[str]:
+    """Cities from a text file (one per line) or a saved_locations style JSON file"""
+    text = Path(path).read_text(encoding="utf-8")
+    if path.suffix == ".json":
+        data = json.loads(text)
+        return data["locations"] if isinstance(data, dict) else list(data)
+    return [line.strip() for line in text.splitlines()
+            if line.strip() and not line.lstrip().startswith("#")]
+
+
+def emit(record: dict):
+    sys.stdout.write(json.dumps(record, default=str) + "\n")
+    sys.stdout.flush()
+
+
+def cmd_poll(args) -> int:
+    if args.cities:
+        cities = args.cities
+    elif args.cities_file:
+        cities = read_cities(args.cities_file)
+    else:
+        cities = DataHandler.get_saved_locations()
+    if not cities:
+        print("No cities to poll", file=sys.stderr)
+        return 2
+
+    if args.trace:
+        tracing.TRACER.sample_rate = 1.0
+    report = WeatherService().poll(cities, units=args.units, concurrency=args.concurrency,
+                                   log=not args.no_log, forecast=args.forecast)
+    if args.trace:
+        print(f"Trace written to {tracing.export(args.trace)}", file=sys.stderr)
+    for result in report["results"]:
+        emit(dict(result, event="city"))
+    emit(dict(report["summary"], event="summary"))
+    return 0 if report["summary"]["failed"] == 0 else 1
+
+
+def cmd_daemon(args) -> int:
+    cities = None
+    if args.cities_file:
+        cities = lambda: read_cities(args.cities_file)
+
+    def on_poll(event):
+        emit(dict(event, event="poll"))
+        if args.metrics_file:
+            metrics.REGISTRY.write(args.metrics_file)
+
+    scheduler = PollScheduler(WeatherService(), cities=cities, units=args.units,
+                              concurrency=args.concurrency, on_poll=on_poll)
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_serve(args) -> int:
+    import asyncio
+    from src.server import WeatherServer
+
+    server = WeatherServer(host=args.host, port=args.port, units=args.units, workers=args.workers)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_gazetteer(args) -> int:
+    from src.gazetteer import Gazetteer, build_gazetteer
+
+    if args.build:
+        print(f"{build_gazetteer()} cities written", file=sys.stderr)
+    gazetteer = Gazetteer.load()
+    if gazetteer is None:
+        return 1
+    for query in args.queries:
+        try:
+            lat, lon = (float(part) for part in query.split(","))
+        except ValueError:
+            place = gazetteer.find(query)
+        else:
+            place = gazetteer.nearest(lat, lon)
+        emit(dict(place._asdict(), query=query) if place else {"query": query, "error": "not found"})
+    return 0
+
+
+def cmd_backfill(args) -> int:
+    from datetime import datetime, timedelta
+    from src.backfill import BackfillJob, Checkpoint
+
+    cities = args.cities or (read_cities(args.cities_file) if args.cities_file else DataHandler.get_saved_locations())
+    if not cities:
+        print("No cities to backfill", file=sys.stderr)
+        return 2
+    end = datetime.fromisoformat(args.end) if args.end else datetime.now()
+    start = datetime.fromisoformat(args.start) if args.start else end - timedelta(days=args.days)
+    checkpoint = Checkpoint()
+    if args.restart:
+        checkpoint.reset()
+    job = BackfillJob(cities, start, end, units=args.units, concurrency=args.concurrency, checkpoint=checkpoint)
+    summary = job.run(progress=lambda s: emit(dict(s, event="progress")))
+    emit(dict(summary, event="summary"))
+    return 0 if summary["failed"] == 0 and not summary["unknown"] else 1
+
+
+def cmd_air(args) -> int:
+    from src.air_quality import AirQualityService
+
+    cities = args.cities or (read_cities(args.cities_file) if args.cities_file else DataHandler.get_saved_locations())
+    if not cities:
+        print("No cities to check", file=sys.stderr)
+        return 2
+    summary = AirQualityService(concurrency=args.concurrency).refresh(cities, store=not args.no_log)
+    for row in summary.pop("rows"):
+        emit(dict(row, event="city"))
+    emit(dict(summary, event="summary"))
+    return 0 if not summary["failed"] else 1
+
+
+def cmd_accuracy(args) -> int:
+    from src.forecast_store import ForecastAccuracy
+
+    accuracy = ForecastAccuracy()
+    emit(dict(accuracy.update(), event="update"))
+    for city in args.cities or [None]:
+        for row in accuracy.report(city, field=args.field):
+            emit(dict(row, event="lead", city=city or "all", field=args.field))
+    return 0
+
+
+def cmd_dedup(args) -> int:
+    removed = DataHandler.deduplicate_history(window=args.window)
+    emit({"event": "dedup", "removed": removed})
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description="WeatherVision headless tools")
+    parser.add_argument("--profile", type=Path, metavar="DIR",
+                        help="write a cProfile and tracemalloc report of the command (main thread) to DIR")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    poll = sub.add_parser("poll", help="fetch, log and check alerts for many cities")
+    poll.add_argument("cities", nargs="*", help="city names (default: saved locations)")
+    poll.add_argument("--cities-file", type=Path, help="text file with one city per line, or JSON")
+    poll.add_argument("--concurrency", type=int, default=8)
+    poll.add_argument("--units", choices=["metric", "imperial"], default="metric")
+    poll.add_argument("--forecast", action="store_true", help="also scan forecasts for upcoming alerts")
+    poll.add_argument("--no-log", action="store_true", help="do not append to weather history")
+    poll.add_argument("--trace", type=Path, metavar="FILE", help="write a Chrome/Perfetto trace of the poll")
+    poll.set_defaults(func=cmd_poll)
+
+    daemon = sub.add_parser("daemon", help="keep saved locations fresh until interrupted")
+    daemon.add_argument("--cities-file", type=Path, help="poll these cities instead of saved locations")
+    daemon.add_argument("--concurrency", type=int, default=4)
+    daemon.add_argument("--units", choices=["metric", "imperial"], default="metric")
+    daemon.add_argument("--metrics-file", type=Path, nargs="?", const=METRICS_FILE,
+                        help=f"keep Prometheus metrics in this file (default {METRICS_FILE.name})")
+    daemon.set_defaults(func=cmd_daemon)
+
+    serve = sub.add_parser("serve", help="serve cached weather and history as JSON over HTTP")
+    serve.add_argument("--host", default=SERVER_HOST)
+    serve.add_argument("--port", type=int, default=SERVER_PORT)
+    serve.add_argument("--units", choices=["metric", "imperial"], default="metric",
+                       help="units when a request does not name them")
+    serve.add_argument("--workers", type=int, default=8, help="threads for upstream fetches")
+    serve.set_defaults(func=cmd_serve)
+
+    gazetteer = sub.add_parser("gazetteer", help="look up bundled cities by name or nearest to LAT,LON")
+    gazetteer.add_argument("queries", nargs="*", help='"Lahore", "Hyderabad,PK" or "31.5,74.3"')
+    gazetteer.add_argument("--build", action="store_true", help="rebuild cities.bin from cities.csv first")
+    gazetteer.set_defaults(func=cmd_gazetteer)
+
+    backfill = sub.add_parser("backfill", help="load past hourly history; rerun to resume an interrupted job")
+    backfill.add_argument("cities", nargs="*", help="city names (default: saved locations)")
+    backfill.add_argument("--cities-file", type=Path, help="text file with one city per line, or JSON")
+    backfill.add_argument("--days", type=int, default=90, help="how far back, unless --start is given")
+    backfill.add_argument("--start", help="first day, YYYY-MM-DD")
+    backfill.add_argument("--end", help="stop before this day, YYYY-MM-DD (default: now)")
+    backfill.add_argument("--concurrency", type=int, default=BACKFILL_CONCURRENCY)
+    backfill.add_argument("--units", choices=["metric", "imperial"], default="metric")
+    backfill.add_argument("--restart", action="store_true", help="forget the checkpoint and fetch everything")
+    backfill.set_defaults(func=cmd_backfill)
+
+    air = sub.add_parser("air", help="fetch air quality, compute AQI and append it to the air quality history")
+    air.add_argument("cities", nargs="*", help="city names (default: saved locations)")
+    air.add_argument("--cities-file", type=Path, help="text file with one city per line, or JSON")
+    air.add_argument("--concurrency", type=int, default=AIR_QUALITY_CONCURRENCY)
+    air.add_argument("--no-log", action="store_true", help="do not append to the air quality history")
+    air.set_defaults(func=cmd_air)
+
+    accuracy = sub.add_parser("accuracy", help="verify stored forecasts against history: bias, MAE, RMSE by lead hour")
+    accuracy.add_argument("cities", nargs="*", help="city names (default: all cities together)")
+    accuracy.add_argument("--field", choices=["temp", "humidity", "pressure", "wind_speed"], default="temp")
+    accuracy.set_defaults(func=cmd_accuracy)
+
+    dedup = sub.add_parser("dedup", help="one-off: drop history rows logged twice for the same observation")
+    dedup.add_argument("--window", type=float, default=HISTORY_DEDUP_WINDOW,
+                       help="seconds within which identical readings of a city count as one")
+    dedup.set_defaults(func=cmd_dedup)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    DataHandler.init_files()
+    if not args.profile:
+        return args.func(args)
+
+    from src.profiling import ActionProfiler
+    profiler = ActionProfiler(args.profile)
+    try:
+        with profiler.action(args.command):
+            return args.func(args)
+    finally:
+        profiler.close()
+        print(f"Profile summary: {args.profile / 'summary.txt'}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
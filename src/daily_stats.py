@@ -0,0 +1,305 @@
+"""Running per (city, day) statistics of the weather history.
+
+The table is kept in memory. Each logged row is appended to a journal
+next to daily_stats.json as one JSON line; every DAILY_STATS_COMPACT_OPS
+rows the journal is folded into the JSON file, which is replaced
+atomically. Writes hold file_lock(DAILY_STATS), and other processes'
+changes are picked up when the snapshot or journal changes on disk.
+
+    {"cities": {"lahore": {"name": "Lahore", "days": {"2025-05-01": {"temp": {"count": 3, ...}}}}}}
+    ["Lahore", "2025-05-01", {"temp": 31.0, "humidity": 40.0}]      journal
+"""
+import json
+import threading
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+from config import DAILY_STATS, DAILY_STATS_COMPACT_OPS, WEATHER_HISTORY
+from src.history_writer import HistoryWriter, atomic_write, file_lock, file_signature
+
+# Numeric history columns that get running statistics
+STAT_FIELDS = ["temp", "humidity", "pressure", "wind_speed", "visibility"]
+
+
+def normalize_city(city: str) -> str:
+    """Case and whitespace insensitive key for a city name"""
+    return " ".join(str(city).split()).casefold()
+
+
+def _day_key(value) -> str:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()[:10]
+    return str(value)[:10]
+
+
+class RunningStat:
+    """Count/sum/min/max with Welford mean and variance"""
+    __slots__ = ("count", "total", "min", "max", "mean", "m2")
+
+    def __init__(self, count=0, total=0.0, min=None, max=None, mean=0.0, m2=0.0):
+        self.count = count
+        self.total = total
+        self.min = min
+        self.max = max
+        self.mean = mean
+        self.m2 = m2
+
+    def push(self, value: float):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count, "sum": self.total, "min": self.min,
+            "max": self.max, "mean": self.mean, "m2": self.m2
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "RunningStat":
+        return cls(d["count"], d["sum"], d["min"], d["max"], d["mean"], d["m2"])
+
+
+class DailyStats:
+    """Per (city, day) statistics table kept up to date by log_weather"""
+    _lock = threading.RLock()
+    _table: Optional[Dict[str, Dict[str, dict]]] = None
+    _snapshot_sig = None
+    _offset = 0
+    _journal_ops = 0
+
+    @staticmethod
+    def _journal() -> Path:
+        return DAILY_STATS.with_suffix(".journal")
+
+    # Loading and syncing with other processes
+
+    @classmethod
+    def _load_snapshot(cls) -> bool:
+        """Replace the table with the JSON file; False if there is none"""
+        cls._table = {}
+        cls._snapshot_sig = file_signature(DAILY_STATS)
+        cls._offset = 0
+        cls._journal_ops = 0
+        if cls._snapshot_sig is None:
+            return False
+        try:
+            with open(DAILY_STATS, 'r', encoding='utf-8') as f:
+                raw = json.load(f).get("cities", {})
+            for key, entry in raw.items():
+                cls._table[key] = {
+                    "name": entry["name"],
+                    "days": {
+                        day: {field: RunningStat.from_dict(s) for field, s in stats.items()}
+                        for day, stats in entry["days"].items()
+                    }
+                }
+        except Exception as e:
+            print(f"Daily stats load error: {e}")
+        return True
+
+    @classmethod
+    def _read_journal(cls):
+        try:
+            with open(cls._journal(), 'rb') as f:
+                f.seek(cls._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        # Only whole lines; a concurrent writer may be mid-line
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                city, day, values = json.loads(line)
+            except (ValueError, TypeError):
+                continue
+            cls._push(city, day, values)
+            cls._journal_ops += 1
+        cls._offset += end
+
+    @classmethod
+    def _changed(cls) -> bool:
+        if cls._table is None or file_signature(DAILY_STATS) != cls._snapshot_sig:
+            return True
+        journal = file_signature(cls._journal())
+        return (journal[1] if journal else 0) != cls._offset
+
+    @classmethod
+    def _sync(cls):
+        """Catch up with the files on disk; the caller holds file_lock"""
+        if cls._table is None or file_signature(DAILY_STATS) != cls._snapshot_sig:
+            if not cls._load_snapshot():
+                # First run: build the table from the history
+                cls._rebuild()
+                return
+        size = (file_signature(cls._journal()) or (0, 0))[1]
+        if size < cls._offset:
+            # Compacted by someone else
+            cls._load_snapshot()
+        if size > cls._offset:
+            cls._read_journal()
+
+    @classmethod
+    def _load(cls) -> Dict[str, Dict[str, dict]]:
+        with cls._lock:
+            # Two stats when nothing changed; the lock only when something did
+            if cls._changed():
+                with file_lock(DAILY_STATS):
+                    cls._sync()
+            return cls._table
+
+    # Writing
+
+    @classmethod
+    def _compact(cls):
+        data = {
+            "cities": {
+                key: {
+                    "name": entry["name"],
+                    "days": {
+                        day: {field: s.to_dict() for field, s in stats.items()}
+                        for day, stats in entry["days"].items()
+                    }
+                }
+                for key, entry in cls._table.items()
+            }
+        }
+        DAILY_STATS.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(DAILY_STATS, json.dumps(data))
+        with open(cls._journal(), 'wb'):
+            pass
+        cls._snapshot_sig = file_signature(DAILY_STATS)
+        cls._offset = 0
+        cls._journal_ops = 0
+
+    @classmethod
+    def _push(cls, city: str, day: str, entry: dict) -> Dict[str, float]:
+        """Fold one row into the table, returns the values it used"""
+        key = normalize_city(city)
+        city_entry = cls._table.setdefault(key, {"name": city, "days": {}})
+        stats = city_entry["days"].setdefault(day, {})
+        values = {}
+        for field in STAT_FIELDS:
+            value = entry.get(field)
+            if value is None or pd.isna(value):
+                continue
+            values[field] = float(value)
+            stats.setdefault(field, RunningStat()).push(values[field])
+        return values
+
+    @classmethod
+    def update(cls, city: str, entry: dict):
+        """Fold one logged history row into the table"""
+        cls.update_many([dict(entry, city=city)])
+
+    @classmethod
+    def update_many(cls, entries: List[dict]):
+        """Fold logged history rows into the table and journal them in one append"""
+        if not entries:
+            return
+        try:
+            with cls._lock, file_lock(DAILY_STATS):
+                # A first build scans the history; DataHandler folds rows in
+                # here before they are committed to it
+                cls._sync()
+                lines = []
+                for entry in entries:
+                    day = _day_key(entry["timestamp"])
+                    values = cls._push(entry["city"], day, entry)
+                    lines.append(json.dumps([entry["city"], day, values]) + "\n")
+                with open(cls._journal(), 'ab') as f:
+                    f.write("".join(lines).encode('utf-8'))
+                    cls._offset = f.tell()
+                cls._journal_ops += len(lines)
+                if cls._journal_ops >= DAILY_STATS_COMPACT_OPS:
+                    cls._compact()
+        except Exception as e:
+            print(f"Daily stats update error: {e}")
+
+    @classmethod
+    def _rebuild(cls):
+        cls._table = {}
+        HistoryWriter.flush_default()
+        if WEATHER_HISTORY.exists():
+            df = pd.read_csv(WEATHER_HISTORY)
+            for row in df.to_dict("records"):
+                cls._push(row["city"], _day_key(row["timestamp"]), row)
+        cls._compact()
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute the whole table from the history CSV"""
+        with cls._lock, file_lock(DAILY_STATS):
+            cls._rebuild()
+
+    @classmethod
+    def compact(cls):
+        """Fold the journal into the JSON file now, e.g. before a backup"""
+        with cls._lock, file_lock(DAILY_STATS):
+            cls._sync()
+            cls._compact()
+
+    @classmethod
+    def prune(cls, before) -> int:
+        """Drop days older than the given date, returns number removed"""
+        cutoff = _day_key(before)
+        removed = 0
+        with cls._lock, file_lock(DAILY_STATS):
+            cls._sync()
+            for entry in cls._table.values():
+                for day in [d for d in entry["days"] if d < cutoff]:
+                    del entry["days"][day]
+                    removed += 1
+            cls._compact()
+        return removed
+
+    @staticmethod
+    def _summarize(name: str, day: str, stats: dict) -> dict:
+        summary = {"city": name, "day": day}
+        for field, s in stats.items():
+            summary[field] = {
+                "count": s.count, "mean": s.mean, "min": s.min, "max": s.max,
+                "sum": s.total, "variance": s.variance, "std": s.variance ** 0.5
+            }
+        return summary
+
+    @classmethod
+    def get(cls, city: str, day) -> Optional[dict]:
+        """Statistics for one city and day, or None"""
+        with cls._lock:
+            entry = cls._load().get(normalize_city(city))
+            if not entry:
+                return None
+            stats = entry["days"].get(_day_key(day))
+            return cls._summarize(entry["name"], _day_key(day), stats) if stats else None
+
+    @classmethod
+    def summary(cls, city: str, start=None, end=None) -> List[dict]:
+        """Daily statistics for a city, optionally limited to a day range"""
+        with cls._lock:
+            entry = cls._load().get(normalize_city(city))
+            if not entry:
+                return []
+            low = _day_key(start) if start else ""
+            high = _day_key(end) if end else "9999"
+            return [
+                cls._summarize(entry["name"], day, stats)
+                for day, stats in sorted(entry["days"].items())
+                if low <= day <= high
+            ]
+
+    @classmethod
+    def cities(cls) -> List[str]:
+        """Display names of all cities in the table"""
+        with cls._lock:
+            return [entry["name"] for entry in cls._load().values()]
@@ -1,14 +1,60 @@
 import json
+import math
+import threading
 import pandas as pd
 from pathlib import Path
-from config import SAVED_LOCATIONS, WEATHER_HISTORY, BACKUP_DIR
+from config import (SAVED_LOCATIONS, WEATHER_HISTORY, BACKUP_DIR, DAILY_STATS, HISTORY_DEDUP_KEYS,
+                    HISTORY_DEDUP_WINDOW)
+from src import metrics, tracing
+from src.daily_stats import DailyStats, normalize_city
+from src.history_writer import HISTORY_COLUMNS, HistoryWriter, RecentKeys, atomic_write, file_lock, tail_rows
+from src.locations import LocationIndex
+from src.models import Observation, ObservationBatch, observed_at
 from datetime import datetime
 from zipfile import ZipFile
 
+# Serializes history rewrites between the UI and background threads;
+# file_lock does the same between processes
+_history_lock = threading.Lock()
+# Paths init_files last prepared, so repeat calls cost nothing
+_initialized = None
+# (history path, RecentKeys) of the rows logged lately, seeded from the file's tail
+_recent = None
+_recent_lock = threading.Lock()
+
+STORAGE_SECONDS = metrics.histogram("data_handler_seconds", "DataHandler operation time", ["op"])
+HISTORY_DUPLICATES = metrics.counter("weather_history_duplicates_total",
+                                     "History rows dropped because the observation was already logged")
+HISTORY_ROWS = metrics.gauge("weather_history_rows", "Rows in weather_history.csv at the last read or write")
+metrics.gauge("weather_history_bytes", "Size of weather_history.csv",
+              callback=lambda: WEATHER_HISTORY.stat().st_size if WEATHER_HISTORY.exists() else 0)
+
+
+def history_key(row: dict) -> tuple:
+    """(normalized city, observation time): one history row per observation"""
+    return normalize_city(row["city"]), str(row["timestamp"])
+
+
+def _recent_keys() -> RecentKeys:
+    global _recent
+    with _recent_lock:
+        if _recent is None or _recent[0] != WEATHER_HISTORY:
+            keys = RecentKeys(HISTORY_DEDUP_KEYS)
+            keys.add_new(history_key(row) for row in tail_rows(WEATHER_HISTORY, HISTORY_DEDUP_KEYS)
+                         if row.get("city") and row.get("timestamp"))
+            _recent = (WEATHER_HISTORY, keys)
+        return _recent[1]
+
+
 class DataHandler:
     @staticmethod
+    @STORAGE_SECONDS.timed(op="init_files")
     def init_files():
         """Initialize all required files and directories"""
+        global _initialized
+        paths = (SAVED_LOCATIONS, WEATHER_HISTORY, BACKUP_DIR)
+        if _initialized == paths:
+            return
         try:
             WEATHER_HISTORY.parent.mkdir(parents=True, exist_ok=True)
             BACKUP_DIR.mkdir(parents=True, exist_ok=True)
@@ -18,69 +64,169 @@ class DataHandler:
                     json.dump({"locations": []}, f)
             
             if not WEATHER_HISTORY.exists():
-                pd.DataFrame(columns=[
-                    "city", "temp", "humidity", "conditions", 
-                    "pressure", "wind_speed", "visibility", "timestamp"
-                ]).to_csv(WEATHER_HISTORY, index=False)
+                pd.DataFrame(columns=HISTORY_COLUMNS).to_csv(WEATHER_HISTORY, index=False)
+            _initialized = paths
         except Exception as e:
             print(f"Initialization error: {e}")
 
     @staticmethod
+    @STORAGE_SECONDS.timed(op="save_location")
     def save_location(city: str):
-        """Save favorite location with error handling"""
+        """Save favorite location, or mark it as most recently used"""
         try:
-            DataHandler.init_files()
-            with open(SAVED_LOCATIONS, 'r+', encoding='utf-8') as f:
-                data = json.load(f)
-                if city not in data["locations"]:
-                    data["locations"].append(city)
-                    f.seek(0)
-                    json.dump(data, f)
-                    f.truncate()
+            LocationIndex.default(SAVED_LOCATIONS).use(city)
         except Exception as e:
             print(f"Error saving location: {e}")
 
     @staticmethod
-    def log_weather(city: str, weather_data: dict):
+    @STORAGE_SECONDS.timed(op="remove_location")
+    def remove_location(city: str) -> bool:
+        """Forget a saved location, in any spelling"""
+        try:
+            return LocationIndex.default(SAVED_LOCATIONS).remove(city)
+        except Exception as e:
+            print(f"Error removing location: {e}")
+            return False
+
+    @staticmethod
+    def history_entry(city: str, weather_data, units: str = "metric") -> dict:
+        """Build one metric history row from an API payload or Observation
+        fetched in units"""
+        if not isinstance(weather_data, Observation):
+            weather_data = Observation.from_payload(weather_data, city)
+        if weather_data.temp is None:
+            raise ValueError("no temperature in payload")
+        return dict(weather_data.to_metric(units).history_row(), city=city)
+
+    @staticmethod
+    def log_weather(city: str, weather_data, units: str = "metric"):
         """Log weather data with improved error handling"""
+        DataHandler.log_weather_many([(city, weather_data)], units)
+
+    @staticmethod
+    @STORAGE_SECONDS.timed(op="log_weather_many")
+    def log_weather_many(records, units: str = "metric") -> int:
+        """Queue (city, payload or Observation) pairs, or an ObservationBatch,
+        for the next history commit. History is kept in metric, so data
+        fetched in imperial units is converted"""
         try:
-            DataHandler.init_files()
-            new_entry = {
-                "city": city,
-                "temp": weather_data["main"]["temp"],
-                "humidity": weather_data["main"]["humidity"],
-                "conditions": weather_data["weather"][0]["main"],
-                "pressure": weather_data["main"]["pressure"],
-                "wind_speed": weather_data["wind"]["speed"],
-                "visibility": weather_data.get("visibility", 0)/1000,
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            try:
-                df = pd.read_csv(WEATHER_HISTORY)
-            except:
-                df = pd.DataFrame()
-                
-            df = pd.concat([df, pd.DataFrame([new_entry])], ignore_index=True)
-            df.to_csv(WEATHER_HISTORY, index=False)
+            if isinstance(records, ObservationBatch):
+                new_entries = records.to_metric(units).history_rows()
+            else:
+                new_entries = []
+                for city, weather_data in records:
+                    try:
+                        new_entries.append(DataHandler.history_entry(city, weather_data, units))
+                    except (ValueError, AttributeError, IndexError, TypeError) as e:
+                        print(f"Error logging weather for {city}: {e}")
+            return DataHandler._append_history(new_entries)
         except Exception as e:
             print(f"Error logging weather: {e}")
+            return 0
+
+    @staticmethod
+    @STORAGE_SECONDS.timed(op="insert_history")
+    def insert_history(batch: ObservationBatch, units: str = "metric") -> int:
+        """Bulk-insert past observations, timestamped by their own dt and
+        sorted oldest first; observations without dt are skipped"""
+        try:
+            batch = batch.to_metric(units)
+            timestamps = ["" if math.isnan(dt) else observed_at(dt) for dt in batch.column("dt").tolist()]
+            rows = sorted((row for row in batch.history_rows(timestamps) if row["timestamp"]),
+                          key=lambda row: (row["timestamp"], row["city"]))
+            return DataHandler._append_history(rows)
+        except Exception as e:
+            print(f"Error inserting history: {e}")
+            return 0
+
+    @staticmethod
+    def _append_history(new_entries: list) -> int:
+        # An unchanged reading logged again has the same key; drop it
+        fresh = _recent_keys().add_new(history_key(row) for row in new_entries)
+        if not all(fresh):
+            HISTORY_DUPLICATES.inc(len(fresh) - sum(fresh))
+            new_entries = [row for row, new in zip(new_entries, fresh) if new]
+        if not new_entries:
+            return 0
+        # Daily stats see rows before they are committed, so they stay
+        # current; rebuild() reconciles them if buffered rows are lost
+        with STORAGE_SECONDS.time(op="daily_stats_update"), tracing.span("daily_stats"):
+            DailyStats.update_many(new_entries)
+        with STORAGE_SECONDS.time(op="history_submit"), tracing.span("history_submit"):
+            HistoryWriter.default(WEATHER_HISTORY).submit(new_entries)
+        HISTORY_ROWS.inc(len(new_entries))
+        return len(new_entries)
 
     @staticmethod
+    @STORAGE_SECONDS.timed(op="deduplicate_history")
+    def deduplicate_history(window: float = HISTORY_DEDUP_WINDOW) -> int:
+        """One-off cleanup of history logged before deduplication: drops
+        repeated (city, timestamp) rows and identical readings of a city
+        logged within window seconds of each other. Returns rows removed"""
+        global _recent
+        try:
+            DataHandler.flush_history()
+            with _history_lock, file_lock(WEATHER_HISTORY):
+                df = pd.read_csv(WEATHER_HISTORY)
+                keys = pd.DataFrame({"city": df["city"].map(normalize_city),
+                                     "timestamp": pd.to_datetime(df["timestamp"], format="ISO8601")})
+                repeated = keys.duplicated()
+                readings = [c for c in HISTORY_COLUMNS if c not in ("city", "timestamp") and c in df]
+                same = pd.concat([keys["city"], df[readings]], axis=1).assign(timestamp=keys["timestamp"])
+                same = same.sort_values("timestamp", kind="stable")
+                gap = same.groupby(["city"] + readings, dropna=False, sort=False)["timestamp"].diff()
+                repeated |= (gap <= pd.Timedelta(seconds=window)).reindex(df.index)
+                kept = df[~repeated]
+                if len(kept) < len(df):
+                    atomic_write(WEATHER_HISTORY, kept.to_csv(index=False, lineterminator='\n'))
+            HISTORY_ROWS.set(len(kept))
+            with _recent_lock:
+                _recent = None
+            if len(kept) < len(df):
+                DailyStats.rebuild()
+            return len(df) - len(kept)
+        except Exception as e:
+            print(f"History deduplication error: {e}")
+            return 0
+
+    @staticmethod
+    @STORAGE_SECONDS.timed(op="flush_history")
+    def flush_history() -> int:
+        """Commit buffered rows so readers see them"""
+        return HistoryWriter.default(WEATHER_HISTORY).flush()
+
+    @staticmethod
+    @STORAGE_SECONDS.timed(op="get_saved_locations")
     def get_saved_locations() -> list:
-        """Get list of favorite locations with error handling"""
+        """Get list of favorite locations, most recently used first"""
         try:
-            DataHandler.init_files()
-            with open(SAVED_LOCATIONS, 'r', encoding='utf-8') as f:
-                return json.load(f).get("locations", [])
+            return LocationIndex.default(SAVED_LOCATIONS).names()
         except:
             return []
 
     @staticmethod
+    def get_location_usage() -> list:
+        """(city, times searched) for every saved location, most recently used first"""
+        try:
+            return [(entry.name, entry.count) for entry in LocationIndex.default(SAVED_LOCATIONS).entries()]
+        except:
+            return []
+
+    @staticmethod
+    def get_history_cities() -> list:
+        """Every city that has weather history"""
+        try:
+            return DailyStats.cities()
+        except:
+            return []
+
+    @staticmethod
+    @STORAGE_SECONDS.timed(op="export_to_excel")
     def export_to_excel() -> Path:
         """Simplified Excel export without formatting"""
         try:
             DataHandler.init_files()
+            DataHandler.flush_history()
             df = pd.read_csv(WEATHER_HISTORY)
             excel_path = BACKUP_DIR / f"weather_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
             df.to_excel(excel_path, index=False)
@@ -90,13 +236,17 @@ class DataHandler:
             return None
 
     @staticmethod
+    @STORAGE_SECONDS.timed(op="create_backup")
     def create_backup() -> Path:
         """Create ZIP backup with error handling"""
         try:
             DataHandler.init_files()
+            DataHandler.flush_history()
+            LocationIndex.default(SAVED_LOCATIONS).compact()
+            DailyStats.compact()
             backup_path = BACKUP_DIR / f"weather_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
             with ZipFile(backup_path, 'w') as zipf:
-                for file in [SAVED_LOCATIONS, WEATHER_HISTORY]:
+                for file in [SAVED_LOCATIONS, WEATHER_HISTORY, DAILY_STATS]:
                     if file.exists():
                         zipf.write(file, arcname=file.name)
             return backup_path
@@ -105,12 +255,16 @@ class DataHandler:
             return None
 
     @staticmethod
+    @STORAGE_SECONDS.timed(op="get_weather_history")
     def get_weather_history(city: str = None, days: int = 30) -> pd.DataFrame:
         """Get historical weather data with improved error handling"""
         try:
             DataHandler.init_files()
+            DataHandler.flush_history()
             df = pd.read_csv(WEATHER_HISTORY)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
+            HISTORY_ROWS.set(len(df))
+            # Rows stamped from dt have no microseconds, older ones do
+            df['timestamp'] = pd.to_datetime(df['timestamp'], format="ISO8601")
             
             if city:
                 df = df[df['city'] == city]
@@ -121,11 +275,21 @@ class DataHandler:
             return pd.DataFrame()
 
     @staticmethod
+    @STORAGE_SECONDS.timed(op="clear_history")
     def clear_history(days: int = 30) -> int:
         """Clear old historical data with error handling"""
+        global _recent
         try:
-            df = DataHandler.get_weather_history(days=days)
-            df.to_csv(WEATHER_HISTORY, index=False)
+            DataHandler.flush_history()
+            with _history_lock, file_lock(WEATHER_HISTORY):
+                df = pd.read_csv(WEATHER_HISTORY)
+                timestamps = pd.to_datetime(df['timestamp'], format="ISO8601")
+                keep = timestamps >= pd.Timestamp.now() - pd.Timedelta(days=days)
+                df = df[keep].iloc[timestamps[keep].argsort(kind="stable").values]
+                atomic_write(WEATHER_HISTORY, df.to_csv(index=False, lineterminator='\n'))
+            with _recent_lock:
+                _recent = None
+            DailyStats.prune(pd.Timestamp.now() - pd.Timedelta(days=days))
             return len(df)
         except:
             return 0
\ No newline at end of file
@@ -0,0 +1,384 @@
+"""Forecast snapshots and how well they verified.
+
+ForecastStore appends each metric forecast to FORECAST_SNAPSHOTS as
+fixed 29-byte records, one per 3-hour slot, after a b"WVFS", version,
+record size header (4s I I):
+
+    city u4      line number in forecast_snapshots.cities
+    issued u4    when it was fetched, Unix seconds
+    valid u4     the slot's dt
+    temp, humidity, pressure, wind_speed f4   NaN when missing
+    state u1     0 pending, 1 matched, 2 missed
+
+A city is kept at most once per FORECAST_SNAPSHOT_MINUTES, since OWM
+updates its forecasts every three hours; hundreds of cities make about
+a gigabyte a year.
+
+ForecastAccuracy joins each slot to the history row of the same city
+nearest its valid time (within FORECAST_MATCH_MINUTES). The error
+(forecast - observed) goes into running count/sum/abs/squares per
+(city, lead hour, field), from which bias, MAE and RMSE follow. An
+update never rescans: history is read from the byte offset the last
+update stopped at, and snapshots from the first slot still pending. A
+slot is settled once its valid time plus the window has passed, and
+its state byte is set in place. The totals, both cursors and the
+observations pending slots may still need are kept in FORECAST_ACCURACY.
+History is stored in metric (DataHandler converts imperial data at
+ingest), like the snapshots.
+"""
+import csv
+import io
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import (FORECAST_ACCURACY, FORECAST_MATCH_MINUTES, FORECAST_SNAPSHOT_MINUTES,
+                    FORECAST_SNAPSHOTS, WEATHER_HISTORY)
+from src import metrics
+from src.daily_stats import normalize_city
+from src.history_writer import HistoryWriter, file_lock
+from src.models import ObservationBatch
+
+MAGIC = b"WVFS"
+VERSION = 1
+HEADER = struct.Struct("<4sII")
+FIELDS = ("temp", "humidity", "pressure", "wind_speed")
+RECORD = np.dtype([("city", "<u4"), ("issued", "<u4"), ("valid", "<u4")]
+                  + [(field, "<f4") for field in FIELDS] + [("state", "u1")])
+PENDING, MATCHED, MISSED = 0, 1, 2
+LEAD_HOURS = 126  # five days of slots plus the one in progress
+# Running totals per (city, lead hour, field)
+COUNT, SUM, ABS, SQUARES = range(4)
+# Bytes before the history offset that must be unchanged for it to stay valid
+FINGERPRINT_BYTES = 64
+
+SNAPSHOT_SLOTS = metrics.counter("forecast_snapshot_slots_total", "Forecast slots stored")
+SLOTS_SETTLED = metrics.counter("forecast_slots_settled_total", "Forecast slots verified", ["outcome"])
+
+
+class ForecastStore:
+    _default = None
+
+    def __init__(self, path: Path = None, interval_minutes: float = FORECAST_SNAPSHOT_MINUTES):
+        self.path = Path(path or FORECAST_SNAPSHOTS)
+        self.cities_path = self.path.with_suffix(".cities")
+        self.interval = interval_minutes * 60
+        self._lock = threading.Lock()
+        self._ids: Optional[Dict[str, int]] = None
+        self._names: List[str] = []
+        self._last: Optional[Dict[int, int]] = None
+
+    @classmethod
+    def default(cls, path: Path = None) -> "ForecastStore":
+        """Process-wide store; another path starts a new one"""
+        path = Path(path or FORECAST_SNAPSHOTS)
+        if cls._default is None or cls._default.path != path:
+            cls._default = cls(path)
+        return cls._default
+
+    # Cities
+
+    def _load_cities(self):
+        if self._ids is not None:
+            return
+        try:
+            self._names = self.cities_path.read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            self._names = []
+        self._ids = {normalize_city(name): i for i, name in enumerate(self._names)}
+
+    def names(self) -> List[str]:
+        with self._lock:
+            self._load_cities()
+            return list(self._names)
+
+    def city_ids(self) -> Dict[str, int]:
+        """Normalized city name to its id"""
+        with self._lock:
+            self._load_cities()
+            return dict(self._ids)
+
+    def _city_id(self, city: str) -> int:
+        """Id of a city, adding it if new; the caller holds file_lock"""
+        key = normalize_city(city)
+        if key not in self._ids:
+            # Another process may have added it since the list was read
+            self._ids = None
+            self._load_cities()
+        if key not in self._ids:
+            self.cities_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.cities_path, 'a', encoding='utf-8') as f:
+                f.write(" ".join(str(city).split()) + "\n")
+            self._ids[key] = len(self._names)
+            self._names.append(" ".join(str(city).split()))
+        return self._ids[key]
+
+    # Snapshots
+
+    def __len__(self) -> int:
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+        return max(0, size - HEADER.size) // RECORD.itemsize
+
+    def read(self, start: int = 0, writable: bool = False) -> np.ndarray:
+        """Records from start on, memory-mapped; writable lets the state byte be set"""
+        count = len(self) - start
+        if count <= 0:
+            return np.zeros(0, dtype=RECORD)
+        with open(self.path, 'rb') as f:
+            magic, version, size = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION or size != RECORD.itemsize:
+            raise ValueError("not a forecast snapshot file")
+        return np.memmap(self.path, dtype=RECORD, mode="r+" if writable else "r",
+                         offset=HEADER.size + start * RECORD.itemsize, shape=(count,))
+
+    def _last_issued(self) -> Dict[int, int]:
+        if self._last is None:
+            # A day of snapshots for a few hundred cities is well within the tail
+            tail = self.read(max(0, len(self) - 100_000))
+            self._last = {}
+            for city, issued in zip(tail["city"].tolist(), tail["issued"].tolist()):
+                self._last[city] = max(issued, self._last.get(city, 0))
+        return self._last
+
+    def record(self, city: str, forecast: dict, issued: Optional[float] = None) -> int:
+        """Store a forecast payload's slots; returns how many, 0 if the
+        city's last snapshot is more recent than the interval"""
+        try:
+            issued = int(issued if issued is not None else time.time())
+            batch = ObservationBatch.from_payloads(forecast.get("list") or [])
+            has_time = ~np.isnan(batch.column("dt"))
+            if not has_time.any():
+                return 0
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self._lock, file_lock(self.path):
+                self._load_cities()
+                city_id = self._city_id(city)
+                last = self._last_issued()
+                if issued - last.get(city_id, -self.interval) < self.interval:
+                    return 0
+                records = np.zeros(int(has_time.sum()), dtype=RECORD)
+                records["city"] = city_id
+                records["issued"] = issued
+                records["valid"] = batch.column("dt")[has_time]
+                for field in FIELDS:
+                    records[field] = batch.column(field)[has_time]
+                with open(self.path, 'ab') as f:
+                    if f.tell() == 0:
+                        f.write(HEADER.pack(MAGIC, VERSION, RECORD.itemsize))
+                    f.write(records.tobytes())
+                last[city_id] = issued
+            SNAPSHOT_SLOTS.inc(len(records))
+            return len(records)
+        except Exception as e:
+            print(f"Forecast snapshot error for {city}: {e}")
+            return 0
+
+
+class ForecastAccuracy:
+    def __init__(self, store: Optional[ForecastStore] = None, history: Path = None, path: Path = None,
+                 window_minutes: float = FORECAST_MATCH_MINUTES):
+        self.store = store or ForecastStore.default()
+        self.history = Path(history or WEATHER_HISTORY)
+        self.path = Path(path or FORECAST_ACCURACY)
+        self.window = int(window_minutes * 60)
+        self._lock = threading.Lock()
+        self._state = None
+
+    # State
+
+    def _empty_state(self) -> dict:
+        return {"cursor": 0, "offset": 0, "fingerprint": b"",
+                "totals": np.zeros((0, LEAD_HOURS, len(FIELDS), 4)),
+                "obs_city": np.zeros(0, dtype=np.int64), "obs_time": np.zeros(0, dtype=np.int64),
+                "obs_values": np.zeros((0, len(FIELDS)))}
+
+    def _load(self) -> dict:
+        if self._state is None:
+            self._state = self._empty_state()
+            try:
+                with np.load(self.path) as saved:
+                    self._state.update({name: saved[name] for name in saved.files})
+                self._state["cursor"] = int(self._state["cursor"])
+                self._state["offset"] = int(self._state["offset"])
+                self._state["fingerprint"] = self._state["fingerprint"].tobytes()
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Forecast accuracy load error, starting over: {e}")
+                self._state = self._empty_state()
+        return self._state
+
+    def _save(self):
+        state = dict(self._state, fingerprint=np.frombuffer(self._state["fingerprint"], dtype="u1"))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **state)
+        os.replace(tmp_path, self.path)
+
+    # Observations
+
+    def _read_history(self, state: dict, ids: Dict[str, int]):
+        """History rows logged since the last update, as (city id, time, values) arrays"""
+        try:
+            with open(self.history, 'rb') as f:
+                header_line = f.readline()
+                offset, fingerprint = state["offset"], state["fingerprint"]
+                f.seek(max(0, offset - len(fingerprint)))
+                # A rewritten file (history cleared or deduplicated) is read again from the top
+                if offset < len(header_line) or f.read(len(fingerprint)) != fingerprint:
+                    offset = len(header_line)
+                    for name in ("obs_city", "obs_time", "obs_values"):
+                        state[name] = state[name][:0]
+                f.seek(offset)
+                data = f.read()
+                # A row still being written waits for the next update
+                data = data[:data.rfind(b"\n") + 1]
+                end = offset + len(data)
+                f.seek(max(0, end - FINGERPRINT_BYTES))
+                state["offset"], state["fingerprint"] = end, f.read(min(end, FINGERPRINT_BYTES))
+        except FileNotFoundError:
+            return None
+        if not data:
+            return None
+        columns = next(csv.reader([header_line.decode("utf-8")]))
+        cities, times, values = [], [], []
+        for row in csv.DictReader(io.StringIO(data.decode("utf-8")), fieldnames=columns):
+            city = ids.get(normalize_city(row.get("city", "")))
+            if city is None:
+                continue
+            try:
+                stamp = int(datetime.fromisoformat(row["timestamp"]).timestamp())
+            except (KeyError, TypeError, ValueError):
+                continue
+            cities.append(city)
+            times.append(stamp)
+            values.append([_float(row.get(field)) for field in FIELDS])
+        if not cities:
+            return None
+        return np.array(cities, dtype=np.int64), np.array(times, dtype=np.int64), np.array(values, dtype=float)
+
+    # Matching
+
+    def update(self, now: Optional[float] = None) -> dict:
+        """Read new history, settle every slot whose window has passed and
+        fold the errors into the totals; returns what was done"""
+        now = int(now if now is not None else time.time())
+        summary = {"observations": 0, "matched": 0, "missed": 0, "pending": 0}
+        HistoryWriter.flush_default()
+        with self._lock, file_lock(self.path):
+            state = self._load()
+            ids = self.store.city_ids()
+            new = self._read_history(state, ids)
+            if new is not None:
+                state["obs_city"] = np.concatenate([state["obs_city"], new[0]])
+                state["obs_time"] = np.concatenate([state["obs_time"], new[1]])
+                state["obs_values"] = np.concatenate([state["obs_values"], new[2]])
+                summary["observations"] = len(new[0])
+
+            slots = self.store.read(state["cursor"], writable=True)
+            due = np.flatnonzero((slots["state"] == PENDING)
+                                 & (slots["valid"].astype(np.int64) + self.window <= now))
+            if len(due):
+                cities = max(len(ids), int(slots["city"][due].max()) + 1)
+                matched = self._settle(state, slots, due, cities)
+                summary["matched"], summary["missed"] = int(matched.sum()), int((~matched).sum())
+                slots["state"][due] = np.where(matched, MATCHED, MISSED)
+                slots.flush()
+                SLOTS_SETTLED.inc(summary["matched"], outcome="matched")
+                SLOTS_SETTLED.inc(summary["missed"], outcome="missed")
+
+            pending = np.flatnonzero(slots["state"] == PENDING)
+            summary["pending"] = len(pending)
+            state["cursor"] += int(pending[0]) if len(pending) else len(slots)
+            # Only observations a pending slot could still match are kept
+            oldest = int(slots["valid"][pending].min()) if len(pending) else now
+            keep = state["obs_time"] >= oldest - self.window
+            for name in ("obs_city", "obs_time", "obs_values"):
+                state[name] = state[name][keep]
+            self._save()
+        return summary
+
+    def _settle(self, state: dict, slots: np.ndarray, due: np.ndarray, cities: int) -> np.ndarray:
+        """Match due slots to their nearest observation and add the errors
+        to the totals; returns which slots matched"""
+        # One sorted key per observation, city in the high bits
+        obs_keys = (state["obs_city"] << 32) | state["obs_time"]
+        order = np.argsort(obs_keys, kind="stable")
+        obs_keys = obs_keys[order]
+        city = slots["city"][due].astype(np.int64)
+        valid = slots["valid"][due].astype(np.int64)
+        keys = (city << 32) | valid
+        right = np.searchsorted(obs_keys, keys)
+        left = np.clip(right - 1, 0, max(len(obs_keys) - 1, 0))
+        right = np.clip(right, 0, max(len(obs_keys) - 1, 0))
+        if len(obs_keys):
+            gap_left = np.where(obs_keys[left] >> 32 == city, np.abs(keys - obs_keys[left]), np.iinfo(np.int64).max)
+            gap_right = np.where(obs_keys[right] >> 32 == city, np.abs(obs_keys[right] - keys), np.iinfo(np.int64).max)
+            nearest = np.where(gap_right < gap_left, right, left)
+            matched = np.minimum(gap_left, gap_right) <= self.window
+        else:
+            nearest = np.zeros(len(due), dtype=np.int64)
+            matched = np.zeros(len(due), dtype=bool)
+        if not matched.any():
+            return matched
+
+        observed = state["obs_values"][order][nearest[matched]]
+        forecast = np.column_stack([slots[field][due][matched].astype(float) for field in FIELDS])
+        errors = forecast - observed
+        lead = np.clip(np.rint((valid[matched] - slots["issued"][due][matched].astype(np.int64)) / 3600),
+                       0, LEAD_HOURS - 1).astype(np.int64)
+        cell = city[matched] * LEAD_HOURS + lead
+
+        totals = state["totals"]
+        if len(totals) < cities:
+            totals = np.concatenate([totals, np.zeros((cities - len(totals), LEAD_HOURS, len(FIELDS), 4))])
+        flat = totals.reshape(-1, len(FIELDS), 4)
+        size = len(flat)
+        for j in range(len(FIELDS)):
+            ok = ~np.isnan(errors[:, j])
+            e, c = errors[ok, j], cell[ok]
+            flat[:, j, COUNT] += np.bincount(c, minlength=size)
+            flat[:, j, SUM] += np.bincount(c, weights=e, minlength=size)
+            flat[:, j, ABS] += np.bincount(c, weights=np.abs(e), minlength=size)
+            flat[:, j, SQUARES] += np.bincount(c, weights=e * e, minlength=size)
+        state["totals"] = totals
+        return matched
+
+    # Results
+
+    def report(self, city: Optional[str] = None, field: str = "temp") -> List[dict]:
+        """Bias, MAE and RMSE of one field per lead hour, for a city or all
+        of them; reads the totals kept by update()"""
+        with self._lock:
+            totals = self._load()["totals"]
+        if city is not None:
+            city_id = self.store.city_ids().get(normalize_city(city))
+            if city_id is None or city_id >= len(totals):
+                return []
+            totals = totals[city_id:city_id + 1]
+        sums = totals[:, :, FIELDS.index(field), :].sum(axis=0)
+        leads = np.flatnonzero(sums[:, COUNT])
+        count = sums[leads, COUNT]
+        bias = sums[leads, SUM] / count
+        mae = sums[leads, ABS] / count
+        rmse = np.sqrt(sums[leads, SQUARES] / count)
+        return [{"lead_hours": int(h), "count": int(n), "bias": round(float(b), 3),
+                 "mae": round(float(m), 3), "rmse": round(float(r), 3)}
+                for h, n, b, m, r in zip(leads, count, bias, mae, rmse)]
+
+
+def _float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
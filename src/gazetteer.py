@@ -0,0 +1,244 @@
+"""Offline city coordinates from the bundled city list.
+
+assets/data/cities.csv is compiled into cities.bin, a flat binary that is
+memory-mapped instead of parsed:
+
+    header   b"WVGZ", version, city count, name bytes, key bytes  (4s I I I I)
+    lat, lon float32[n]                                     city order
+    pop      uint32[n]
+    country  2 bytes per city
+    names    uint32 offsets[n + 1] + UTF-8 blob
+    keys     uint32 offsets[n + 1] + blob of folded names, sorted
+    by_name  uint32[n]  city of each sorted key
+    tree     uint32[n]  implicit k-d tree over unit vectors
+
+Forward lookups bisect the folded names ("Hyderabad,PK" picks the
+country, otherwise the largest city). Reverse lookups search the k-d
+tree on 3D unit vectors, where straight-line distance orders points the
+same way as great-circle distance, so there is no trouble at the poles
+or the date line. Both take microseconds.
+
+build_gazetteer() rewrites the binary; load() does it when the CSV is newer.
+"""
+import bisect
+import csv
+import math
+import mmap
+import struct
+import threading
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from config import CITIES_FILE, GAZETTEER_FILE
+from src.autocomplete import fold
+
+MAGIC = b"WVGZ"
+VERSION = 1
+HEADER = struct.Struct("<4sIIII")
+EARTH_RADIUS_KM = 6371.0088
+
+
+class Place(NamedTuple):
+    name: str
+    country: str
+    lat: float
+    lon: float
+    population: int
+    distance_km: float = 0.0
+
+
+def _unit_vectors(lat, lon) -> np.ndarray:
+    lat, lon = np.radians(lat, dtype=np.float64), np.radians(lon, dtype=np.float64)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def _kd_order(points: np.ndarray) -> np.ndarray:
+    """Permutation laying points out as an implicit k-d tree: the median of each range is its node"""
+    order = np.arange(len(points))
+
+    def split(lo, hi, axis):
+        if hi - lo <= 1:
+            return
+        mid = (lo + hi) // 2
+        part = np.argpartition(points[order[lo:hi], axis], mid - lo)
+        order[lo:hi] = order[lo:hi][part]
+        split(lo, mid, (axis + 1) % 3)
+        split(mid + 1, hi, (axis + 1) % 3)
+
+    split(0, len(points), 0)
+    return order
+
+
+def _strings(values: List[bytes]) -> Tuple[bytes, bytes]:
+    offsets = np.zeros(len(values) + 1, dtype="<u4")
+    offsets[1:] = np.cumsum([len(v) for v in values])
+    return offsets.tobytes(), b"".join(values)
+
+
+def _pack(rows: List[Tuple[str, str, float, float, int]]) -> bytes:
+    lat = np.array([r[2] for r in rows], dtype="<f4")
+    lon = np.array([r[3] for r in rows], dtype="<f4")
+    name_offsets, names = _strings([r[0].encode("utf-8") for r in rows])
+    # Shared names keep the most populous city first
+    by_name = sorted(range(len(rows)), key=lambda i: (fold(rows[i][0]), -rows[i][4]))
+    key_offsets, keys = _strings([fold(rows[i][0]).encode("utf-8") for i in by_name])
+    parts = [
+        HEADER.pack(MAGIC, VERSION, len(rows), len(names), len(keys)),
+        lat.tobytes(), lon.tobytes(),
+        np.array([r[4] for r in rows], dtype="<u4").tobytes(),
+        b"".join(r[1].encode("ascii")[:2].ljust(2) for r in rows),
+        name_offsets, names, key_offsets, keys,
+        np.array(by_name, dtype="<u4").tobytes(),
+        _kd_order(_unit_vectors(lat, lon)).astype("<u4").tobytes(),
+    ]
+    return b"".join(parts)
+
+
+def read_cities_csv(path: Path = CITIES_FILE) -> List[Tuple[str, str, float, float, int]]:
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return [(row["name"].strip(), row.get("country", "").strip().upper(), float(row["lat"]),
+                 float(row["lon"]), int(row.get("population") or 0))
+                for row in csv.DictReader(f) if row["name"].strip()]
+
+
+def build_gazetteer(csv_path: Path = CITIES_FILE, out: Path = GAZETTEER_FILE) -> int:
+    """Compile the city CSV into the binary gazetteer, returns the number of cities"""
+    rows = read_cities_csv(csv_path)
+    data = _pack(rows)
+    tmp = Path(out).with_name(Path(out).name + ".tmp")
+    tmp.write_bytes(data)
+    tmp.replace(out)
+    return len(rows)
+
+
+class _Strings:
+    """Read-only sequence of strings stored as offsets plus a UTF-8 blob"""
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self._offsets = offsets.tolist()
+        self._blob = blob
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return bytes(self._blob[self._offsets[i]:self._offsets[i + 1]]).decode("utf-8")
+
+
+class Gazetteer:
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        magic, version, n, name_bytes, key_bytes = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a gazetteer file")
+        pos = HEADER.size
+
+        def take(dtype, count):
+            nonlocal pos
+            array = np.frombuffer(buffer, dtype=dtype, count=count, offset=pos)
+            pos += array.nbytes
+            return array
+
+        self.lat = take("<f4", n)
+        self.lon = take("<f4", n)
+        self.population = take("<u4", n)
+        self.country = take("S2", n)
+        self.names = _Strings(take("<u4", n + 1), take("u1", name_bytes))
+        self._keys = _Strings(take("<u4", n + 1), take("u1", key_bytes))
+        self._by_name = take("<u4", n)
+        self._tree = take("<u4", n)
+        self._points = None
+
+    @classmethod
+    def open(cls, path: Path = GAZETTEER_FILE) -> "Gazetteer":
+        with open(path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @classmethod
+    def load(cls, path: Path = GAZETTEER_FILE, csv_path: Path = CITIES_FILE) -> Optional["Gazetteer"]:
+        """Map the binary, rebuilding it from the CSV first if it is missing or stale"""
+        path, csv_path = Path(path), Path(csv_path)
+        try:
+            stale = not path.exists() or (csv_path.exists() and csv_path.stat().st_mtime > path.stat().st_mtime)
+            if stale:
+                try:
+                    build_gazetteer(csv_path, path)
+                except OSError:
+                    # Read-only install: keep the table in memory instead
+                    return cls(_pack(read_cities_csv(csv_path)))
+            return cls.open(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Gazetteer load error: {e}")
+            return None
+
+    @classmethod
+    def default(cls) -> Optional["Gazetteer"]:
+        """Process-wide gazetteer, mapped on first use; None if unavailable"""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls.load() or False
+            return cls._default or None
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    def place(self, i: int, distance_km: float = 0.0) -> Place:
+        return Place(self.names[i], self.country[i].decode("ascii").strip(), round(float(self.lat[i]), 4),
+                     round(float(self.lon[i]), 4), int(self.population[i]), distance_km)
+
+    # Forward lookup
+
+    def find(self, query: str) -> Optional[Place]:
+        """City for "Name" or "Name,CC"; the most populous one when the name is shared"""
+        parts = [p.strip() for p in str(query).split(",")]
+        country = parts[-1].upper() if len(parts) > 1 and len(parts[-1]) == 2 else ""
+        key = fold(parts[0])
+        if not key:
+            return None
+        lo = bisect.bisect_left(self._keys, key)
+        candidates = []
+        while lo < len(self._keys) and self._keys[lo] == key:
+            candidates.append(int(self._by_name[lo]))
+            lo += 1
+        if country:
+            candidates = [i for i in candidates if self.country[i].decode("ascii") == country]
+        return self.place(candidates[0]) if candidates else None
+
+    # Reverse lookup
+
+    def nearest(self, lat: float, lon: float) -> Optional[Place]:
+        """Closest city to a point, with its great-circle distance"""
+        if not len(self):
+            return None
+        if self._points is None:
+            xyz = _unit_vectors(self.lat[self._tree], self.lon[self._tree])
+            self._points = (xyz.tolist(), self._tree.tolist())
+        points, cities = self._points
+        target = _unit_vectors([lat], [lon])[0].tolist()
+        best = [math.inf, -1]
+
+        def search(lo, hi, axis):
+            if lo >= hi:
+                return
+            mid = (lo + hi) // 2
+            p = points[mid]
+            d = (p[0] - target[0]) ** 2 + (p[1] - target[1]) ** 2 + (p[2] - target[2]) ** 2
+            if d < best[0]:
+                best[0], best[1] = d, mid
+            diff = target[axis] - p[axis]
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            next_axis = (axis + 1) % 3
+            search(near[0], near[1], next_axis)
+            if diff * diff < best[0]:
+                search(far[0], far[1], next_axis)
+
+        search(0, len(points), 0)
+        chord = math.sqrt(best[0])
+        distance = 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+        return self.place(cities[best[1]], round(distance, 1))
+
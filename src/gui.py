@@ -6,30 +6,42 @@ import requests
 from datetime import datetime
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from src.weather_api import WeatherAPI
 from src.data_handler import DataHandler
-from config import ICON_DIR, BG_DIR, EMAIL_HOST, EMAIL_PORT, EMAIL_USER, EMAIL_PASSWORD
+from src.alerts import AlertEngine, AlertNotifier
+from src.service import WeatherService
+from src.scheduler import PollScheduler
+from src.speech import SpeechService
+from src.mailer import MailQueue
+from src.watchdog import StallWatchdog
+from src.autocomplete import CityIndex
+from src.timezones import local_clock
+from src.models import Observation
+from src import metrics, tracing
+from config import ICON_DIR, BG_DIR, AUTO_REFRESH, METRICS_FILE, TRACE_DIR, WATCHDOG_ENABLED, AUTOCOMPLETE_LIMIT, AUTOCOMPLETE_DEBOUNCE_MS
 import os
-from plyer import notification
-from gtts import gTTS
-import pygame
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import time
 import pandas as pd
 from pathlib import Path
 
+UI_STEP = metrics.histogram("ui_step_seconds", "WeatherApp refresh steps on the Tk thread", ["step"])
+ICON_SECONDS = metrics.histogram("ui_icon_seconds", "Weather icon loading and rendering", ["stage"])
+# Action name -> method, profiled per call when running with --profile
+PROFILED_ACTIONS = {
+    "search": "update_weather",
+    "forecast": "update_forecast",
+    "graph": "show_graph",
+    "table": "show_backup_data",
+    "export": "export_data",
+    "backup": "create_backup",
+    "email": "email_report",
+}
+
 class WeatherApp(tk.Tk):
-    def __init__(self):
+    def __init__(self, profiler=None):
         super().__init__()
         self.title("WeatherVision Pro+")
         self.geometry("1200x800")
         self.minsize(1000, 700)
         
-        # Initialize pygame for sound
-        pygame.mixer.init()
-        
         # Style Configuration
         self.style = ttk.Style()
         self.style.theme_use('clam')
@@ -37,7 +49,28 @@ class WeatherApp(tk.Tk):
         self.theme_mode = "light"
         self.current_city = ""
         self.alerts = []
+        self.upcoming_alerts = []
+        self.notifier = AlertNotifier()
+        self.notify_job = None
         self.current_data = None
+        self.current_observation = None
+        self.diagnostics_window = None
+        self.trace_next = False
+        self.suggest_job = None
+        self.icon_job = None
+        
+        # Speech is rendered and played off the UI thread
+        self.service = WeatherService()
+        self.scheduler = PollScheduler(self.service, units=self.current_unit)
+        self.speech = SpeechService()
+        self.mailer = MailQueue()
+        
+        # Wrap actions before create_widgets binds them to buttons
+        if profiler:
+            profiler.gauges.update(figures=lambda: len(plt.get_fignums()),
+                                   tk_images=lambda: len(self.image_names()))
+            for name, method in PROFILED_ACTIONS.items():
+                setattr(self, method, profiler.wrap(name, getattr(self, method)))
         
         # Configure custom styles
         self.configure_styles()
@@ -46,8 +79,20 @@ class WeatherApp(tk.Tk):
         self.create_widgets()
         DataHandler.init_files()
         
+        # Offline suggestions for the search entry, no network calls
+        self.city_index = CityIndex.build(saved=DataHandler.get_location_usage(),
+                                          history=DataHandler.get_history_cities())
+        
+        # Records where the event loop blocks, listed under Diagnostics
+        self.watchdog = StallWatchdog()
+        if WATCHDOG_ENABLED:
+            self.watchdog.start(self.after)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        
         # Start with default city
         self.after(1000, lambda: self.update_weather("Delhi"))
+        if AUTO_REFRESH:
+            self.after(5000, self.start_auto_refresh)
         
     def configure_styles(self):
         """Configure modern UI styles for both light and dark modes"""
@@ -219,6 +264,73 @@ class WeatherApp(tk.Tk):
         self.search_btn.pack(side=tk.LEFT)
         
         self.city_entry.bind('<Return>', lambda e: self.update_weather())
+        
+        # Suggestions drop down under the entry while typing
+        self.city_entry.bind('<KeyRelease>', self.on_city_typed)
+        self.city_entry.bind('<Down>', self.focus_suggestions)
+        self.city_entry.bind('<Escape>', lambda e: self.hide_suggestions())
+        self.city_entry.bind('<FocusOut>', lambda e: self.after(150, self.hide_unfocused_suggestions), add='+')
+        self.suggestions = []
+        self.suggestion_list = tk.Listbox(self.search_frame, font=('Segoe UI', 11),
+                                          height=AUTOCOMPLETE_LIMIT, activestyle='dotbox')
+        self.suggestion_list.bind('<Return>', self.choose_suggestion)
+        self.suggestion_list.bind('<Double-Button-1>', self.choose_suggestion)
+        self.suggestion_list.bind('<Escape>', lambda e: (self.hide_suggestions(), self.city_entry.focus_set()))
+        self.suggestion_list.bind('<FocusOut>', lambda e: self.hide_suggestions())
+    
+    def on_city_typed(self, event):
+        """Refresh suggestions once typing pauses for AUTOCOMPLETE_DEBOUNCE_MS"""
+        if event.keysym in ('Return', 'Escape', 'Down', 'Up', 'Tab'):
+            return
+        if self.suggest_job:
+            self.after_cancel(self.suggest_job)
+        self.suggest_job = self.after(AUTOCOMPLETE_DEBOUNCE_MS, self.show_suggestions)
+    
+    def show_suggestions(self):
+        self.suggest_job = None
+        text = self.city_entry.get().strip()
+        if not text or text == "Enter city name...":
+            self.hide_suggestions()
+            return
+        self.suggestions = self.city_index.suggest(text)
+        if not self.suggestions:
+            self.hide_suggestions()
+            return
+        self.suggestion_list.delete(0, tk.END)
+        for suggestion in self.suggestions:
+            self.suggestion_list.insert(tk.END, suggestion.label)
+        self.suggestion_list.configure(height=len(self.suggestions))
+        self.suggestion_list.place(in_=self.city_entry, relx=0, rely=1, relwidth=1)
+        self.suggestion_list.lift()
+    
+    def hide_suggestions(self):
+        if self.suggest_job:
+            self.after_cancel(self.suggest_job)
+            self.suggest_job = None
+        self.suggestion_list.place_forget()
+    
+    def hide_unfocused_suggestions(self):
+        if self.focus_get() is not self.suggestion_list:
+            self.hide_suggestions()
+    
+    def focus_suggestions(self, event):
+        if self.suggestions and self.suggestion_list.winfo_ismapped():
+            self.suggestion_list.focus_set()
+            self.suggestion_list.selection_clear(0, tk.END)
+            self.suggestion_list.selection_set(0)
+            self.suggestion_list.activate(0)
+        return "break"
+    
+    def choose_suggestion(self, event):
+        selection = self.suggestion_list.curselection()
+        if not selection:
+            return
+        suggestion = self.suggestions[selection[0]]
+        self.hide_suggestions()
+        self.city_entry.delete(0, tk.END)
+        self.city_entry.insert(0, suggestion.label)
+        self.city_entry.focus_set()
+        self.update_weather(suggestion.query)
     
     def create_forecast_panel(self):
         """5-Day Forecast - horizontal scrollable"""
@@ -308,7 +420,8 @@ class WeatherApp(tk.Tk):
             ("📈 View Graph", self.show_graph),
             ("🗺️ Show Map", self.show_map),
             ("📁 Backup Data", self.show_backup_data),
-            ("📧 Email Report", self.email_report)
+            ("📧 Email Report", self.email_report),
+            ("🩺 Diagnostics", self.show_diagnostics)
         ]
         
         for i, (text, command) in enumerate(features):
@@ -337,6 +450,23 @@ class WeatherApp(tk.Tk):
         self.time_var.set(now)
         self.after(1000, self.update_clock)
     
+    def start_auto_refresh(self):
+        """Keep saved locations fresh in the background"""
+        self.scheduler.start()
+        self.after(30000, self.apply_background_refresh)
+    
+    def apply_background_refresh(self):
+        """Show newer data the scheduler fetched for the current city"""
+        data = self.scheduler.latest(self.current_city) if self.current_city else None
+        if (data and self.current_data and self.scheduler.units == self.current_unit
+                and data.get('dt', 0) > self.current_data.get('dt', 0)):
+            self.current_data = data
+            self.current_observation = Observation.from_payload(data, self.current_city)
+            self.display_weather(self.current_observation)
+            self.check_weather_alerts(self.current_observation)
+            self.status_var.set(f"🔄 Weather refreshed for {self.current_city}")
+        self.after(30000, self.apply_background_refresh)
+    
     def clear_placeholder(self, event):
         if self.city_entry.get() == "Enter city name...":
             self.city_entry.delete(0, tk.END)
@@ -347,187 +477,249 @@ class WeatherApp(tk.Tk):
             self.city_entry.insert(0, "Enter city name...")
             self.city_entry.configure(foreground='gray')
     
+    @UI_STEP.timed(step="update_weather")
     def update_weather(self, city=None):
+        self.hide_suggestions()
         city = city or self.city_entry.get().strip()
         if not city or city == "Enter city name...":
             messagebox.showerror("Error", "Please enter a city name")
             return
+        
+        with tracing.trace("search", force=self.trace_next, city=city, units=self.current_unit) as trace:
+            self.trace_next = False
+            try:
+                self.status_var.set(f"🌍 Fetching weather for {city}...")
+                self.update_idletasks()
             
-        try:
-            self.status_var.set(f"🌍 Fetching weather for {city}...")
-            self.update_idletasks()
-            
-            current_data = WeatherAPI.get_weather(city, self.current_unit)
+                with UI_STEP.time(step="fetch"), tracing.span("fetch"):
+                    current_data = self.service.current(city, self.current_unit)
             
-            if current_data.get("cod") != 200:
-                messagebox.showerror("Error", current_data.get("message", "Unknown error"))
-                return
+                if current_data.get("cod") != 200:
+                    messagebox.showerror("Error", current_data.get("message", "Unknown error"))
+                    return
                 
-            self.current_city = city
-            self.current_data = current_data
-            self.display_weather(current_data)
-            DataHandler.save_location(city)
-            DataHandler.log_weather(city, current_data)
+                self.current_city = city
+                self.current_data = current_data
+                # Parsed once; display, history, alerts, speech and email all read it
+                observation = self.current_observation = Observation.from_payload(current_data, city)
+                self.city_index.record_use(city)
+                with UI_STEP.time(step="display"), tracing.span("display"):
+                    self.display_weather(observation)
+                with UI_STEP.time(step="record"):
+                    self.service.record(city, observation, units=self.current_unit)
             
-            self.update_forecast()
-            self.check_weather_alerts(current_data)
+                with tracing.span("forecast"):
+                    self.update_forecast()
+                with UI_STEP.time(step="alerts"), tracing.span("alerts"):
+                    self.check_weather_alerts(observation)
             
-            self.status_var.set(f"✅ Weather data loaded for {city}")
-            self.last_update = datetime.now().strftime("%H:%M:%S")
+                self.status_var.set(f"✅ Weather data loaded for {city}")
+                self.last_update = datetime.now().strftime("%H:%M:%S")
+                if trace.trace_id:
+                    # Close the trace once Tk has drawn the result
+                    trace.finish_later()
+                    paint = tracing.start_span("paint")
+                    self.after_idle(lambda: (paint.finish(), trace.finish()))
             
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to fetch weather: {str(e)}")
-            self.status_var.set("❌ Error fetching weather data")
+            except Exception as e:
+                trace.set(error=str(e))
+                messagebox.showerror("Error", f"Failed to fetch weather: {str(e)}")
+                self.status_var.set("❌ Error fetching weather data")
     
-    def display_weather(self, data):
-        self.city_label.config(text=f"{data['name']}, {data['sys']['country']}")
+    def display_weather(self, obs):
+        obs = obs if isinstance(obs, Observation) else Observation.from_payload(obs)
+        self.city_label.config(text=f"{obs.name}, {obs.country}")
         self.time_label.config(text=datetime.now().strftime("%H:%M | %a %d %b"))
         
         unit = "°C" if self.current_unit == "metric" else "°F"
-        self.temp_label.config(text=f"{data['main']['temp']:.1f}{unit}")
+        self.temp_label.config(text=f"{obs.temp:.1f}{unit}")
         
-        icon_code = data['weather'][0]['icon']
-        self.update_weather_icon(icon_code)
+        self.update_weather_icon(obs.icon)
         
-        self.humidity_var.set(f"{data['main']['humidity']}%")
-        self.wind_var.set(f"{data['wind']['speed']} m/s")
-        self.pressure_var.set(f"{data['main']['pressure']} hPa")
-        self.visibility_var.set(f"{data.get('visibility', 0)/1000:.1f} km")
+        na = lambda value, fmt: fmt.format(value) if value is not None else "N/A"
+        self.humidity_var.set(na(obs.humidity, "{}%"))
+        self.wind_var.set(na(obs.wind_speed, "{} m/s"))
+        self.pressure_var.set(na(obs.pressure, "{} hPa"))
+        self.visibility_var.set(na(obs.visibility_km, "{:.1f} km"))
         
-        sunrise = datetime.fromtimestamp(data['sys']['sunrise']).strftime("%H:%M")
-        sunset = datetime.fromtimestamp(data['sys']['sunset']).strftime("%H:%M")
-        self.sunrise_var.set(sunrise)
-        self.sunset_var.set(sunset)
+        # In the city's own time zone, not this machine's
+        self.sunrise_var.set(local_clock(obs.sunrise, obs) if obs.sunrise else "N/A")
+        self.sunset_var.set(local_clock(obs.sunset, obs) if obs.sunset else "N/A")
     
     def update_weather_icon(self, icon_code):
         icon_path = ICON_DIR / f"{icon_code}.png"
         
         try:
             if icon_path.exists():
-                img = Image.open(icon_path)
+                with ICON_SECONDS.time(stage="load"):
+                    img = Image.open(icon_path)
+                    img.load()
             else:
-                icon_url = f"http://openweathermap.org/img/wn/{icon_code}@4x.png"
-                response = requests.get(icon_url, stream=True)
-                img = Image.open(io.BytesIO(response.content))
-                img.save(icon_path)
+                with ICON_SECONDS.time(stage="download"):
+                    icon_url = f"http://openweathermap.org/img/wn/{icon_code}@4x.png"
+                    response = requests.get(icon_url, stream=True)
+                    img = Image.open(io.BytesIO(response.content))
+                    img.save(icon_path)
             
             if self.theme_mode == "dark":
                 img = ImageOps.invert(img.convert('RGB'))
             
-            for size in range(50, 151, 10):
+            # A newer icon replaces one still growing
+            if self.icon_job:
+                self.after_cancel(self.icon_job)
+            self.animate_icon(img, icon_code, 50)
+                
+        except Exception as e:
+            print(f"Error loading icon: {e}")
+    
+    def animate_icon(self, img, icon_code, size):
+        """Show one frame of the growing icon and schedule the next, so the
+        event loop keeps running between frames"""
+        self.icon_job = None
+        try:
+            with ICON_SECONDS.time(stage="resize"), tracing.span("icon_render", icon=icon_code, size=size):
                 resized = img.resize((size, size), Image.LANCZOS)
                 self.weather_photo = ImageTk.PhotoImage(resized)
-                self.weather_icon.config(image=self.weather_photo)
-                self.update_idletasks()
-                time.sleep(0.02)
-                
+            self.weather_icon.config(image=self.weather_photo)
         except Exception as e:
             print(f"Error loading icon: {e}")
+            return
+        if size < 150:
+            self.icon_job = self.after(20, lambda: self.animate_icon(img, icon_code, size + 10))
     
     def update_forecast(self):
         try:
-            forecast = WeatherAPI.get_forecast(self.current_city, units=self.current_unit)
+            with UI_STEP.time(step="forecast_fetch"):
+                forecast = self.service.forecast(self.current_city, units=self.current_unit)
+            self.queue_forecast_alerts(forecast['alerts'])
+            self.render_forecast(forecast['days'])
             
-            for widget in self.forecast_inner.winfo_children():
-                widget.destroy()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load forecast: {str(e)}")
+    
+    @UI_STEP.timed(step="forecast_render")
+    @tracing.traced("forecast_render")
+    def render_forecast(self, days):
+        """Rebuild the forecast cards, one per day"""
+        for widget in self.forecast_inner.winfo_children():
+            widget.destroy()
+        
+        for day_data in days:
+            day_frame = ttk.Frame(self.forecast_inner, style='Card.TFrame')
+            day_frame.pack(side=tk.LEFT, padx=10, pady=5, ipadx=10, ipady=10)
             
-            for i in range(0, len(forecast['list']), 8):
-                day_data = forecast['list'][i]
-                day_frame = ttk.Frame(self.forecast_inner, style='Card.TFrame')
-                day_frame.pack(side=tk.LEFT, padx=10, pady=5, ipadx=10, ipady=10)
-                
-                date = datetime.strptime(day_data['dt_txt'], "%Y-%m-%d %H:%M:%S")
-                ttk.Label(day_frame, 
-                         text=date.strftime("%a\n%d %b"), 
-                         font=('Segoe UI', 10, 'bold')).pack()
-                
-                icon_code = day_data['weather'][0]['icon']
-                icon_path = ICON_DIR / f"{icon_code}.png"
-                if icon_path.exists():
+            date = datetime.strptime(day_data['dt_txt'], "%Y-%m-%d %H:%M:%S")
+            ttk.Label(day_frame, 
+                     text=date.strftime("%a\n%d %b"), 
+                     font=('Segoe UI', 10, 'bold')).pack()
+            
+            icon_code = day_data['weather'][0]['icon']
+            icon_path = ICON_DIR / f"{icon_code}.png"
+            if icon_path.exists():
+                with ICON_SECONDS.time(stage="forecast_icon"):
                     img = Image.open(icon_path)
                     img = img.resize((60, 60), Image.LANCZOS)
                     if self.theme_mode == "dark":
                         img = ImageOps.invert(img.convert('RGB'))
                     icon = ImageTk.PhotoImage(img)
-                    icon_label = ttk.Label(day_frame, image=icon)
-                    icon_label.image = icon
-                    icon_label.pack()
-                
-                temp = day_data['main']['temp']
-                unit = "°C" if self.current_unit == "metric" else "°F"
-                ttk.Label(day_frame, 
-                         text=f"{temp:.1f}{unit}", 
-                         font=('Segoe UI', 12, 'bold')).pack()
-                
-                ttk.Label(day_frame, 
-                         text=day_data['weather'][0]['description'].title(),
-                         font=('Segoe UI', 9)).pack()
+                icon_label = ttk.Label(day_frame, image=icon)
+                icon_label.image = icon
+                icon_label.pack()
             
-            self.forecast_inner.update_idletasks()
-            self.forecast_canvas.config(scrollregion=self.forecast_canvas.bbox('all'))
+            temp = day_data['main']['temp']
+            unit = "°C" if self.current_unit == "metric" else "°F"
+            ttk.Label(day_frame, 
+                     text=f"{temp:.1f}{unit}", 
+                     font=('Segoe UI', 12, 'bold')).pack()
             
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load forecast: {str(e)}")
-    
-    def check_weather_alerts(self, data):
-        self.alerts = []
-        
-        temp = data['main']['temp']
-        if temp > 35:
-            self.alerts.append(f"High temperature warning: {temp}°C")
-        elif temp < 5:
-            self.alerts.append(f"Low temperature warning: {temp}°C")
-        
-        condition = data['weather'][0]['main']
-        if condition in ['Thunderstorm', 'Extreme']:
-            self.alerts.append(f"Weather alert: {condition}")
-        
-        wind_speed = data['wind']['speed']
-        if wind_speed > 10:
-            self.alerts.append(f"High wind warning: {wind_speed} m/s")
+            ttk.Label(day_frame, 
+                     text=day_data['weather'][0]['description'].title(),
+                     font=('Segoe UI', 9)).pack()
         
-        if self.alerts:
+        self.forecast_inner.update_idletasks()
+        self.forecast_canvas.config(scrollregion=self.forecast_canvas.bbox('all'))
+    
+    def check_weather_alerts(self, obs):
+        # Raw payloads keep their old contract: a missing section is an error
+        strict = not isinstance(obs, Observation)
+        fired = AlertEngine.default().alerts([obs], strict=strict, units=self.current_unit)
+        if strict:
+            obs = Observation.from_payload(obs)
+        self.alerts = [alert.message for alert in fired]
+        
+        if self.alerts or self.upcoming_alerts:
             self.alerts_btn.config(style='Warning.TButton')
-            notification.notify(
-                title="Weather Alerts",
-                message="\n".join(self.alerts),
-                timeout=10
-            )
         else:
             self.alerts_btn.config(style='TButton')
+        
+        if fired:
+            city = obs.name or self.current_city
+            self.notifier.submit(city, [
+                {"rule": alert.rule, "message": alert.message, "start": obs.dt}
+                for alert in fired
+            ], flush=False)
+        self.flush_notifications()
+    
+    def queue_forecast_alerts(self, events):
+        """Queue alerts for threshold crossings anywhere in the forecast"""
+        self.upcoming_alerts = []
+        for event in events:
+            when = datetime.fromtimestamp(event['start']).strftime("%a %d %b %H:%M")
+            self.upcoming_alerts.append(dict(event, message=f"{when} - {event['message']}"))
+        if self.upcoming_alerts:
+            self.notifier.submit(self.current_city, self.upcoming_alerts, flush=False)
+    
+    def flush_notifications(self):
+        """Send coalesced notifications, retrying once the rate limit allows"""
+        if self.notify_job:
+            self.after_cancel(self.notify_job)
+            self.notify_job = None
+        self.notifier.flush()
+        delay = self.notifier.pending_delay()
+        if delay:
+            self.notify_job = self.after(int(delay * 1000) + 100, self.flush_notifications)
     
     def show_alerts(self):
-        if self.alerts:
-            alert_text = "\n\n• ".join([""] + self.alerts)
+        upcoming = [f"Upcoming {event['message']}" for event in self.upcoming_alerts]
+        if self.alerts or upcoming:
+            alert_text = "\n\n• ".join([""] + self.alerts + upcoming)
             messagebox.showwarning("Weather Alerts", alert_text)
         else:
             messagebox.showinfo("Weather Alerts", "No active weather alerts")
     
     def speak_weather(self):
-        if not hasattr(self, 'current_data'):
+        if self.speech.is_speaking:
+            self.speech.stop()
+            return
+        if not self.current_observation:
             messagebox.showerror("Error", "No weather data available")
             return
             
         try:
-            data = self.current_data
-            text = f"Current weather in {data['name']}: {data['weather'][0]['description']}. "
-            text += f"Temperature is {data['main']['temp']} degrees {'Celsius' if self.current_unit == 'metric' else 'Fahrenheit'}. "
-            text += f"Humidity is {data['main']['humidity']} percent. "
-            text += f"Wind speed is {data['wind']['speed']} meters per second."
-            
-            tts = gTTS(text=text, lang='en', slow=False)
-            
-            with io.BytesIO() as f:
-                tts.write_to_fp(f)
-                f.seek(0)
-                pygame.mixer.music.load(f)
-                pygame.mixer.music.play()
-                
-                while pygame.mixer.music.get_busy():
-                    time.sleep(0.1)
+            obs = self.current_observation
+            text = f"Current weather in {obs.name}: {obs.description}. "
+            text += f"Temperature is {obs.temp} degrees {'Celsius' if self.current_unit == 'metric' else 'Fahrenheit'}. "
+            if obs.humidity is not None:
+                text += f"Humidity is {obs.humidity} percent. "
+            if obs.wind_speed is not None:
+                text += f"Wind speed is {obs.wind_speed} meters per second."
+            
+            self.speech.speak(text, lang='en', slow=False)
+            self.voice_btn.config(text="⏹")
+            self.after(200, self.poll_speech)
                     
         except Exception as e:
             messagebox.showerror("Voice Error", f"Failed to generate speech: {str(e)}")
+    
+    def poll_speech(self):
+        """Reset the voice button and report errors from the speech worker"""
+        while not self.speech.errors.empty():
+            error = self.speech.errors.get()
+            messagebox.showerror("Voice Error", f"Failed to generate speech: {str(error)}")
+        if self.speech.is_speaking:
+            self.after(200, self.poll_speech)
+        else:
+            self.voice_btn.config(text="🔊")
 
     def show_graph(self):
         try:
@@ -537,7 +729,7 @@ class WeatherApp(tk.Tk):
                 return
             
             fig, ax = plt.subplots(figsize=(8, 4))
-            history['timestamp'] = pd.to_datetime(history['timestamp'])
+            history['timestamp'] = pd.to_datetime(history['timestamp'], format="ISO8601")
             history.plot(x='timestamp', y='temp', ax=ax, legend=False)
             
             ax.set_title(f"Temperature Trend for {self.current_city}")
@@ -610,13 +802,16 @@ class WeatherApp(tk.Tk):
             table_frame.rowconfigure(0, weight=1)
             table_frame.columnconfigure(0, weight=1)
             
-            # Add export button
+            # Add export and backup buttons
+            buttons = ttk.Frame(backup_window)
+            buttons.pack(pady=10)
             export_btn = ttk.Button(
-                backup_window, 
+                buttons, 
                 text="Export to CSV", 
                 command=lambda: self.export_data(history)
             )
-            export_btn.pack(pady=10)
+            export_btn.pack(side=tk.LEFT, padx=5)
+            ttk.Button(buttons, text="Create Backup", command=self.create_backup).pack(side=tk.LEFT, padx=5)
             
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load backup data: {str(e)}")
@@ -635,8 +830,16 @@ class WeatherApp(tk.Tk):
         except Exception as e:
             messagebox.showerror("Error", f"Failed to export data: {str(e)}")
     
+    def create_backup(self):
+        """Zip saved locations, history and daily stats into the backups folder"""
+        backup_path = DataHandler.create_backup()
+        if backup_path:
+            messagebox.showinfo("Success", f"Backup saved to {backup_path}")
+        else:
+            messagebox.showerror("Error", "Failed to create backup")
+    
     def email_report(self):
-        if not hasattr(self, 'current_data'):
+        if not self.current_observation:
             messagebox.showerror("Error", "No weather data to send")
             return
             
@@ -654,7 +857,7 @@ class WeatherApp(tk.Tk):
             email_dialog.geometry(f'+{x}+{y}')
             
             # Email content
-            ttk.Label(email_dialog, text="Recipient Email:").pack(pady=(0, 5))
+            ttk.Label(email_dialog, text="Recipient Emails (comma separated):").pack(pady=(0, 5))
             recipient_entry = ttk.Entry(email_dialog, width=40)
             recipient_entry.pack(pady=(0, 15))
             
@@ -663,47 +866,29 @@ class WeatherApp(tk.Tk):
             subject_entry = ttk.Entry(email_dialog, textvariable=subject_var, width=40)
             subject_entry.pack(pady=(0, 15))
             
+            all_cities_var = tk.BooleanVar(value=False)
+            ttk.Checkbutton(email_dialog, text="Include all saved locations",
+                            variable=all_cities_var).pack()
+            
             def send_email():
-                recipient = recipient_entry.get().strip()
+                recipients = [r.strip() for r in recipient_entry.get().split(",") if r.strip()]
                 subject = subject_entry.get().strip()
                 
-                if not recipient:
+                if not recipients:
                     messagebox.showerror("Error", "Please enter recipient email")
                     return
                 
-                try:
-                    data = self.current_data
-                    msg = MIMEMultipart()
-                    msg['Subject'] = subject
-                    msg['From'] = EMAIL_USER
-                    msg['To'] = recipient
-                    
-                    html = f"""
-                    <h1>Weather Report for {data['name']}, {data['sys']['country']}</h1>
-                    <p><strong>Conditions:</strong> {data['weather'][0]['description']}</p>
-                    <p><strong>Temperature:</strong> {data['main']['temp']}°{'C' if self.current_unit == 'metric' else 'F'}</p>
-                    <p><strong>Feels Like:</strong> {data['main']['feels_like']}°{'C' if self.current_unit == 'metric' else 'F'}</p>
-                    <p><strong>Humidity:</strong> {data['main']['humidity']}%</p>
-                    <p><strong>Wind Speed:</strong> {data['wind']['speed']} m/s</p>
-                    <p><strong>Pressure:</strong> {data['main']['pressure']} hPa</p>
-                    <p><strong>Visibility:</strong> {data.get('visibility', 'N/A')} meters</p>
-                    <p><strong>Sunrise:</strong> {datetime.fromtimestamp(data['sys']['sunrise']).strftime('%H:%M')}</p>
-                    <p><strong>Sunset:</strong> {datetime.fromtimestamp(data['sys']['sunset']).strftime('%H:%M')}</p>
-                    <p><strong>Report Time:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M')}</p>
-                    """
-                    
-                    msg.attach(MIMEText(html, 'html'))
-                    
-                    with smtplib.SMTP(EMAIL_HOST, EMAIL_PORT) as server:
-                        server.starttls()
-                        server.login(EMAIL_USER, EMAIL_PASSWORD)
-                        server.send_message(msg)
-                    
-                    messagebox.showinfo("Success", f"Email sent to {recipient}")
-                    email_dialog.destroy()
-                    
-                except Exception as e:
-                    messagebox.showerror("Error", f"Failed to send email: {str(e)}")
+                if all_cities_var.get():
+                    unit = self.current_unit
+                    cities = DataHandler.get_saved_locations()
+                    payloads = lambda: [self.service.current(city, unit) for city in cities]
+                else:
+                    payloads = [self.current_observation]
+                
+                future = self.mailer.send_report(recipients, subject, payloads, self.current_unit)
+                send_btn.config(state='disabled')
+                self.status_var.set("📧 Sending email report...")
+                self.after(200, lambda: self.wait_for_email(future, email_dialog, send_btn))
             
             send_btn = ttk.Button(email_dialog, text="Send Email", command=send_email)
             send_btn.pack(pady=(10, 0))
@@ -713,6 +898,119 @@ class WeatherApp(tk.Tk):
         except Exception as e:
             messagebox.showerror("Error", f"Failed to create email dialog: {str(e)}")
     
+    def wait_for_email(self, future, email_dialog, send_btn):
+        """Poll a queued email report without blocking the UI"""
+        if not future.done():
+            self.after(200, lambda: self.wait_for_email(future, email_dialog, send_btn))
+            return
+        try:
+            recipients = future.result()
+            self.status_var.set("✅ Email report sent")
+            messagebox.showinfo("Success", f"Email sent to {', '.join(recipients)}")
+            if email_dialog.winfo_exists():
+                email_dialog.destroy()
+        except Exception as e:
+            self.status_var.set("❌ Error sending email")
+            messagebox.showerror("Error", f"Failed to send email: {str(e)}")
+            if send_btn.winfo_exists():
+                send_btn.config(state='normal')
+    
+    def show_diagnostics(self):
+        """Live table of metrics, refreshed every 2 seconds while open"""
+        if self.diagnostics_window is not None and self.diagnostics_window.winfo_exists():
+            self.diagnostics_window.lift()
+            return
+        if not metrics.REGISTRY.enabled:
+            messagebox.showinfo("Diagnostics", "Metrics are disabled (WEATHERVISION_METRICS=0)")
+            return
+        
+        window = tk.Toplevel(self)
+        window.title("Diagnostics")
+        window.geometry("900x500")
+        self.diagnostics_window = window
+        
+        table_frame = ttk.Frame(window)
+        table_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        columns = ("metric", "labels", "count", "mean", "p95", "total")
+        tree = ttk.Treeview(table_frame, columns=columns, show="headings")
+        for col, width in zip(columns, (240, 220, 80, 100, 100, 100)):
+            tree.heading(col, text=col.title())
+            tree.column(col, width=width, anchor='w' if col in ("metric", "labels") else 'e')
+        vsb = ttk.Scrollbar(table_frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=vsb.set)
+        tree.grid(row=0, column=0, sticky="nsew")
+        vsb.grid(row=0, column=1, sticky="ns")
+        table_frame.rowconfigure(0, weight=1)
+        table_frame.columnconfigure(0, weight=1)
+        
+        stall_frame = ttk.LabelFrame(window, text="UI stalls by call site")
+        stall_frame.pack(fill=tk.X, padx=10)
+        stall_columns = ("site", "count", "total", "worst")
+        stalls = ttk.Treeview(stall_frame, columns=stall_columns, show="headings", height=6)
+        for col, width in zip(stall_columns, (520, 80, 100, 100)):
+            stalls.heading(col, text=col.title())
+            stalls.column(col, width=width, anchor='w' if col == "site" else 'e')
+        stalls.pack(fill=tk.X)
+        
+        buttons = ttk.Frame(window)
+        buttons.pack(pady=10)
+        ttk.Button(buttons, text="Save Prometheus File", command=self.save_metrics).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Reset", command=self.reset_diagnostics).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Trace Next Search", command=self.arm_trace).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Export Trace", command=self.export_trace).pack(side=tk.LEFT, padx=5)
+        
+        self.refresh_diagnostics(tree, stalls)
+    
+    def refresh_diagnostics(self, tree, stalls):
+        if self.diagnostics_window is None or not self.diagnostics_window.winfo_exists():
+            return
+        tree.delete(*tree.get_children())
+        for row in metrics.REGISTRY.rows():
+            if row["kind"] == "histogram":
+                # Durations are shown in milliseconds
+                values = (row["name"], row["labels"], row["count"], f"{row['mean'] * 1000:.2f} ms",
+                          f"{row['p95'] * 1000:.2f} ms", f"{row['total']:.3f} s")
+            else:
+                values = (row["name"], row["labels"], f"{row['value']:g}", "", "", "")
+            tree.insert("", tk.END, values=values)
+        stalls.delete(*stalls.get_children())
+        for row in self.watchdog.report():
+            stalls.insert("", tk.END, values=(row["site"], row["count"], f"{row['total'] * 1000:.0f} ms",
+                                              f"{row['worst'] * 1000:.0f} ms"))
+        self.after(2000, lambda: self.refresh_diagnostics(tree, stalls))
+    
+    def reset_diagnostics(self):
+        metrics.REGISTRY.reset()
+        self.watchdog.reset()
+    
+    def save_metrics(self):
+        metrics.REGISTRY.write(METRICS_FILE)
+        self.status_var.set(f"📊 Metrics saved to {METRICS_FILE}")
+    
+    def arm_trace(self):
+        """Trace the next search regardless of the sample rate"""
+        self.trace_next = True
+        self.status_var.set("🔍 The next search will be traced")
+    
+    def export_trace(self):
+        if not tracing.TRACER.trace_ids():
+            messagebox.showinfo("Diagnostics", "No traces recorded yet")
+            return
+        path = TRACE_DIR / f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        try:
+            tracing.export(path)
+            self.status_var.set(f"🔍 Trace saved to {path} (open in ui.perfetto.dev)")
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to export trace: {str(e)}")
+    
+    def on_close(self):
+        self.scheduler.stop()
+        self.speech.stop()
+        # Queued emails are still sent before the window goes away
+        self.mailer.close()
+        self.watchdog.stop()
+        self.destroy()
+    
     def show_map(self):
         messagebox.showinfo("Map", "Weather map feature coming soon!")
     
@@ -764,8 +1062,8 @@ class WeatherApp(tk.Tk):
             self.city_entry.configure(foreground='gray' if self.theme_mode == 'light' else '#aaaaaa')
         
         # Update weather icon if data exists
-        if hasattr(self, 'current_data'):
-            self.update_weather_icon(self.current_data['weather'][0]['icon'])
+        if self.current_observation:
+            self.update_weather_icon(self.current_observation.icon)
     
     def blend_colors(self, color1, color2, alpha):
         """Helper for color transitions"""
@@ -0,0 +1,267 @@
+"""Write-behind appends to weather_history.csv, safe across processes.
+
+Observations are buffered in memory and appended in one group commit
+when HISTORY_BATCH_ROWS are pending or the oldest has waited
+HISTORY_FLUSH_SECONDS. Every commit holds an advisory lock on
+<file>.lock (flock, or msvcrt on Windows), so kiosks and a scheduled
+poller sharing one file never lose rows. Whole-file rewrites such as
+clear_history take the same lock.
+
+RecentKeys remembers the keys of the last rows logged, so DataHandler
+can drop a reading that was already logged without reading the file.
+"""
+import atexit
+import csv
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Hashable, Iterable, List, Optional, Tuple
+
+from config import (HISTORY_BATCH_ROWS, HISTORY_FLUSH_SECONDS, HISTORY_FSYNC,
+                    HISTORY_FSYNC_INTERVAL, WEATHER_HISTORY)
+from src import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+HISTORY_COLUMNS = ["city", "temp", "humidity", "conditions", "pressure", "wind_speed", "visibility", "timestamp"]
+
+COMMIT_SECONDS = metrics.histogram("history_commit_seconds", "Locked group commits to the history CSV")
+COMMIT_ROWS = metrics.histogram("history_commit_rows", "Rows per history group commit",
+                                buckets=(1, 5, 10, 25, 50, 100, 200, 500, 1000, 5000))
+
+
+@contextmanager
+def file_lock(path: Path):
+    """Exclusive advisory lock shared by every process using path"""
+    lock_path = Path(path).with_name(Path(path).name + ".lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, 'a+b') as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK gives up after 10 attempts; keep waiting
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def file_signature(path: Path) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) of a file, None if it does not exist; tells a
+    process whether another one has changed the file"""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def atomic_write(path: Path, text: str):
+    """Replace a file's contents so readers see the old or the new file, never half of one"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def append_rows(path: Path, rows: List[dict], fsync: bool = True,
+                columns: List[str] = HISTORY_COLUMNS) -> int:
+    """Append rows in the file's own column order, or columns for a new file;
+    the caller holds file_lock"""
+    with open(path, 'a+b') as f:
+        f.seek(0)
+        first = f.readline().decode('utf-8').strip()
+        header = next(csv.reader([first])) if first else None
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=header or columns,
+                                extrasaction='ignore', lineterminator='\n')
+        if header is None:
+            writer.writeheader()
+        else:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) not in (b'\n', b'\r'):
+                out.write('\n')
+        writer.writerows(rows)
+        f.write(out.getvalue().encode('utf-8'))
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+    return len(rows)
+
+
+def tail_rows(path: Path, max_rows: int, row_bytes: int = 128) -> List[dict]:
+    """Roughly the last max_rows rows of a CSV, reading only the end of the file"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.readline()
+            start = max(f.tell(), os.fstat(f.fileno()).st_size - max_rows * row_bytes)
+            f.seek(start)
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    if start > len(header):
+        data = data[data.find(b"\n") + 1:]  # first line is probably partial
+    text = header.decode('utf-8') + data.decode('utf-8', errors='replace')
+    return list(csv.DictReader(io.StringIO(text)))[-max_rows:]
+
+
+class RecentKeys:
+    """The last capacity keys seen, oldest forgotten first"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add_new(self, keys: Iterable[Hashable]) -> List[bool]:
+        """Remember keys; for each, whether it was not seen before
+        (a repeat within the same call counts as seen)"""
+        with self._lock:
+            fresh = []
+            for key in keys:
+                if key in self._keys:
+                    self._keys.move_to_end(key)
+                    fresh.append(False)
+                else:
+                    self._keys[key] = None
+                    fresh.append(True)
+            while len(self._keys) > self.capacity:
+                self._keys.popitem(last=False)
+            return fresh
+
+
+class HistoryWriter:
+    """In-memory buffer of history rows flushed in group commits"""
+    _default = None
+
+    def __init__(self, path: Path = None, batch_rows: int = HISTORY_BATCH_ROWS,
+                 flush_seconds: float = HISTORY_FLUSH_SECONDS, fsync: str = HISTORY_FSYNC,
+                 fsync_interval: float = HISTORY_FSYNC_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic):
+        if fsync not in ("commit", "interval", "never"):
+            raise ValueError(f"unknown fsync policy {fsync!r}")
+        self.path = Path(path or WEATHER_HISTORY)
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_seconds
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.clock = clock
+        self.commits = 0
+        self._pending: List[dict] = []
+        self._oldest = 0.0
+        self._synced_at = clock()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def default(cls, path: Path = None) -> "HistoryWriter":
+        """Process-wide writer used by DataHandler; another path closes the old one"""
+        path = Path(path or WEATHER_HISTORY)
+        if cls._default is not None and cls._default.path != path:
+            cls._default.close()
+            cls._default = None
+        if cls._default is None:
+            cls._default = cls(path)
+            atexit.register(cls._default.close)
+        return cls._default
+
+    @classmethod
+    def flush_default(cls) -> int:
+        """Commit the process-wide writer's rows, if there is one"""
+        return cls._default.flush() if cls._default is not None else 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def submit(self, rows: List[dict]):
+        """Queue rows; commits in the caller once a full batch is pending"""
+        if not rows:
+            return
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("history writer is closed")
+            if not self._pending:
+                self._oldest = self.clock()
+            self._pending.extend(rows)
+            full = len(self._pending) >= self.batch_rows
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        if full:
+            self.flush()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                delay = self._oldest + self.flush_seconds - self.clock()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+            self.flush()
+
+    def _sync_now(self) -> bool:
+        if self.fsync == "commit":
+            return True
+        if self.fsync == "interval" and self.clock() - self._synced_at >= self.fsync_interval:
+            self._synced_at = self.clock()
+            return True
+        return False
+
+    def flush(self) -> int:
+        """Commit everything pending now, returns rows written"""
+        with self._flush_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                with COMMIT_SECONDS.time(), file_lock(self.path):
+                    append_rows(self.path, batch, fsync=self._sync_now())
+            except Exception as e:
+                print(f"History commit error: {e}")
+                with self._cond:
+                    # Keep the rows and retry after another flush_seconds
+                    self._pending[:0] = batch
+                    self._oldest = self.clock()
+                return 0
+            self.commits += 1
+            COMMIT_ROWS.observe(len(batch))
+            return len(batch)
+
+    def close(self):
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
@@ -0,0 +1,207 @@
+"""Saved locations with O(1) membership, MRU order and usage counts.
+
+The index lives in memory, keyed by normalize_city(). Changes are appended
+to a journal next to saved_locations.json, one JSON line per change.
+Every LOCATIONS_COMPACT_OPS changes the journal is folded into the JSON
+file. The JSON file is replaced atomically and keeps its "locations"
+list, so older versions can still read it. Other processes' changes are
+picked up when the journal or snapshot changes on disk. All writes hold
+the same file_lock as the snapshot.
+
+    {"locations": ["Lahore", "Karachi"], "usage": {"lahore": [12, 1716451200.0], ...}}
+    ["+", "Lahore", 1716451260.0]      journal: used / saved
+    ["-", "Karachi", 1716451300.0]     journal: removed
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, List
+
+from config import LOCATIONS_COMPACT_OPS, SAVED_LOCATIONS
+from src.daily_stats import normalize_city
+from src.history_writer import atomic_write, file_lock, file_signature
+
+
+class Location:
+    __slots__ = ("name", "count", "last_used")
+
+    def __init__(self, name: str, count: int = 0, last_used: float = 0.0):
+        self.name = name
+        self.count = count
+        self.last_used = last_used
+
+
+class LocationIndex:
+    _default = None
+
+    def __init__(self, path: Path = SAVED_LOCATIONS, compact_ops: int = LOCATIONS_COMPACT_OPS,
+                 clock: Callable[[], float] = time.time):
+        self.path = Path(path)
+        self.journal = self.path.with_suffix(".journal")
+        self.compact_ops = compact_ops
+        self.clock = clock
+        # Least recently used first, so a use is move_to_end
+        self._entries: "OrderedDict[str, Location]" = OrderedDict()
+        self._snapshot_sig = None
+        self._offset = 0
+        self._journal_ops = 0
+        self._lock = threading.RLock()
+        self._loaded = False
+
+    @classmethod
+    def default(cls, path: Path = None) -> "LocationIndex":
+        """Process-wide index used by DataHandler; another path starts a new one"""
+        path = Path(path or SAVED_LOCATIONS)
+        if cls._default is None or cls._default.path != path:
+            cls._default = cls(path)
+        return cls._default
+
+    # Loading and syncing with other processes
+
+    def _load_snapshot(self):
+        self._entries.clear()
+        self._snapshot_sig = file_signature(self.path)
+        self._offset = 0
+        self._journal_ops = 0
+        if self._snapshot_sig is None:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Saved locations load error: {e}")
+            return
+        usage = data.get("usage")
+        names = data.get("locations", [])
+        # Snapshots list the most recent first; older files list cities in the order they were saved
+        for name in (reversed(names) if usage is not None else names):
+            key = normalize_city(name)
+            if key and key not in self._entries:
+                count, last_used = (usage or {}).get(key, (0, 0.0))
+                self._entries[key] = Location(name, count, last_used)
+
+    def _read_journal(self):
+        try:
+            with open(self.journal, 'rb') as f:
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        # Only whole lines; a concurrent writer may be mid-line
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                op, name, when = json.loads(line)
+            except (ValueError, TypeError):
+                continue
+            self._apply(op, name, when)
+        self._offset += end
+
+    def _changed(self) -> bool:
+        if not self._loaded or file_signature(self.path) != self._snapshot_sig:
+            return True
+        journal = file_signature(self.journal)
+        return (journal[1] if journal else 0) != self._offset
+
+    def _sync(self):
+        """Pick up changes made by other processes; the caller holds file_lock"""
+        if not self._loaded or file_signature(self.path) != self._snapshot_sig:
+            self._load_snapshot()
+            self._loaded = True
+        size = (file_signature(self.journal) or (0, 0))[1]
+        if size < self._offset:
+            # Compacted by someone else
+            self._load_snapshot()
+        if size > self._offset:
+            self._read_journal()
+
+    def _apply(self, op: str, name: str, when: float) -> bool:
+        key = normalize_city(name)
+        if not key:
+            return False
+        self._journal_ops += 1
+        if op == "-":
+            return self._entries.pop(key, None) is not None
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = Location(name)
+        else:
+            self._entries.move_to_end(key)
+        entry.count += 1
+        entry.last_used = when
+        return entry.count == 1
+
+    # Writing
+
+    def _write(self, op: str, name: str) -> bool:
+        with self._lock, file_lock(self.path):
+            self._sync()
+            when = self.clock()
+            changed = self._apply(op, name, when)
+            with open(self.journal, 'ab') as f:
+                f.write(json.dumps([op, name, when]).encode('utf-8') + b"\n")
+                self._offset = f.tell()
+            if self._journal_ops >= self.compact_ops:
+                self._compact()
+            return changed
+
+    def _compact(self):
+        data = {
+            "locations": [entry.name for entry in reversed(self._entries.values())],
+            "usage": {key: [entry.count, entry.last_used] for key, entry in self._entries.items()},
+        }
+        atomic_write(self.path, json.dumps(data))
+        with open(self.journal, 'wb'):
+            pass
+        self._snapshot_sig = file_signature(self.path)
+        self._offset = 0
+        self._journal_ops = 0
+
+    def compact(self):
+        """Fold the journal into the JSON file now, e.g. before a backup"""
+        with self._lock, file_lock(self.path):
+            self._sync()
+            self._compact()
+
+    def use(self, city: str) -> bool:
+        """Save a city or bump it to most recent; True when it was new"""
+        city = " ".join(str(city).split())
+        if not city:
+            return False
+        return self._write("+", city)
+
+    def remove(self, city: str) -> bool:
+        if city not in self:
+            return False
+        return self._write("-", city)
+
+    # Reading
+
+    def _current(self):
+        with self._lock:
+            # Two stats when nothing changed; the lock only when something did
+            if self._changed():
+                with file_lock(self.path):
+                    self._sync()
+            return self._entries
+
+    def __contains__(self, city: str) -> bool:
+        return normalize_city(city) in self._current()
+
+    def __len__(self) -> int:
+        return len(self._current())
+
+    def names(self) -> List[str]:
+        """Most recently used first"""
+        with self._lock:
+            return [entry.name for entry in reversed(self._current().values())]
+
+    def usage(self, city: str) -> int:
+        entry = self._current().get(normalize_city(city))
+        return entry.count if entry else 0
+
+    def entries(self) -> List[Location]:
+        with self._lock:
+            return list(reversed(self._current().values()))
@@ -0,0 +1,195 @@
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from string import Template
+from typing import Callable, Optional, Sequence, Union
+
+from config import EMAIL_HOST, EMAIL_PORT, EMAIL_USER, EMAIL_PASSWORD
+from src.models import Observation
+from src.timezones import local_clock
+
+# Compiled once at import, filled per city
+CITY_SECTION = Template("""
+<h1>Weather Report for $name, $country</h1>
+<p><strong>Conditions:</strong> $description</p>
+<p><strong>Temperature:</strong> $temp°$unit</p>
+<p><strong>Feels Like:</strong> $feels_like°$unit</p>
+<p><strong>Humidity:</strong> $humidity%</p>
+<p><strong>Wind Speed:</strong> $wind_speed m/s</p>
+<p><strong>Pressure:</strong> $pressure hPa</p>
+<p><strong>Visibility:</strong> $visibility meters</p>
+<p><strong>Sunrise:</strong> $sunrise</p>
+<p><strong>Sunset:</strong> $sunset</p>
+""")
+REPORT = Template("""$sections
+<p><strong>Report Time:</strong> $report_time</p>
+""")
+
+
+def _clock(ts, obs: Observation) -> str:
+    return local_clock(ts, obs) if ts else "N/A"
+
+
+def _na(value):
+    return "N/A" if value is None or value == "" else value
+
+
+def render_report(payloads: Sequence[Union[dict, Observation]], unit: str = "metric") -> str:
+    """HTML report covering one or more cities, from payloads or Observations"""
+    unit_symbol = 'C' if unit == 'metric' else 'F'
+    sections = []
+    for data in payloads:
+        obs = data if isinstance(data, Observation) else Observation.from_payload(data)
+        sections.append(CITY_SECTION.substitute(
+            name=obs.name,
+            country=obs.country,
+            description=_na(obs.description),
+            temp=_na(obs.temp),
+            feels_like=_na(obs.feels_like),
+            humidity=_na(obs.humidity),
+            wind_speed=_na(obs.wind_speed),
+            pressure=_na(obs.pressure),
+            visibility=_na(obs.visibility),
+            sunrise=_clock(obs.sunrise, obs),
+            sunset=_clock(obs.sunset, obs),
+            unit=unit_symbol
+        ))
+    return REPORT.substitute(
+        sections="".join(sections),
+        report_time=datetime.now().strftime('%Y-%m-%d %H:%M')
+    )
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a send error is worth retrying on a fresh connection"""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    return isinstance(error, OSError)
+
+
+class MailQueue:
+    """Sends email from a background thread over one reused SMTP connection"""
+
+    def __init__(self, host: str = EMAIL_HOST, port: int = EMAIL_PORT,
+                 user: Optional[str] = EMAIL_USER, password: Optional[str] = EMAIL_PASSWORD,
+                 use_tls: bool = True, smtp_factory: Callable = smtplib.SMTP,
+                 max_retries: int = 3, retry_delay: float = 1.0, idle_timeout: float = 60):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.smtp_factory = smtp_factory
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.idle_timeout = idle_timeout
+        self.sender = user or "weather@localhost"
+        self.connects = 0
+        self._jobs = queue.Queue()
+        self._server = None
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, message) -> Future:
+        """Queue a prepared message, resolved once the server accepts it"""
+        future = Future()
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="mailer", daemon=True)
+                self._worker.start()
+        self._jobs.put((message, future))
+        return future
+
+    def send(self, recipient: str, subject: str, html: str) -> Future:
+        msg = MIMEMultipart()
+        msg['Subject'] = subject
+        msg['From'] = self.sender
+        msg['To'] = recipient
+        msg.attach(MIMEText(html, 'html'))
+        return self.submit(msg)
+
+    def send_report(self, recipients: Sequence[str], subject: str,
+                    payloads: Union[Sequence, Callable[[], Sequence]],
+                    unit: str = "metric") -> Future:
+        """Render one report and mail it to every recipient.
+
+        payloads may be a callable, in which case it runs on a helper thread
+        (e.g. to fetch all saved cities without blocking the caller). The
+        returned future resolves to the list of recipients that were sent to.
+        """
+        result = Future()
+
+        def run():
+            try:
+                data = payloads() if callable(payloads) else payloads
+                html = render_report([p for p in data if p], unit)
+                futures = [self.send(recipient, subject, html) for recipient in recipients]
+                result.set_result([f.result() for f in futures])
+            except Exception as e:
+                result.set_exception(e)
+
+        threading.Thread(target=run, name="mail-report", daemon=True).start()
+        return result
+
+    def close(self):
+        """Finish queued messages and disconnect"""
+        if self._worker is not None and self._worker.is_alive():
+            self._jobs.put(None)
+            self._worker.join()
+
+    def _connect(self):
+        server = self.smtp_factory(self.host, self.port)
+        if self.use_tls:
+            server.starttls()
+        if self.user and self.password:
+            server.login(self.user, self.password)
+        self.connects += 1
+        return server
+
+    def _disconnect(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+    def _deliver(self, message) -> str:
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self._server is None:
+                    self._server = self._connect()
+                self._server.send_message(message)
+                return message['To']
+            except Exception as e:
+                if not is_transient(e) or attempt == self.max_retries:
+                    raise
+                self._disconnect()
+                time.sleep(self.retry_delay * (2 ** attempt))
+
+    def _run(self):
+        while True:
+            try:
+                job = self._jobs.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                self._disconnect()
+                continue
+            if job is None:
+                self._disconnect()
+                return
+            message, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self._deliver(message))
+            except Exception as e:
+                future.set_exception(e)
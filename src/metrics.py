@@ -0,0 +1,316 @@
+"""In-process counters, gauges and histograms with Prometheus text output.
+
+    from src import metrics
+    API_CALLS = metrics.counter("weather_api_requests_total", "API calls", ["endpoint", "outcome"])
+    API_CALLS.inc(endpoint="weather", outcome="ok")
+
+    STORAGE = metrics.histogram("data_handler_seconds", "DataHandler time", ["op"])
+    with STORAGE.time(op="log_weather"):
+        ...
+
+When disabled (METRICS_ENABLED = False or WEATHERVISION_METRICS=0) every
+update returns after one attribute check and time() hands out a shared
+no-op context manager.
+"""
+import bisect
+import functools
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from config import METRICS_ENABLED
+
+# Seconds; covers cache hits (µs) up to slow uploads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(labelnames: Sequence[str], labels: dict) -> Tuple[str, ...]:
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames: Sequence[str], key: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, key)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: "Registry", name: str, help: str, labelnames: Sequence[str]):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        if not self.registry.enabled:
+            return
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {v:g}" for k, v in items]
+
+
+class Gauge(Counter):
+    """Counter that can also go down or be set, optionally read from a callback"""
+    kind = "gauge"
+
+    def __init__(self, registry, name, help, labelnames, callback: Optional[Callable] = None):
+        super().__init__(registry, name, help, labelnames)
+        self.callback = callback
+
+    def set(self, value: float, **labels):
+        if not self.registry.enabled:
+            return
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self) -> List[str]:
+        if self.callback and self.registry.enabled:
+            try:
+                # Callback returns a number, or {label tuple: number}
+                values = self.callback()
+                values = values if isinstance(values, dict) else {(): values}
+                with self._lock:
+                    self._values = {k if isinstance(k, tuple) else (k,): v for k, v in values.items()}
+            except Exception as e:
+                print(f"Gauge {self.name} error: {e}")
+        return super().render()
+
+
+class HistogramValue:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help, labelnames, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        if not self.registry.enabled:
+            return
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = HistogramValue(len(self.buckets) + 1)
+            entry.counts[index] += 1
+            entry.sum += value
+            entry.count += 1
+
+    def time(self, **labels):
+        """Context manager observing the elapsed seconds of its block"""
+        if not self.registry.enabled:
+            return _NULL_TIMER
+        return _Timer(self, labels)
+
+    def timed(self, **labels):
+        """Decorator observing the duration of every call"""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.registry.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - start, **labels)
+            return wrapper
+        return decorate
+
+    def stats(self, **labels) -> Optional[HistogramValue]:
+        return self._values.get(_label_key(self.labelnames, labels))
+
+    def quantile(self, q: float, key: Tuple[str, ...]) -> float:
+        """Estimate from bucket counts, interpolating inside the bucket"""
+        entry = self._values.get(key)
+        if not entry or not entry.count:
+            return 0.0
+        rank = q * entry.count
+        seen = 0
+        for i, n in enumerate(entry.counts):
+            if seen + n >= rank and n:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else lower * 2 or 1.0
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def render(self) -> List[str]:
+        lines = []
+        with self._lock:
+            items = sorted((k, list(v.counts), v.sum, v.count) for k, v in self._values.items())
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                labels = _format_labels(self.labelnames, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Registry:
+    """Named metrics; getting an existing name returns the same object"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, help: str, labelnames: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(self, name, help, labelnames, **kwargs)
+            elif type(metric) is not cls:
+                raise ValueError(f"metric {name} already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help: str = "", labelnames: Sequence[str] = ()) -> Counter:
+        return self._get(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str = "", labelnames: Sequence[str] = (),
+              callback: Optional[Callable] = None) -> Gauge:
+        gauge = self._get(Gauge, name, help, labelnames)
+        if callback is not None:
+            gauge.callback = callback
+        return gauge
+
+    def histogram(self, name: str, help: str = "", labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, labelnames, buckets=buckets)
+
+    def timer(self, name: str, **labels):
+        """Ad hoc timing into a histogram named on the spot"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self.histogram(name, labelnames=tuple(labels)), labels)
+
+    def metrics(self) -> List[_Metric]:
+        with self._lock:
+            return [self._metrics[name] for name in sorted(self._metrics)]
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self.metrics():
+            body = metric.render()
+            if body:
+                lines.extend(metric.header())
+                lines.extend(body)
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path):
+        """Atomically write render() to a file, e.g. for node_exporter's textfile collector"""
+        try:
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_text(self.render(), encoding="utf-8")
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Metrics write error: {e}")
+
+    def rows(self) -> List[dict]:
+        """Flat summary per metric and label set, for the diagnostics panel"""
+        rows = []
+        for metric in self.metrics():
+            if isinstance(metric, Gauge):
+                metric.render()
+            # Hold the metric's lock so writers adding label sets can't resize _values mid-walk
+            with metric._lock:
+                for key, value in sorted(metric._values.items()):
+                    labels = ", ".join(f"{n}={v}" for n, v in zip(metric.labelnames, key) if v)
+                    row = {"name": metric.name, "labels": labels, "kind": metric.kind}
+                    if isinstance(metric, Histogram):
+                        row.update(count=value.count, total=value.sum,
+                                   mean=value.sum / value.count if value.count else 0.0,
+                                   p50=metric.quantile(0.5, key), p95=metric.quantile(0.95, key))
+                    else:
+                        row.update(value=value)
+                    rows.append(row)
+        return rows
+
+    def reset(self):
+        with self._lock:
+            for metric in self._metrics.values():
+                with metric._lock:
+                    metric._values.clear()
+
+
+REGISTRY = Registry(enabled=METRICS_ENABLED)
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+timer = REGISTRY.timer
+render = REGISTRY.render
@@ -0,0 +1,211 @@
+"""Parsed weather observations.
+
+Observation is one current-weather (or forecast slot) payload read once
+into typed slots. Missing numbers are None, missing text is "", and
+parsing never fails on a missing key. History logging skips
+observations without a temperature. Everything downstream (history
+rows, alerts, the GUI, speech and email) reads these attributes
+instead of walking the JSON again.
+
+History is stored in °C and m/s whatever units a payload was requested
+in; callers pass the units and DataHandler converts with to_metric.
+History rows are stamped with the observation time (dt), not the time
+of the request, so logging an unchanged reading twice gives the same
+(city, timestamp) key and DataHandler can drop the repeat.
+
+ObservationBatch holds many observations as one numpy array per field
+(NaN for missing numbers). Polls and forecast scans use it, so alert
+rules run on the columns directly, with no per-payload dict lookups.
+"""
+import itertools
+import math
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+# Field names match the alert rule fields in src/alerts.py
+NUMERIC_FIELDS = ("temp", "feels_like", "humidity", "pressure", "wind_speed", "wind_gust",
+                  "visibility", "clouds", "lat", "lon", "dt", "timezone", "sunrise", "sunset")
+TEXT_FIELDS = ("city", "name", "country", "condition", "description", "icon")
+# Fields whose unit depends on the request's units=metric|imperial
+TEMPERATURE_FIELDS = ("temp", "feels_like")
+WIND_FIELDS = ("wind_speed", "wind_gust")
+MPH_TO_MS = 0.44704
+
+
+def _number(value) -> Optional[float]:
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+class Observation:
+    __slots__ = NUMERIC_FIELDS + TEXT_FIELDS
+
+    def __init__(self, **values):
+        for field in NUMERIC_FIELDS:
+            setattr(self, field, values.get(field))
+        for field in TEXT_FIELDS:
+            setattr(self, field, values.get(field) or "")
+
+    @classmethod
+    def from_payload(cls, data: dict, city: str = "") -> "Observation":
+        """Parse an OpenWeatherMap current weather or forecast slot payload"""
+        main = data.get("main") or {}
+        wind = data.get("wind") or {}
+        sys = data.get("sys") or {}
+        coord = data.get("coord") or {}
+        weather = (data.get("weather") or [{}])[0]
+        return cls(
+            city=city or data.get("name", ""),
+            name=data.get("name", ""),
+            country=sys.get("country", ""),
+            temp=_number(main.get("temp")),
+            feels_like=_number(main.get("feels_like")),
+            humidity=_number(main.get("humidity")),
+            pressure=_number(main.get("pressure")),
+            wind_speed=_number(wind.get("speed")),
+            wind_gust=_number(wind.get("gust")),
+            visibility=_number(data.get("visibility")),
+            clouds=_number((data.get("clouds") or {}).get("all")),
+            lat=_number(coord.get("lat")),
+            lon=_number(coord.get("lon")),
+            dt=_number(data.get("dt")),
+            timezone=_number(data.get("timezone")),
+            sunrise=_number(sys.get("sunrise")),
+            sunset=_number(sys.get("sunset")),
+            condition=weather.get("main", ""),
+            description=weather.get("description", ""),
+            icon=weather.get("icon", ""),
+        )
+
+    def to_metric(self, units: str) -> "Observation":
+        """The observation in °C and m/s; itself if already metric"""
+        if units != "imperial":
+            return self
+        values = {field: getattr(self, field) for field in self.__slots__}
+        for field in TEMPERATURE_FIELDS:
+            if values[field] is not None:
+                values[field] = round((values[field] - 32) * 5 / 9, 2)
+        for field in WIND_FIELDS:
+            if values[field] is not None:
+                values[field] = round(values[field] * MPH_TO_MS, 2)
+        return Observation(**values)
+
+    @property
+    def visibility_km(self) -> Optional[float]:
+        return self.visibility / 1000 if self.visibility is not None else None
+
+    def history_row(self, timestamp: Optional[str] = None) -> dict:
+        """Row for weather_history.csv, stamped with the observation time
+        (dt) unless a timestamp is given"""
+        return {
+            "city": self.city,
+            "temp": self.temp,
+            "humidity": self.humidity,
+            "conditions": self.condition,
+            "pressure": self.pressure,
+            "wind_speed": self.wind_speed,
+            "visibility": self.visibility_km,
+            "timestamp": timestamp or observed_at(self.dt),
+        }
+
+    def __repr__(self):
+        return f"Observation({self.city!r}, temp={self.temp}, condition={self.condition!r})"
+
+
+def metric_columns(columns: Dict[str, np.ndarray], units: str) -> Dict[str, np.ndarray]:
+    """Columns in °C and m/s, which alert rules are written in; the same dict if already metric"""
+    if units != "imperial":
+        return columns
+    columns = dict(columns)
+    for field in TEMPERATURE_FIELDS:
+        if field in columns:
+            columns[field] = np.round((columns[field] - 32) * 5 / 9, 2)
+    for field in WIND_FIELDS:
+        if field in columns:
+            columns[field] = np.round(columns[field] * MPH_TO_MS, 2)
+    return columns
+
+
+def observed_at(dt: Optional[float]) -> str:
+    """History timestamp for an observation time; now if it has none"""
+    if dt is None or math.isnan(dt):
+        return datetime.now().isoformat()
+    return datetime.fromtimestamp(dt).isoformat()
+
+
+def display_value(value):
+    """Batch values as they would read in the payload: None for NaN, 12 rather than 12.0"""
+    if isinstance(value, float):
+        if math.isnan(value):
+            return None
+        if value.is_integer():
+            return int(value)
+    return value
+
+
+class ObservationBatch:
+    """Struct-of-arrays view of many observations"""
+    __slots__ = ("columns",)
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self.columns = columns
+
+    @classmethod
+    def from_observations(cls, observations: Sequence[Observation],
+                          fields: Optional[Sequence[str]] = None) -> "ObservationBatch":
+        """Columns of every field, or only of fields, e.g. the ones alert rules read"""
+        numeric = NUMERIC_FIELDS if fields is None else [f for f in NUMERIC_FIELDS if f in fields]
+        text = TEXT_FIELDS if fields is None else [f for f in TEXT_FIELDS if f in fields]
+        columns = {field: np.array([np.nan if (v := getattr(o, field)) is None else v for o in observations],
+                                   dtype=float)
+                   for field in numeric}
+        columns.update({field: np.array([getattr(o, field) for o in observations], dtype=object)
+                        for field in text})
+        return cls(columns)
+
+    @classmethod
+    def from_payloads(cls, payloads: Iterable[dict], cities: Optional[Iterable[str]] = None) -> "ObservationBatch":
+        """Parse payloads; ones without a temperature are skipped"""
+        observations = [Observation.from_payload(data, city)
+                        for data, city in zip(payloads, cities if cities is not None else itertools.repeat(""))]
+        return cls.from_observations([o for o in observations if o.temp is not None])
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, i: int) -> Observation:
+        return Observation(**{field: display_value(column[i].item() if field in NUMERIC_FIELDS else column[i])
+                              for field, column in self.columns.items()})
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def column(self, field: str) -> np.ndarray:
+        return self.columns[field]
+
+    def value(self, i: int, field: str):
+        value = self.columns[field][i]
+        return display_value(value.item()) if field in NUMERIC_FIELDS else value
+
+    def to_metric(self, units: str) -> "ObservationBatch":
+        """The batch in °C and m/s, which alert rules are written in; itself if already metric"""
+        if units != "imperial":
+            return self
+        return ObservationBatch(metric_columns(self.columns, units))
+
+    def history_rows(self, timestamp: Union[str, Sequence[str], None] = None) -> List[dict]:
+        """Rows for weather_history.csv, one per observation; timestamp is
+        shared by all rows or given per row, by default each row's dt"""
+        if timestamp is None:
+            timestamps = [observed_at(dt) for dt in self.columns["dt"].tolist()]
+        else:
+            timestamps = [timestamp] * len(self) if isinstance(timestamp, str) else list(timestamp)
+        visibility = self.columns["visibility"] / 1000
+        fields = {"city": self.columns["city"], "temp": self.columns["temp"],
+                  "humidity": self.columns["humidity"], "conditions": self.columns["condition"],
+                  "pressure": self.columns["pressure"], "wind_speed": self.columns["wind_speed"],
+                  "visibility": visibility}
+        lists = {name: [display_value(v) for v in column.tolist()] for name, column in fields.items()}
+        return [dict({name: values[i] for name, values in lists.items()}, timestamp=timestamps[i])
+                for i in range(len(self))]
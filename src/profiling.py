@@ -0,0 +1,155 @@
+"""Per-action cProfile and tracemalloc capture for --profile runs.
+
+    profiler = ActionProfiler(Path("profiles"), gauges={"figures": lambda: len(plt.get_fignums())})
+    with profiler.action("search"):
+        ...
+
+Every call writes NNN_<action>.prof (open with pstats or snakeviz) and
+NNN_<action>_alloc.txt, the tracemalloc diff over the call.
+summary.txt is rewritten after each call. It holds the top functions
+and allocation sites per action, plus how each gauge moved. A gauge
+that only ever grows, such as open matplotlib figures or live
+PhotoImages, is a leak.
+
+A nested action pauses the outer profile, so the outer profile does not
+include the nested one's functions. Allocation diffs do nest: the outer
+diff includes what the nested action allocated. Only the calling thread
+is profiled.
+"""
+import cProfile
+import functools
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+TRACEMALLOC_FRAMES = 10
+# Keep the profiler's own bookkeeping out of allocation diffs
+SNAPSHOT_FILTERS = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__))
+
+
+class ActionStats:
+    """Everything recorded for one action name"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self.stats: Optional[pstats.Stats] = None
+        self.allocations = Counter()  # "file:line" -> net bytes
+        self.gauges: Dict[str, list] = defaultdict(list)  # name -> value after each call
+
+
+class ActionProfiler:
+    def __init__(self, directory: Path, top: int = 25, gauges: Optional[Dict[str, Callable[[], float]]] = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.top = top
+        self.gauges = dict(gauges or {})
+        self.actions: Dict[str, ActionStats] = {}
+        self._seq = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+
+    def _stack(self) -> list:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def action(self, name: str):
+        stack = self._stack()
+        if stack:
+            stack[-1].disable()
+        before = {key: read() for key, read in self.gauges.items()}
+        snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+        profile = cProfile.Profile()
+        stack.append(profile)
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            seconds = time.perf_counter() - started
+            stack.pop()
+            diff = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS).compare_to(snapshot, "lineno")
+            after = {key: read() for key, read in self.gauges.items()}
+            self._record(name, profile, seconds, diff, before, after)
+            if stack:
+                stack[-1].enable()
+
+    def wrap(self, name: str, fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self.action(name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def _record(self, name, profile, seconds, diff, before, after):
+        with self._lock:
+            self._seq += 1
+            prefix = self.directory / f"{self._seq:03d}_{name}"
+            entry = self.actions.get(name)
+            if entry is None:
+                entry = self.actions[name] = ActionStats(name)
+        try:
+            profile.dump_stats(str(prefix) + ".prof")
+            lines = [f"{name}: {seconds * 1000:.1f} ms"]
+            lines += [f"{key}: {before[key]} -> {after[key]}" for key in self.gauges]
+            lines += ["", "Top allocation sites (net):"] + [str(stat) for stat in diff[:self.top]]
+            Path(str(prefix) + "_alloc.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+        except OSError as e:
+            print(f"Profile write error: {e}")
+
+        with self._lock:
+            entry.calls += 1
+            entry.seconds += seconds
+            stats = pstats.Stats(profile)
+            if entry.stats is None:
+                entry.stats = stats
+            else:
+                entry.stats.add(stats)
+            for stat in diff:
+                frame = stat.traceback[0]
+                entry.allocations[f"{frame.filename}:{frame.lineno}"] += stat.size_diff
+            for key, value in after.items():
+                entry.gauges[key].append(value)
+        self.write_summary()
+
+    def summary(self) -> str:
+        out = io.StringIO()
+        with self._lock:
+            entries = sorted(self.actions.values(), key=lambda e: e.seconds, reverse=True)
+            for entry in entries:
+                out.write(f"=== {entry.name}: {entry.calls} calls, {entry.seconds:.3f} s total, "
+                          f"{entry.seconds / entry.calls * 1000:.1f} ms mean\n")
+                for key, values in entry.gauges.items():
+                    grows = len(values) > 1 and all(b > a for a, b in zip(values, values[1:]))
+                    out.write(f"{key} after each call: {values[-10:]}{'  <-- keeps growing' if grows else ''}\n")
+                out.write("\nTop allocation sites (net bytes):\n")
+                for site, size in entry.allocations.most_common(self.top):
+                    out.write(f"{size / 1024:>12.1f} KiB  {site}\n")
+                out.write("\n")
+                entry.stats.stream = out
+                entry.stats.sort_stats("cumulative").print_stats(self.top)
+        return out.getvalue()
+
+    def write_summary(self) -> Path:
+        path = self.directory / "summary.txt"
+        try:
+            path.write_text(self.summary(), encoding="utf-8")
+        except OSError as e:
+            print(f"Profile summary error: {e}")
+        return path
+
+    def close(self):
+        self.write_summary()
+        tracemalloc.stop()
@@ -0,0 +1,194 @@
+import atexit
+import heapq
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from config import API_CALLS_PER_DAY, API_CALLS_PER_MINUTE, API_USAGE
+from src import metrics
+
+# Priority classes, lower value is served first
+INTERACTIVE = 0
+SCHEDULED = 1
+BACKFILL = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", SCHEDULED: "scheduled", BACKFILL: "backfill"}
+
+# Share of each bucket background classes may not touch, kept for interactive use
+RESERVE = {INTERACTIVE: 0.0, SCHEDULED: 0.1, BACKFILL: 0.3}
+
+# How long each class waits for a token before giving up (seconds)
+DEFAULT_WAIT = {INTERACTIVE: 10.0, SCHEDULED: 60.0, BACKFILL: 300.0}
+
+
+class TokenBucket:
+    """Continuously refilling bucket of API calls"""
+
+    def __init__(self, name: str, capacity: float, period: float,
+                 clock: Callable[[], float] = time.time):
+        self.name = name
+        self.capacity = float(capacity)
+        self.rate = capacity / period
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, reserve: float = 0.0) -> bool:
+        """Take one token if at least `reserve` tokens would remain"""
+        self._refill()
+        if self.tokens - 1 >= reserve - 1e-9:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self, reserve: float = 0.0) -> float:
+        """Seconds until try_take with this reserve can succeed"""
+        self._refill()
+        missing = reserve + 1 - self.tokens
+        return max(0.0, missing / self.rate)
+
+
+class QuotaManager:
+    """Gates every API call through per-limit token buckets with priorities.
+
+    Waiters are served strictly by priority class, then arrival order.
+    Scheduled and backfill work can never drain the share of a bucket
+    reserved for interactive searches, so those keep low latency even when
+    background jobs saturate the budget.
+    """
+    _default = None
+
+    def __init__(self, limits: Sequence[Tuple[str, float, float]] = (
+                     ("minute", API_CALLS_PER_MINUTE, 60),
+                     ("day", API_CALLS_PER_DAY, 86400)),
+                 usage_path: Optional[Path] = None,
+                 clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self.buckets = [TokenBucket(name, capacity, period, clock) for name, capacity, period in limits]
+        self.usage_path = usage_path
+        self.usage: Dict[str, Dict[str, int]] = {}
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._seq = 0
+        self._dirty = 0
+        self._saved_at = 0.0
+        self._load()
+
+    @classmethod
+    def default(cls) -> "QuotaManager":
+        """Process-wide manager shared by all WeatherAPI calls"""
+        if cls._default is None:
+            cls._default = cls(usage_path=API_USAGE)
+            atexit.register(cls._default.save)
+        return cls._default
+
+    def _today(self) -> str:
+        return datetime.fromtimestamp(self.clock(), timezone.utc).strftime("%Y-%m-%d")
+
+    def _load(self):
+        if not self.usage_path or not Path(self.usage_path).exists():
+            return
+        try:
+            with open(self.usage_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.usage = state.get("usage", {})
+            for bucket in self.buckets:
+                saved = state.get("buckets", {}).get(bucket.name)
+                if saved:
+                    bucket.tokens = float(saved["tokens"])
+                    bucket.updated = float(saved["updated"])
+                    bucket._refill()
+        except Exception as e:
+            print(f"Quota usage load error: {e}")
+
+    def save(self):
+        """Persist bucket levels and daily usage counts"""
+        if not self.usage_path:
+            return
+        with self._cond:
+            state = {
+                "buckets": {b.name: {"tokens": b.tokens, "updated": b.updated} for b in self.buckets},
+                "usage": self.usage,
+            }
+            self._dirty = 0
+            self._saved_at = self.clock()
+        try:
+            tmp_path = Path(self.usage_path).with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.usage_path)
+        except OSError as e:
+            print(f"Quota usage save error: {e}")
+
+    def _reserve(self, bucket: TokenBucket, priority: int) -> float:
+        return int(bucket.capacity * RESERVE.get(priority, RESERVE[BACKFILL]))
+
+    def _try_take_all(self, priority: int) -> bool:
+        if any(b.wait_time(self._reserve(b, priority)) > 0 for b in self.buckets):
+            return False
+        for bucket in self.buckets:
+            bucket.try_take(self._reserve(bucket, priority))
+        day = self.usage.setdefault(self._today(), {})
+        name = PRIORITY_NAMES.get(priority, str(priority))
+        day[name] = day.get(name, 0) + 1
+        for old in sorted(self.usage)[:-7]:
+            del self.usage[old]
+        self._dirty += 1
+        return True
+
+    def acquire(self, priority: int = INTERACTIVE, timeout: Optional[float] = None) -> bool:
+        """Block until a call may be made; False if the deadline passes first"""
+        granted = self._acquire(priority, timeout)
+        if granted and (self._dirty >= 20 or self.clock() - self._saved_at > 5):
+            self.save()
+        return granted
+
+    def _acquire(self, priority: int, timeout: Optional[float]) -> bool:
+        if timeout is None:
+            timeout = DEFAULT_WAIT.get(priority, DEFAULT_WAIT[BACKFILL])
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._seq += 1
+            me = (priority, self._seq)
+            heapq.heappush(self._waiters, me)
+            try:
+                while True:
+                    if self._waiters[0] == me and self._try_take_all(priority):
+                        heapq.heappop(self._waiters)
+                        return True
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    if self._waiters[0] == me:
+                        wait = max(b.wait_time(self._reserve(b, priority)) for b in self.buckets)
+                    else:
+                        wait = remaining
+                    self._cond.wait(min(max(wait, 0.001), remaining))
+            finally:
+                if me in self._waiters:
+                    self._waiters.remove(me)
+                    heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def remaining(self) -> Dict[str, int]:
+        """Calls currently available in each bucket"""
+        with self._cond:
+            for bucket in self.buckets:
+                bucket._refill()
+            return {b.name: int(b.tokens) for b in self.buckets}
+
+    def usage_today(self) -> Dict[str, int]:
+        with self._cond:
+            return dict(self.usage.get(self._today(), {}))
+
+
+metrics.gauge("api_quota_remaining", "API calls currently available per quota bucket", ["bucket"],
+              callback=lambda: {(name,): left for name, left in QuotaManager.default().remaining().items()})
@@ -0,0 +1,200 @@
+import heapq
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+from config import POLL_INTERVAL, POLL_JITTER, POLL_MAX_BACKOFF, POLL_MIN_INTERVAL
+from src.daily_stats import normalize_city
+from src.data_handler import DataHandler
+from src import tracing
+from src.quota import SCHEDULED
+
+# OpenWeatherMap usually publishes a new observation within this long after its dt
+PUBLISH_LAG = 60
+
+
+class CityState:
+    """Polling bookkeeping for one saved location"""
+    __slots__ = ("city", "last_dt", "cadence", "failures", "stale", "due", "data")
+
+    def __init__(self, city: str, cadence: float):
+        self.city = city
+        self.last_dt = None
+        self.cadence = cadence
+        self.failures = 0
+        self.stale = 0
+        self.due = 0.0
+        self.data = None
+
+
+class PollScheduler:
+    """Keeps saved locations fresh with as few API calls as possible.
+
+    Cities sit in a priority queue keyed by their next due time. After a
+    successful poll the next one is planned for when OpenWeatherMap should
+    have published a newer observation (last dt + observed cadence), so
+    calls that would return the same data are skipped. Failing cities back
+    off exponentially and all delays are jittered to spread the load.
+    """
+
+    def __init__(self, service, cities: Optional[Callable[[], Sequence[str]]] = None,
+                 units: str = "metric", interval: float = POLL_INTERVAL,
+                 min_interval: float = POLL_MIN_INTERVAL, max_backoff: float = POLL_MAX_BACKOFF,
+                 jitter: float = POLL_JITTER, concurrency: int = 4,
+                 clock: Callable[[], float] = time.time, rng: Optional[random.Random] = None,
+                 on_poll: Optional[Callable[[dict], None]] = None):
+        self.service = service
+        self.cities = cities or DataHandler.get_saved_locations
+        self.units = units
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.concurrency = concurrency
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.on_poll = on_poll
+        self.states: Dict[str, CityState] = {}
+        self.calls = 0
+        self._heap = []
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _push(self, state: CityState, delay: float):
+        delay = max(0.0, delay) * self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+        state.due = self.clock() + delay
+        self._seq += 1
+        heapq.heappush(self._heap, (state.due, self._seq, normalize_city(state.city)))
+
+    def sync(self):
+        """Add new saved locations and forget removed ones"""
+        wanted = {normalize_city(city): city for city in self.cities()}
+        with self._lock:
+            for key in list(self.states):
+                if key not in wanted:
+                    del self.states[key]
+            for key, city in wanted.items():
+                if key not in self.states:
+                    state = CityState(city, self.interval)
+                    self.states[key] = state
+                    # Spread the first round instead of firing everything at once
+                    self._push(state, self.rng.uniform(0, self.min_interval))
+
+    def next_due(self) -> Optional[float]:
+        with self._lock:
+            while self._heap and (self._heap[0][2] not in self.states or
+                                  self.states[self._heap[0][2]].due != self._heap[0][0]):
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def latest(self, city: str) -> Optional[dict]:
+        """Most recent payload the scheduler fetched for a city"""
+        state = self.states.get(normalize_city(city))
+        return state.data if state else None
+
+    def _take_due(self) -> List[CityState]:
+        now = self.clock()
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                entry_due, _, key = heapq.heappop(self._heap)
+                state = self.states.get(key)
+                # Entries left over from an earlier schedule are ignored
+                if state and state.due == entry_due:
+                    due.append(state)
+        return due
+
+    def _fetch(self, state: CityState):
+        try:
+            with tracing.span("fetch", city=state.city):
+                # The scheduler decides when to re-ask; a cached answer would
+                # hide a newly published observation behind an "unchanged" retry
+                return self.service.current(state.city, self.units, priority=SCHEDULED, cache=False)
+        except Exception:
+            return None
+
+    def _plan(self, state: CityState, data: Optional[dict]) -> str:
+        """Update state from a poll result and reschedule; returns the outcome"""
+        now = self.clock()
+        if not data or data.get("cod", 200) != 200:
+            state.failures += 1
+            self._push(state, min(self.max_backoff, self.min_interval * 2 ** state.failures))
+            return "failed"
+        state.failures = 0
+        dt = data.get("dt")
+        if dt is not None and dt == state.last_dt:
+            # Not published yet: retry soon, a little later each time
+            state.stale += 1
+            self._push(state, min(self.interval, self.min_interval * state.stale))
+            return "unchanged"
+
+        if state.last_dt is not None and dt is not None and dt > state.last_dt:
+            observed = min(max(dt - state.last_dt, self.min_interval), self.interval * 6)
+            state.cadence = 0.7 * state.cadence + 0.3 * observed
+        state.last_dt = dt
+        state.stale = 0
+        state.data = data
+        if dt is None:
+            delay = self.interval
+        else:
+            delay = max(self.min_interval, dt + state.cadence + PUBLISH_LAG - now)
+        self._push(state, delay)
+        return "updated"
+
+    def run_pending(self) -> List[dict]:
+        """Poll every due city once; new observations are logged in one write"""
+        due = self._take_due()
+        if not due:
+            return []
+        with tracing.trace("scheduled_poll", cities=len(due)):
+            return self._poll(due)
+
+    def _poll(self, due: List[CityState]) -> List[dict]:
+        with ThreadPoolExecutor(max_workers=max(1, min(self.concurrency, len(due)))) as pool:
+            payloads = list(pool.map(tracing.wrap(self._fetch), due))
+        # Every fetch bypasses the response cache, so each one is an API call
+        self.calls += len(due)
+
+        events, fresh = [], []
+        with self._lock:
+            for state, data in zip(due, payloads):
+                if normalize_city(state.city) not in self.states:
+                    continue
+                outcome = self._plan(state, data)
+                if outcome == "updated":
+                    fresh.append((state.city, data))
+                events.append({"city": state.city, "outcome": outcome,
+                               "dt": state.last_dt, "next_in": round(state.due - self.clock(), 1)})
+        if fresh:
+            with tracing.span("log", rows=len(fresh)):
+                DataHandler.log_weather_many(fresh, self.units)
+        if self.on_poll:
+            for event in events:
+                self.on_poll(event)
+        return events
+
+    def run_forever(self, sync_every: float = 300):
+        """Blocking loop, returns after stop()"""
+        last_sync = None
+        while not self._stop.is_set():
+            if last_sync is None or self.clock() - last_sync >= sync_every:
+                self.sync()
+                last_sync = self.clock()
+            self.run_pending()
+            due = self.next_due()
+            wait = sync_every if due is None else max(0.5, due - self.clock())
+            self._stop.wait(min(wait, sync_every))
+
+    def start(self):
+        """Run the scheduler on a daemon thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name="poll-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
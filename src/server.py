@@ -0,0 +1,304 @@
+"""Local HTTP server so other clients can share one set of upstream calls.
+
+    python -m src.cli serve --port 8765
+    curl 'http://127.0.0.1:8765/weather?city=Lahore'
+
+Endpoints (all GET, JSON): /weather, /forecast, /history, /health, plus
+/metrics in Prometheus text format and /trace with sampled request traces
+in Chrome trace format.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from config import API_CACHE_TTL, SERVER_CACHE_MAX_ENTRIES, SERVER_HISTORY_TTL, SERVER_HOST, SERVER_PORT
+from src import metrics, tracing
+from src.daily_stats import normalize_city
+from src.data_handler import DataHandler
+from src.service import WeatherService
+
+REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 500: "Internal Server Error", 502: "Bad Gateway"}
+
+# Bodies smaller than this are sent uncompressed, gzip would not pay off
+GZIP_MIN_SIZE = 512
+KEEPALIVE_TIMEOUT = 15
+JSON = "application/json; charset=utf-8"
+
+HTTP_REQUESTS = metrics.counter("http_requests_total", "Requests served by the local server", ["path", "status"])
+HTTP_SECONDS = metrics.histogram("http_request_seconds", "Time to build a response", ["path"])
+
+
+class CachedBody:
+    """Encoded JSON response shared by every client until it expires"""
+    __slots__ = ("body", "etag", "expires", "content_type", "_gzipped")
+
+    def __init__(self, body: bytes, ttl: float, content_type: str = JSON):
+        self.body = body
+        self.content_type = content_type
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        self.expires = time.monotonic() + ttl
+        self._gzipped = None
+
+    @property
+    def gzipped(self) -> bytes:
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=6, mtime=0)
+        return self._gzipped
+
+    def max_age(self) -> int:
+        return max(0, int(self.expires - time.monotonic()))
+
+
+def encode(obj) -> bytes:
+    # Strict JSON: NaN or Infinity raise ValueError instead of producing tokens clients reject
+    return json.dumps(obj, default=str, separators=(",", ":"), allow_nan=False).encode("utf-8")
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class WeatherServer:
+    """asyncio HTTP/1.1 server answering from shared response caches.
+
+    Each (endpoint, city, units) body is built at most once per TTL: the
+    first request starts the upstream fetch on a worker thread and any
+    requests arriving meanwhile await the same future. Responses carry an
+    ETag so polling clients get a 304 without a body, and are gzipped when
+    the client accepts it.
+    """
+
+    def __init__(self, service: Optional[WeatherService] = None, host: str = SERVER_HOST,
+                 port: int = SERVER_PORT, units: str = "metric", workers: int = 8):
+        self.service = service or WeatherService()
+        self.host = host
+        self.port = port
+        self.units = units
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="server")
+        self.routes: Dict[str, Callable] = {
+            "/weather": self._weather,
+            "/forecast": self._forecast,
+            "/history": self._history,
+            "/health": self._health,
+            "/metrics": self._metrics,
+            "/trace": self._trace,
+        }
+        self.stats = {"requests": 0, "upstream": 0, "not_modified": 0, "errors": 0}
+        self._entries: Dict[tuple, CachedBody] = {}
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self._server = None
+
+    async def _cached(self, key: tuple, ttl: float, produce: Callable[[], object]) -> CachedBody:
+        entry = self._entries.get(key)
+        if entry and entry.expires > time.monotonic():
+            return entry
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        loop = asyncio.get_running_loop()
+        pending = self._inflight[key] = loop.create_future()
+        try:
+            self.stats["upstream"] += 1
+            body = await loop.run_in_executor(self.executor, tracing.wrap(produce))
+            if body is None:
+                raise HTTPError(502, "upstream request failed")
+            entry = CachedBody(body, ttl)
+            self._store(key, entry)
+            pending.set_result(entry)
+            return entry
+        except BaseException as e:
+            pending.set_exception(e)
+            # Mark retrieved so a future nobody else awaited does not warn
+            pending.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def _store(self, key: tuple, entry: CachedBody):
+        """Insert a body, evicting to stay under SERVER_CACHE_MAX_ENTRIES"""
+        entries = self._entries
+        entries.pop(key, None)
+        if len(entries) >= SERVER_CACHE_MAX_ENTRIES:
+            now = time.monotonic()
+            for stale in [k for k, cached in entries.items() if cached.expires <= now]:
+                del entries[stale]
+            # Still full: drop the oldest insertions
+            while len(entries) >= SERVER_CACHE_MAX_ENTRIES:
+                del entries[next(iter(entries))]
+        entries[key] = entry
+
+    def _city(self, query: dict) -> str:
+        city = query.get("city", [""])[0].strip()
+        if not city:
+            raise HTTPError(400, "missing city parameter")
+        return city
+
+    def _units(self, query: dict) -> str:
+        units = query.get("units", [self.units])[0]
+        if units not in ("metric", "imperial"):
+            raise HTTPError(400, "units must be metric or imperial")
+        return units
+
+    async def _weather(self, query: dict) -> CachedBody:
+        city, units = self._city(query), self._units(query)
+
+        def produce():
+            data = self.service.current(city, units)
+            if not data or data.get("cod", 200) != 200:
+                return None
+            return encode(data)
+        return await self._cached(("weather", normalize_city(city), units),
+                                  API_CACHE_TTL["weather"], produce)
+
+    async def _forecast(self, query: dict) -> CachedBody:
+        city, units = self._city(query), self._units(query)
+
+        def produce():
+            result = self.service.forecast(city, units)
+            if result is None:
+                return None
+            return encode({"forecast": result["forecast"], "alerts": result["alerts"]})
+        return await self._cached(("forecast", normalize_city(city), units),
+                                  API_CACHE_TTL["forecast"], produce)
+
+    async def _history(self, query: dict) -> CachedBody:
+        city = query.get("city", [""])[0].strip() or None
+        try:
+            days = int(query.get("days", ["30"])[0])
+        except ValueError:
+            raise HTTPError(400, "days must be an integer")
+
+        def produce():
+            df = DataHandler.get_weather_history(city, days)
+            if not df.empty:
+                df = df.assign(timestamp=df["timestamp"].dt.strftime("%Y-%m-%d %H:%M:%S"))
+                # Empty CSV cells read as NaN; JSON has null for them
+                df = df.astype(object).where(df.notna(), None)
+            return encode({"city": city, "days": days, "rows": df.to_dict(orient="records")})
+        # get_weather_history matches the city exactly, so the key must too
+        return await self._cached(("history", city, days), SERVER_HISTORY_TTL, produce)
+
+    async def _health(self, query: dict) -> CachedBody:
+        return CachedBody(encode(dict(self.stats, status="ok")), 0)
+
+    async def _metrics(self, query: dict) -> CachedBody:
+        return CachedBody(metrics.render().encode("utf-8"), 0, "text/plain; version=0.0.4; charset=utf-8")
+
+    async def _trace(self, query: dict) -> CachedBody:
+        trace_id = query.get("trace_id", [None])[0]
+        return CachedBody(encode(tracing.TRACER.chrome_trace(trace_id)), 0)
+
+    async def respond(self, method: str, target: str, headers: Dict[str, str]) -> Tuple[int, list, bytes]:
+        """Status, extra headers and body for one request"""
+        path = urlsplit(target).path
+        route = path if path in self.routes else "other"
+        with HTTP_SECONDS.time(path=route), tracing.trace(f"{method} {route}") as span:
+            status, extra, body = await self._respond(method, target, headers)
+            span.set(status=status)
+        HTTP_REQUESTS.inc(path=route, status=status)
+        return status, extra, body
+
+    async def _respond(self, method: str, target: str, headers: Dict[str, str]) -> Tuple[int, list, bytes]:
+        self.stats["requests"] += 1
+        url = urlsplit(target)
+        try:
+            if method != "GET":
+                raise HTTPError(405, "only GET is supported")
+            handler = self.routes.get(url.path)
+            if handler is None:
+                raise HTTPError(404, "unknown endpoint")
+            entry = await handler(parse_qs(url.query))
+        except HTTPError as e:
+            self.stats["errors"] += 1
+            return e.status, [], encode({"error": str(e)})
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Server error on {target}: {e}")
+            return 500, [], encode({"error": "internal error"})
+
+        extra = [("Content-Type", entry.content_type), ("ETag", entry.etag),
+                 ("Cache-Control", f"max-age={entry.max_age()}"), ("Vary", "Accept-Encoding")]
+        if entry.etag in headers.get("if-none-match", ""):
+            self.stats["not_modified"] += 1
+            return 304, extra, b""
+        body = entry.body
+        if len(body) >= GZIP_MIN_SIZE and "gzip" in headers.get("accept-encoding", ""):
+            body = entry.gzipped
+            extra.append(("Content-Encoding", "gzip"))
+        return 200, extra, body
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        line = await asyncio.wait_for(reader.readline(), KEEPALIVE_TIMEOUT)
+        if not line:
+            return None
+        parts = line.decode("latin-1").split()
+        if len(parts) != 3:
+            raise HTTPError(400, "malformed request line")
+        headers = {}
+        while True:
+            raw = await reader.readline()
+            if raw in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = raw.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return parts[0], parts[1], parts[2], headers
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    self._write(writer, e.status, [], encode({"error": str(e)}), keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, version, headers = request
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                status, extra, body = await self.respond(method, target, headers)
+                self._write(writer, status, extra, body, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _write(self, writer: asyncio.StreamWriter, status: int, extra: list, body: bytes, keep_alive: bool):
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                 f"Content-Length: {len(body)}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if not any(name == "Content-Type" for name, _ in extra):
+            lines.append(f"Content-Type: {JSON}")
+        lines.extend(f"{name}: {value}" for name, value in extra)
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port,
+                                                  reuse_address=True, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self._server
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        print(f"Serving weather on http://{self.host}:{self.port}")
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,147 @@
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+from src import tracing
+from src.alerts import AlertEngine, scan_forecast
+from src.data_handler import DataHandler
+from src.forecast_store import ForecastStore
+from src.models import Observation, ObservationBatch
+from src.quota import INTERACTIVE, SCHEDULED
+from src.weather_api import WeatherAPI
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile, 0.0 for an empty sequence"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class WeatherService:
+    """Fetch, log, forecast and alert logic shared by the GUI and the CLI.
+
+    Nothing here imports tkinter, matplotlib or pygame, so it can run on
+    servers without a display.
+    """
+
+    def __init__(self, engine: Optional[AlertEngine] = None):
+        self.engine = engine or AlertEngine.default()
+
+    def current(self, city: str, units: str = "metric", priority: int = INTERACTIVE,
+                cache: bool = True) -> Optional[Dict]:
+        """Current weather payload, or None on failure"""
+        return WeatherAPI.get_weather(city, units, priority=priority, cache=cache)
+
+    def record(self, city: str, data, save_location: bool = True, units: str = "metric"):
+        """Remember the city and append the observation to history"""
+        with tracing.span("record", city=city):
+            if save_location:
+                DataHandler.save_location(city)
+            DataHandler.log_weather(city, data, units)
+
+    def forecast(self, city: str, units: str = "metric", priority: int = INTERACTIVE) -> Optional[Dict]:
+        """Forecast payload plus one slot per day and upcoming alerts"""
+        forecast = WeatherAPI.get_forecast(city, units=units, priority=priority)
+        if not forecast or "list" not in forecast:
+            return None
+        if units == "metric":
+            # Kept for verification against history (src/forecast_store.py)
+            ForecastStore.default().record(city, forecast)
+        with tracing.span("scan_forecast", slots=len(forecast["list"])):
+            alerts = scan_forecast(forecast, self.engine, units)
+        return {
+            "forecast": forecast,
+            "days": forecast["list"][::8],
+            "alerts": alerts,
+        }
+
+    def alerts(self, payloads) -> List[List[str]]:
+        """Alert messages for each payload (or ObservationBatch row), evaluated in one batch"""
+        return self.engine.evaluate(payloads)
+
+    def _timed_fetch(self, city: str, units: str, priority: int) -> dict:
+        start = time.perf_counter()
+        try:
+            with tracing.span("fetch", city=city):
+                data = self.current(city, units, priority)
+        except Exception:
+            data = None
+        return {"city": city, "data": data, "fetch_ms": (time.perf_counter() - start) * 1000}
+
+    def poll(self, cities: Sequence[str], units: str = "metric", concurrency: int = 8,
+             log: bool = True, forecast: bool = False, priority: int = SCHEDULED) -> Dict:
+        """Fetch many cities concurrently, log them in one write and
+        evaluate alerts in one pass. Returns per-city results and timings."""
+        with tracing.trace("poll", cities=len(cities), concurrency=concurrency):
+            return self._poll(cities, units, concurrency, log, forecast, priority)
+
+    def _poll(self, cities: Sequence[str], units: str, concurrency: int,
+              log: bool, forecast: bool, priority: int) -> Dict:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            fetch = tracing.wrap(lambda c: self._timed_fetch(c, units, priority))
+            fetched = list(pool.map(fetch, cities))
+            if forecast:
+                forecasts = list(pool.map(tracing.wrap(lambda c: self.forecast(c, units, priority)), cities))
+            else:
+                forecasts = [None] * len(fetched)
+        fetch_done = time.perf_counter()
+
+        # Each response is parsed once; logging and alerts share the columns
+        observations = {}
+        for r in fetched:
+            if r["data"] and r["data"].get("cod", 200) == 200:
+                obs = Observation.from_payload(r["data"], r["city"])
+                if obs.temp is not None:
+                    observations[id(r)] = obs
+        good = [r for r in fetched if id(r) in observations]
+        # History and alert rules are both metric
+        metric = ObservationBatch.from_observations([observations[id(r)] for r in good]).to_metric(units)
+        log_start = time.perf_counter()
+        if log and good:
+            with tracing.span("log", rows=len(good)):
+                DataHandler.log_weather_many(metric)
+        log_ms = (time.perf_counter() - log_start) * 1000
+
+        alert_start = time.perf_counter()
+        with tracing.span("alerts"):
+            alert_lists = self.alerts(metric)
+        alerts_ms = (time.perf_counter() - alert_start) * 1000
+        alerts_by_city = {id(r): a for r, a in zip(good, alert_lists)}
+
+        results = []
+        for r, fc in zip(fetched, forecasts):
+            ok = id(r) in alerts_by_city
+            entry = {"city": r["city"], "ok": ok, "fetch_ms": round(r["fetch_ms"], 3)}
+            if ok:
+                obs = observations[id(r)]
+                entry.update({
+                    "temp": obs.temp,
+                    "conditions": obs.condition,
+                    "dt": obs.dt,
+                    "alerts": alerts_by_city[id(r)],
+                })
+                if forecast:
+                    entry["upcoming_alerts"] = fc["alerts"] if fc else []
+            results.append(entry)
+
+        fetch_times = [r["fetch_ms"] for r in fetched]
+        total_ms = (time.perf_counter() - started) * 1000
+        summary = {
+            "cities": len(fetched),
+            "ok": len(good),
+            "failed": len(fetched) - len(good),
+            "concurrency": concurrency,
+            "fetch_wall_ms": round((fetch_done - started) * 1000, 3),
+            "fetch_p50_ms": round(percentile(fetch_times, 50), 3),
+            "fetch_p95_ms": round(percentile(fetch_times, 95), 3),
+            "log_ms": round(log_ms, 3),
+            "alerts_ms": round(alerts_ms, 3),
+            "total_ms": round(total_ms, 3),
+            "cities_per_s": round(len(fetched) / (total_ms / 1000), 2) if total_ms else 0.0,
+        }
+        return {"results": results, "summary": summary}
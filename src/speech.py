@@ -0,0 +1,171 @@
+import hashlib
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional
+
+from config import TTS_CACHE_DIR, TTS_CACHE_MAX_MB
+
+
+def gtts_synthesize(text: str, lang: str, slow: bool, path: Path):
+    """Render speech to an MP3 file with gTTS (network call)"""
+    from gtts import gTTS
+    gTTS(text=text, lang=lang, slow=slow).save(str(path))
+
+
+class PygamePlayer:
+    """MP3 playback through pygame, mixer initialized on first use"""
+
+    def __init__(self):
+        self._mixer = None
+
+    def _music(self):
+        if self._mixer is None:
+            import pygame
+            pygame.mixer.init()
+            self._mixer = pygame.mixer
+        return self._mixer.music
+
+    def play(self, path: Path):
+        music = self._music()
+        music.load(str(path))
+        music.play()
+
+    def busy(self) -> bool:
+        return self._mixer is not None and self._mixer.music.get_busy()
+
+    def stop(self):
+        if self._mixer is not None:
+            self._mixer.music.stop()
+
+
+class SpeechCache:
+    """Size-bounded LRU of rendered MP3 files on disk"""
+
+    def __init__(self, directory: Path = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_MB * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index = None
+        self._total = 0
+
+    @staticmethod
+    def key(text: str, lang: str, slow: bool) -> str:
+        return hashlib.sha1(f"{lang}|{int(slow)}|{text}".encode("utf-8")).hexdigest()
+
+    def _load(self):
+        if self._index is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            files = sorted(self.directory.glob("*.mp3"), key=lambda p: p.stat().st_mtime)
+            self._index = OrderedDict((p.name, p.stat().st_size) for p in files)
+            self._total = sum(self._index.values())
+        return self._index
+
+    def get(self, key: str) -> Optional[Path]:
+        """Cached file for a key, marked as recently used"""
+        with self._lock:
+            index = self._load()
+            name = f"{key}.mp3"
+            if name not in index:
+                return None
+            path = self.directory / name
+            if not path.exists():
+                self._total -= index.pop(name)
+                return None
+            index.move_to_end(name)
+            os.utime(path)
+            return path
+
+    def put(self, key: str, render: Callable[[Path], None]) -> Path:
+        """Render into the cache and evict least recently used files"""
+        with self._lock:
+            self._load()
+        path = self.directory / f"{key}.mp3"
+        tmp_path = self.directory / f"{key}.{threading.get_ident()}.part"
+        try:
+            render(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            # A failed render must not leave its partial file behind
+            tmp_path.unlink(missing_ok=True)
+            raise
+        with self._lock:
+            index = self._load()
+            self._total -= index.pop(path.name, 0)
+            index[path.name] = path.stat().st_size
+            self._total += index[path.name]
+            while self._total > self.max_bytes and len(index) > 1:
+                name, size = index.popitem(last=False)
+                self._total -= size
+                try:
+                    (self.directory / name).unlink()
+                except OSError:
+                    pass
+        return path
+
+
+class SpeechService:
+    """Renders and plays announcements on a worker thread"""
+
+    def __init__(self, cache: Optional[SpeechCache] = None,
+                 synthesize: Callable = gtts_synthesize, player=None):
+        self.cache = cache or SpeechCache()
+        self.synthesize = synthesize
+        self.player = player or PygamePlayer()
+        self.errors = queue.Queue()
+        self._jobs = queue.Queue()
+        self._skip = threading.Event()
+        self._speaking = threading.Event()
+        self._generation = 0
+        self._worker = None
+
+    @property
+    def is_speaking(self) -> bool:
+        return self._speaking.is_set() or not self._jobs.empty()
+
+    def speak(self, text: str, lang: str = "en", slow: bool = False):
+        """Queue text for playback and return immediately"""
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="speech", daemon=True)
+            self._worker.start()
+        self._jobs.put((self._generation, text, lang, slow))
+
+    def skip(self):
+        """Stop the current announcement and move to the next one"""
+        self._skip.set()
+
+    def stop(self):
+        """Drop queued announcements and stop playback"""
+        self._generation += 1
+        while True:
+            try:
+                self._jobs.get_nowait()
+            except queue.Empty:
+                break
+        self._skip.set()
+
+    def _run(self):
+        while True:
+            generation, text, lang, slow = self._jobs.get()
+            if generation != self._generation:
+                continue
+            self._speaking.set()
+            self._skip.clear()
+            try:
+                key = self.cache.key(text, lang, slow)
+                path = self.cache.get(key)
+                if path is None:
+                    path = self.cache.put(key, lambda p: self.synthesize(text, lang, slow, p))
+                if generation == self._generation and not self._skip.is_set():
+                    self.player.play(path)
+                    while self.player.busy() and not self._skip.is_set():
+                        time.sleep(0.05)
+                    if self._skip.is_set():
+                        self.player.stop()
+            except Exception as e:
+                self.errors.put(e)
+            finally:
+                self._speaking.clear()
@@ -0,0 +1,126 @@
+"""City-local clock times for sunrise, sunset and the like.
+
+OpenWeatherMap payloads carry "timezone", the city's UTC offset in
+seconds, which is used when present. Otherwise the zone is found from
+"coord" with timezonefinder. It is imported and initialized on the
+first such lookup, because its cold start is slow. Zone names are
+memoized by rounded coordinates in TIMEZONE_CACHE, so each place is
+looked up once per install. tzinfo objects are kept per offset or zone,
+and a refresh costs a dict lookup.
+"""
+import json
+import threading
+from datetime import datetime, timedelta, timezone, tzinfo
+from pathlib import Path
+from typing import Dict, Optional
+
+from config import TIMEZONE_CACHE, TIMEZONE_PRECISION
+from src.history_writer import atomic_write
+from src.models import Observation
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+
+class TimezoneService:
+    _default = None
+
+    def __init__(self, path: Path = TIMEZONE_CACHE, precision: int = TIMEZONE_PRECISION):
+        self.path = Path(path)
+        self.precision = precision
+        self._zones: Optional[Dict[str, Optional[str]]] = None
+        self._tzinfos: Dict = {}
+        self._finder = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> "TimezoneService":
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def _key(self, lat: float, lon: float) -> str:
+        return f"{round(float(lat), self.precision)},{round(float(lon), self.precision)}"
+
+    def _load(self) -> Dict[str, Optional[str]]:
+        if self._zones is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._zones = json.load(f)
+            except FileNotFoundError:
+                self._zones = {}
+            except (OSError, ValueError) as e:
+                print(f"Timezone cache load error: {e}")
+                self._zones = {}
+        return self._zones
+
+    def _find(self, lat: float, lon: float) -> Optional[str]:
+        if self._finder is None:
+            try:
+                from timezonefinder import TimezoneFinder
+                self._finder = TimezoneFinder()
+            except Exception as e:
+                print(f"Timezone lookup unavailable: {e}")
+                self._finder = False
+        if not self._finder:
+            return None
+        try:
+            return self._finder.timezone_at(lng=float(lon), lat=float(lat))
+        except ValueError:
+            return None
+
+    def zone_name(self, lat: float, lon: float) -> Optional[str]:
+        """IANA zone at a point, e.g. "Asia/Karachi"; None over open sea or without timezonefinder"""
+        key = self._key(lat, lon)
+        with self._lock:
+            zones = self._load()
+            if key in zones:
+                return zones[key]
+            name = self._find(lat, lon)
+            if self._finder is False:
+                # Not cached, so installing timezonefinder later still helps
+                return None
+            zones[key] = name
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                atomic_write(self.path, json.dumps(zones, sort_keys=True))
+            except OSError as e:
+                print(f"Timezone cache save error: {e}")
+            return name
+
+    def tzinfo_for(self, data) -> Optional[tzinfo]:
+        """City time zone for a weather payload or Observation; None means the machine's own"""
+        if isinstance(data, Observation):
+            data = {'timezone': data.timezone,
+                    'coord': {'lat': data.lat, 'lon': data.lon} if data.lat is not None else None}
+        offset = data.get('timezone')
+        if offset is None:
+            offset = (data.get('city') or {}).get('timezone')
+        if isinstance(offset, (int, float)):
+            key = int(offset)
+            if key not in self._tzinfos:
+                self._tzinfos[key] = timezone(timedelta(seconds=key))
+            return self._tzinfos[key]
+        coord = data.get('coord') or (data.get('city') or {}).get('coord')
+        if not coord or ZoneInfo is None:
+            return None
+        name = self.zone_name(coord['lat'], coord['lon'])
+        if not name:
+            return None
+        if name not in self._tzinfos:
+            try:
+                self._tzinfos[name] = ZoneInfo(name)
+            except Exception:
+                self._tzinfos[name] = None
+        return self._tzinfos[name]
+
+    def local_time(self, ts, data, fmt: str = "%H:%M") -> str:
+        """Format a Unix timestamp in the payload city's local time"""
+        return datetime.fromtimestamp(ts, self.tzinfo_for(data)).strftime(fmt)
+
+
+def local_clock(ts, data, fmt: str = "%H:%M") -> str:
+    """Shortcut for TimezoneService.default().local_time"""
+    return TimezoneService.default().local_time(ts, data, fmt)
@@ -0,0 +1,239 @@
+"""Span tracing for user actions, exported in Chrome/Perfetto trace format.
+
+    from src import tracing
+    with tracing.trace("search", city=city):       # root span, sampled
+        with tracing.span("fetch"):                 # child of the current span
+            ...
+    tracing.export("trace.json")                    # open in ui.perfetto.dev
+
+Only roots make a sampling decision (TRACE_SAMPLE_RATE); spans outside a
+sampled trace are a shared no-op object, so instrumented code costs one
+context variable lookup when tracing is off. The current span lives in a
+contextvar; tracing.wrap() carries it into worker threads.
+"""
+import contextvars
+import functools
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from config import TRACE_BUFFER, TRACE_SAMPLE_RATE
+
+_current: contextvars.ContextVar = contextvars.ContextVar("weather_trace_span", default=None)
+# Marks code running under a root that was not sampled
+_UNSAMPLED = object()
+_ids = itertools.count(1)
+
+
+class Span:
+    """One timed operation; use as a context manager or start()/finish()"""
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent", "start_ns", "end_ns",
+                 "thread_id", "thread_name", "attrs", "_token", "_deferred")
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent: Optional["Span"], attrs: dict):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = next(_ids)
+        self.parent = parent
+        self.attrs = attrs
+        self.start_ns = 0
+        self.end_ns = 0
+        self.thread_id = None
+        self.thread_name = None
+        self._token = None
+        self._deferred = False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def start(self) -> "Span":
+        """Start without making this the current span"""
+        thread = threading.current_thread()
+        self.thread_id = thread.ident
+        self.thread_name = thread.name
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def finish(self):
+        if not self.end_ns:
+            self.end_ns = time.perf_counter_ns()
+            self.tracer._finished(self)
+
+    def finish_later(self):
+        """Leave the span open after its with-block; call finish() yourself"""
+        self._deferred = True
+
+    def __enter__(self):
+        self.start()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        if not self._deferred:
+            self.finish()
+        return False
+
+
+class _NullSpan:
+    """Stand-in when nothing is being traced"""
+    __slots__ = ()
+    trace_id = None
+
+    def set(self, **attrs):
+        pass
+
+    def start(self):
+        return self
+
+    def finish(self):
+        pass
+
+    def finish_later(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _UnsampledRoot(_NullSpan):
+    """Root that lost the sampling draw: children below it stay no-ops"""
+    __slots__ = ("_token",)
+
+    def __enter__(self):
+        self._token = _current.set(_UNSAMPLED)
+        return self
+
+    def __exit__(self, *exc):
+        _current.reset(self._token)
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    def __init__(self, sample_rate: float = TRACE_SAMPLE_RATE, buffer: int = TRACE_BUFFER,
+                 rng: Callable[[], float] = random.random):
+        self.sample_rate = sample_rate
+        self.rng = rng
+        self.spans = deque(maxlen=buffer)
+        self._lock = threading.Lock()
+
+    def trace(self, name: str, force: bool = False, **attrs):
+        """Root span for a user action; nested under the current span if there is one"""
+        parent = _current.get()
+        if parent is _UNSAMPLED:
+            return NULL_SPAN
+        if parent is not None:
+            return Span(self, name, parent.trace_id, parent, attrs)
+        if not force and (self.sample_rate <= 0 or self.rng() >= self.sample_rate):
+            return _UnsampledRoot()
+        return Span(self, name, os.urandom(8).hex(), None, attrs)
+
+    def span(self, name: str, **attrs):
+        """Child of the current span, or a no-op outside a sampled trace"""
+        parent = _current.get()
+        if parent is None or parent is _UNSAMPLED:
+            return NULL_SPAN
+        return Span(self, name, parent.trace_id, parent, attrs)
+
+    def start_span(self, name: str, **attrs):
+        """Child span started now and finished explicitly, e.g. from a Tk callback"""
+        return self.span(name, **attrs).start()
+
+    def traced(self, name: str):
+        """Decorator wrapping every call in a child span"""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def _finished(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+    def trace_ids(self) -> List[str]:
+        with self._lock:
+            return list(dict.fromkeys(s.trace_id for s in self.spans))
+
+    def chrome_trace(self, trace_id: Optional[str] = None) -> Dict:
+        """Trace Event Format dict: complete events plus thread names and
+        flow arrows where a span's parent ran on another thread"""
+        with self._lock:
+            spans = [s for s in self.spans if trace_id is None or s.trace_id == trace_id]
+        pid = os.getpid()
+        events, threads = [], {}
+        for s in spans:
+            threads[s.thread_id] = s.thread_name
+            args = {"trace_id": s.trace_id, "span_id": s.span_id}
+            if s.parent is not None:
+                args["parent_id"] = s.parent.span_id
+            args.update({k: v if isinstance(v, (int, float, bool, str)) or v is None else str(v)
+                         for k, v in s.attrs.items()})
+            events.append({"name": s.name, "cat": "weather", "ph": "X", "pid": pid, "tid": s.thread_id,
+                           "ts": s.start_ns / 1000, "dur": (s.end_ns - s.start_ns) / 1000, "args": args})
+            parent = s.parent
+            if parent is not None and parent.thread_id != s.thread_id:
+                flow = {"name": "thread hop", "cat": "weather", "id": s.span_id, "pid": pid}
+                events.append(dict(flow, ph="s", tid=parent.thread_id, ts=s.start_ns / 1000))
+                events.append(dict(flow, ph="f", bp="e", tid=s.thread_id, ts=s.start_ns / 1000))
+        for tid, name in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path: Path, trace_id: Optional[str] = None) -> Path:
+        """Write chrome_trace() as JSON, loadable in chrome://tracing or Perfetto"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(trace_id), f)
+        return path
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current.get()
+    return None if span is None or span is _UNSAMPLED else span.trace_id
+
+
+def wrap(fn: Callable) -> Callable:
+    """Run fn under the caller's current span, e.g. on a pool thread"""
+    parent = _current.get()
+    if parent is None:
+        return fn
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
+
+
+TRACER = Tracer()
+trace = TRACER.trace
+span = TRACER.span
+start_span = TRACER.start_span
+traced = TRACER.traced
+export = TRACER.export
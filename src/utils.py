@@ -120,7 +120,7 @@ class DataHandler:
         """Get historical weather data"""
         DataHandler.init_files()
         df = pd.read_csv(WEATHER_HISTORY)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        df['timestamp'] = pd.to_datetime(df['timestamp'], format="ISO8601")
         
         if city:
             df = df[df['city'] == city]
@@ -135,7 +135,7 @@ class DataHandler:
         """Clear old historical data"""
         DataHandler.init_files()
         df = pd.read_csv(WEATHER_HISTORY)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        df['timestamp'] = pd.to_datetime(df['timestamp'], format="ISO8601")
         
         cutoff_date = pd.Timestamp.now() - pd.Timedelta(days=days)
         df = df[df['timestamp'] >= cutoff_date]
@@ -0,0 +1,168 @@
+"""Detects stalls of the Tk event loop and records where the UI thread was.
+
+The watched thread schedules a heartbeat with tk.after every
+WATCHDOG_INTERVAL. A background thread checks how late the heartbeat is;
+while it is more than WATCHDOG_THRESHOLD late the UI thread's stack is
+sampled with sys._current_frames(). When the heartbeat runs again the
+stall is attributed to the call site seen most often and added to a
+per-site table (count, total and worst duration) and to WATCHDOG_LOG.
+
+    watchdog = StallWatchdog()
+    watchdog.start(app.after)   # from the Tk thread
+    watchdog.report()           # worst offenders first
+"""
+import json
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from config import BASE_DIR, WATCHDOG_HANG, WATCHDOG_INTERVAL, WATCHDOG_LOG, WATCHDOG_THRESHOLD
+from src import metrics
+
+UI_STALLS = metrics.histogram("ui_stall_seconds", "Tk event loop stalls past the watchdog threshold", ["site"])
+
+
+class StallSite:
+    """Stalls attributed to one line of code"""
+    __slots__ = ("site", "count", "total", "worst", "last_seen", "stack")
+
+    def __init__(self, site: str):
+        self.site = site
+        self.count = 0
+        self.total = 0.0
+        self.worst = 0.0
+        self.last_seen = 0.0
+        self.stack = []
+
+    def as_dict(self) -> dict:
+        return {"site": self.site, "count": self.count, "total": round(self.total, 4),
+                "worst": round(self.worst, 4), "last_seen": self.last_seen, "stack": self.stack}
+
+
+class StallWatchdog:
+    def __init__(self, interval: float = WATCHDOG_INTERVAL, threshold: float = WATCHDOG_THRESHOLD,
+                 hang: float = WATCHDOG_HANG, log_file: Optional[Path] = WATCHDOG_LOG,
+                 clock: Callable[[], float] = time.monotonic, root: Path = BASE_DIR):
+        self.interval = interval
+        self.threshold = threshold
+        self.hang = hang
+        self.log_file = log_file
+        self.clock = clock
+        self.root = str(root)
+        self.sites: Dict[str, StallSite] = {}
+        self.thread_id = None
+        self._schedule = None
+        self._last_beat = 0.0
+        self._samples = None  # Counter of sites while a stall is in progress
+        self._stacks = {}
+        self._dumped = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, schedule: Callable[[int, Callable], object]):
+        """Watch the calling thread; schedule(ms, callback) is e.g. tk.after"""
+        if self._thread and self._thread.is_alive():
+            return
+        self.thread_id = threading.get_ident()
+        self._schedule = schedule
+        self._stop.clear()
+        self._last_beat = self.clock()
+        self._schedule(int(self.interval * 1000), self._heartbeat)
+        self._thread = threading.Thread(target=self._run, name="ui-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+
+    def _heartbeat(self):
+        self.beat()
+        if not self._stop.is_set():
+            self._schedule(int(self.interval * 1000), self._heartbeat)
+
+    def beat(self):
+        """Called on the watched thread; closes a stall in progress"""
+        now = self.clock()
+        with self._lock:
+            lag = now - self._last_beat - self.interval
+            self._last_beat = now
+            samples, self._samples = self._samples, None
+            stacks, self._stacks = self._stacks, {}
+            self._dumped = False
+        if samples:
+            site = samples.most_common(1)[0][0]
+            self._record(site, lag, stacks[site])
+
+    def _run(self):
+        period = min(self.interval, self.threshold) / 2
+        while not self._stop.wait(period):
+            lag = self.clock() - self._last_beat - self.interval
+            if lag > self.threshold:
+                self.sample(lag)
+
+    def sample(self, lag: float):
+        """Take one stack sample of the watched thread during a stall"""
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        stack = traceback.extract_stack(frame)
+        del frame
+        site = self.call_site(stack)
+        with self._lock:
+            if self._samples is None:
+                self._samples = Counter()
+            self._samples[site] += 1
+            self._stacks.setdefault(site, stack)
+            dump = lag > self.hang and not self._dumped
+            if dump:
+                self._dumped = True
+        if dump:
+            print(f"UI thread blocked for {lag:.1f} s:\n" + "".join(stack.format()), file=sys.stderr)
+
+    def call_site(self, stack: traceback.StackSummary) -> str:
+        """Innermost frame in our own code, else the innermost frame"""
+        for entry in reversed(stack):
+            if entry.filename.startswith(self.root) and "site-packages" not in entry.filename:
+                return f"{Path(entry.filename).relative_to(self.root)}:{entry.lineno} in {entry.name}"
+        entry = stack[-1]
+        return f"{entry.filename}:{entry.lineno} in {entry.name}"
+
+    def _record(self, site: str, lag: float, stack: traceback.StackSummary):
+        lines = [f"{Path(e.filename).name}:{e.lineno} in {e.name}" for e in stack]
+        with self._lock:
+            entry = self.sites.get(site)
+            if entry is None:
+                entry = self.sites[site] = StallSite(site)
+            entry.count += 1
+            entry.total += lag
+            entry.worst = max(entry.worst, lag)
+            entry.last_seen = time.time()
+            entry.stack = lines
+        UI_STALLS.observe(lag, site=site)
+        if self.log_file:
+            try:
+                self.log_file.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.log_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({"time": entry.last_seen, "seconds": round(lag, 4),
+                                        "site": site, "stack": lines}) + "\n")
+            except OSError as e:
+                print(f"Stall log error: {e}")
+
+    def report(self) -> List[dict]:
+        """Call sites ordered by total stalled time"""
+        with self._lock:
+            rows = [site.as_dict() for site in self.sites.values()]
+        return sorted(rows, key=lambda row: row["total"], reverse=True)
+
+    def current_lag(self) -> float:
+        return max(0.0, self.clock() - self._last_beat - self.interval)
+
+    def reset(self):
+        with self._lock:
+            self.sites.clear()
@@ -1,43 +1,166 @@
 import requests
-from config import API_KEY, BASE_URL, FORECAST_URL, AIR_QUALITY_URL, GEOCODING_URL
-from datetime import datetime
+import threading
+from config import (API_KEY, BASE_URL, FORECAST_URL, AIR_QUALITY_URL, GEOCODING_URL, HISTORY_URL,
+                    API_CACHE_TTL, API_CACHE_MAX_ENTRIES)
+from datetime import datetime, timedelta
 import time
 from typing import Optional, Dict, List
+from src import metrics, tracing
+from src.quota import QuotaManager, INTERACTIVE, PRIORITY_NAMES
+from src.gazetteer import Gazetteer
+
+API_REQUESTS = metrics.counter("weather_api_requests_total", "Upstream API calls by outcome",
+                               ["endpoint", "outcome"])
+API_SECONDS = metrics.histogram("weather_api_request_seconds", "Whole upstream call, quota wait excluded",
+                                ["endpoint"])
+API_WAIT = metrics.histogram("weather_api_wait_seconds",
+                             "Until response headers arrived: DNS, connect, TLS and server time", ["endpoint"])
+API_PARSE = metrics.histogram("weather_api_parse_seconds", "JSON decoding of the response body", ["endpoint"])
+API_QUOTA_WAIT = metrics.histogram("weather_api_quota_wait_seconds", "Time spent waiting for a quota token",
+                                   ["priority"])
+API_CACHE = metrics.counter("weather_api_cache_total", "Response cache lookups", ["result"])
+
+# Trace span names for endpoints whose URL tail is not self-explanatory
+SPAN_NAMES = {"direct": "geocode", "air_pollution": "air_quality"}
+
 
 class WeatherAPI:
+    # (url, params) -> (expires_at, data); in-flight requests share one fetch
+    _cache = {}
+    _inflight = {}
+    _cache_lock = threading.Lock()
+
+    @staticmethod
+    def _fetch(url: str, params: dict, timeout: int, priority: int):
+        endpoint = url.rsplit("/", 1)[-1]
+        with API_QUOTA_WAIT.time(priority=PRIORITY_NAMES.get(priority, priority)), \
+                tracing.span("quota_wait"):
+            granted = QuotaManager.default().acquire(priority)
+        if not granted:
+            API_REQUESTS.inc(endpoint=endpoint, outcome="quota")
+            print(f"API quota exhausted, skipped request to {url}")
+            return None
+        start = time.perf_counter()
+        try:
+            with tracing.span("http") as span:
+                response = requests.get(url, params=params, timeout=timeout)
+                span.set(status=response.status_code, bytes=len(response.content))
+            API_WAIT.observe(response.elapsed.total_seconds(), endpoint=endpoint)
+            response.raise_for_status()
+            with API_PARSE.time(endpoint=endpoint), tracing.span("parse"):
+                data = response.json()
+            API_REQUESTS.inc(endpoint=endpoint, outcome="ok")
+            return data
+        except requests.HTTPError as e:
+            API_REQUESTS.inc(endpoint=endpoint, outcome=f"http_{e.response.status_code}")
+            return None
+        except:
+            API_REQUESTS.inc(endpoint=endpoint, outcome="error")
+            return None
+        finally:
+            API_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+
+    @staticmethod
+    def _request(url: str, params: dict, timeout: int = 10, priority: int = INTERACTIVE,
+                 ttl: float = 0):
+        """GET through the quota manager and response cache, returns parsed JSON or None"""
+        endpoint = url.rsplit("/", 1)[-1]
+        with tracing.span("api." + SPAN_NAMES.get(endpoint, endpoint)) as span:
+            return WeatherAPI._cached_request(url, params, timeout, priority, ttl, span)
+
+    @staticmethod
+    def _cached_request(url: str, params: dict, timeout: int, priority: int, ttl: float, span):
+        if ttl <= 0:
+            return WeatherAPI._fetch(url, params, timeout, priority)
+        key = (url, tuple(sorted((k, str(v)) for k, v in params.items() if k != "appid")))
+        with WeatherAPI._cache_lock:
+            hit = WeatherAPI._cache.get(key)
+            if hit and hit[0] > time.monotonic():
+                API_CACHE.inc(result="hit")
+                span.set(cache="hit")
+                return hit[1]
+            waiter = WeatherAPI._inflight.get(key)
+            leader = waiter is None
+            if leader:
+                waiter = WeatherAPI._inflight[key] = threading.Event()
+        API_CACHE.inc(result="miss" if leader else "shared")
+        span.set(cache="miss" if leader else "shared")
+        if not leader:
+            waiter.wait(timeout + 1)
+            with WeatherAPI._cache_lock:
+                hit = WeatherAPI._cache.get(key)
+            return hit[1] if hit else None
+        try:
+            data = WeatherAPI._fetch(url, params, timeout, priority)
+            if data is not None:
+                with WeatherAPI._cache_lock:
+                    WeatherAPI._store(key, time.monotonic() + ttl, data)
+            return data
+        finally:
+            with WeatherAPI._cache_lock:
+                del WeatherAPI._inflight[key]
+            waiter.set()
+
     @staticmethod
-    def get_coordinates(city: str) -> Optional[Dict]:
-        """Get latitude and longitude for a city"""
+    def _store(key, expires: float, data):
+        """Insert a response, evicting to stay under API_CACHE_MAX_ENTRIES; caller holds _cache_lock"""
+        cache = WeatherAPI._cache
+        cache.pop(key, None)
+        if len(cache) >= API_CACHE_MAX_ENTRIES:
+            now = time.monotonic()
+            for stale in [k for k, (expires_at, _) in cache.items() if expires_at <= now]:
+                del cache[stale]
+            # Still full: drop the oldest insertions
+            while len(cache) >= API_CACHE_MAX_ENTRIES:
+                del cache[next(iter(cache))]
+        cache[key] = (expires, data)
+
+    @staticmethod
+    def clear_cache():
+        with WeatherAPI._cache_lock:
+            WeatherAPI._cache.clear()
+
+    @staticmethod
+    def get_coordinates(city: str, priority: int = INTERACTIVE) -> Optional[Dict]:
+        """Get latitude and longitude for a city; bundled cities never reach the API"""
+        gazetteer = Gazetteer.default()
+        place = gazetteer.find(city) if gazetteer else None
+        if place:
+            return {"name": place.name, "lat": place.lat, "lon": place.lon, "country": place.country}
         params = {
             "q": city,
             "limit": 1,
             "appid": API_KEY
         }
-        try:
-            response = requests.get(GEOCODING_URL, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            return data[0] if data else None
-        except:
+        data = WeatherAPI._request(GEOCODING_URL, params, priority=priority,
+                                   ttl=API_CACHE_TTL["geocoding"])
+        return data[0] if data else None
+
+    @staticmethod
+    def get_city_name(lat: float, lon: float) -> Optional[Dict]:
+        """Nearest bundled city to a point, answered offline"""
+        gazetteer = Gazetteer.default()
+        place = gazetteer.nearest(lat, lon) if gazetteer else None
+        if not place:
             return None
+        return {"name": place.name, "lat": place.lat, "lon": place.lon, "country": place.country,
+                "distance_km": place.distance_km}
 
     @staticmethod
-    def get_weather(city: str, units: str = "metric") -> Optional[Dict]:
-        """Get current weather data"""
+    def get_weather(city: str, units: str = "metric", priority: int = INTERACTIVE,
+                    cache: bool = True) -> Optional[Dict]:
+        """Get current weather data; cache=False always asks the API"""
         params = {
             "q": city,
             "appid": API_KEY,
             "units": units
         }
-        try:
-            response = requests.get(BASE_URL, params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except:
-            return None
+        return WeatherAPI._request(BASE_URL, params, priority=priority,
+                                   ttl=API_CACHE_TTL["weather"] if cache else 0)
 
     @staticmethod
-    def get_forecast(city: str, days: int = 5, units: str = "metric") -> Optional[Dict]:
+    def get_forecast(city: str, days: int = 5, units: str = "metric",
+                     priority: int = INTERACTIVE) -> Optional[Dict]:
         """Get weather forecast"""
         params = {
             "q": city,
@@ -45,40 +168,35 @@ class WeatherAPI:
             "units": units,
             "cnt": days * 8  # 3-hour intervals
         }
-        try:
-            response = requests.get(FORECAST_URL, params=params, timeout=15)
-            response.raise_for_status()
-            return response.json()
-        except:
-            return None
+        return WeatherAPI._request(FORECAST_URL, params, timeout=15, priority=priority,
+                                   ttl=API_CACHE_TTL["forecast"])
 
     @staticmethod
-    def get_air_quality(lat: float, lon: float) -> Optional[Dict]:
+    def get_air_quality(lat: float, lon: float, priority: int = INTERACTIVE) -> Optional[Dict]:
         """Get air quality data"""
         params = {
             "lat": lat,
             "lon": lon,
             "appid": API_KEY
         }
-        try:
-            response = requests.get(AIR_QUALITY_URL, params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except:
-            return None
+        return WeatherAPI._request(AIR_QUALITY_URL, params, priority=priority,
+                                   ttl=API_CACHE_TTL["air_quality"])
 
     @staticmethod
-    def get_historical(lat: float, lon: float, date: datetime) -> Optional[Dict]:
-        """Get historical weather data"""
+    def get_historical(lat: float, lon: float, start: datetime, end: Optional[datetime] = None,
+                       units: str = "metric", priority: int = INTERACTIVE) -> Optional[Dict]:
+        """Hourly observations from start up to end (default: one day later).
+
+        The history API answers at most a week per call; longer ranges go
+        through src/backfill.py in chunks."""
+        end = end or start + timedelta(days=1)
         params = {
             "lat": lat,
             "lon": lon,
-            "dt": int(date.timestamp()),
+            "type": "hour",
+            "start": int(start.timestamp()),
+            "end": int(end.timestamp()),
+            "units": units,
             "appid": API_KEY
         }
-        try:
-            response = requests.get(BASE_URL, params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except:
-            return None
\ No newline at end of file
+        return WeatherAPI._request(HISTORY_URL, params, timeout=30, priority=priority)
@@ -0,0 +1,41 @@
+import sys
+from pathlib import Path
+
+import pytest
+import config
+
+DATA_ROOT = config.BASE_DIR / "data"
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Point every data file path at a temporary directory"""
+    for name, value in vars(config).items():
+        if not isinstance(value, Path) or DATA_ROOT not in value.parents:
+            continue
+        new_value = tmp_path / value.relative_to(DATA_ROOT)
+        monkeypatch.setattr(config, name, new_value)
+        for module_name, module in list(sys.modules.items()):
+            if module_name.startswith("src.") and getattr(module, name, None) == value:
+                monkeypatch.setattr(module, name, new_value)
+    (tmp_path / "backups").mkdir()
+
+    from src.daily_stats import DailyStats
+    from src.quota import QuotaManager
+    from src.weather_api import WeatherAPI
+    monkeypatch.setattr(DailyStats, "_table", None)
+    monkeypatch.setattr(QuotaManager, "_default", None)
+    WeatherAPI.clear_cache()
+    return tmp_path
+
+
+@pytest.fixture
+def mock_api(data_dir, monkeypatch):
+    """Let the test point WeatherAPI at a MockOWM with use_api_root: the
+    API URLs are restored afterwards and the quota leaves room for the mock"""
+    import src.weather_api as weather_api
+    from src.quota import QuotaManager
+    for name in ("BASE_URL", "FORECAST_URL", "AIR_QUALITY_URL", "GEOCODING_URL", "HISTORY_URL"):
+        monkeypatch.setattr(config, name, getattr(config, name))
+        monkeypatch.setattr(weather_api, name, getattr(weather_api, name))
+    monkeypatch.setattr(QuotaManager, "_default", QuotaManager(limits=(("minute", 1000, 60),)))
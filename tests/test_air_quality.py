@@ -0,0 +1,49 @@
+import numpy as np
+
+from benchmarks.mock_owm import MockOWM, use_api_root
+from src.air_quality import (AIR_QUALITY_COLUMNS, BREAKPOINTS, INDEX_BANDS, TRUNCATE, UNIT_FACTORS,
+                             AirQualityService, compute_aqi)
+
+
+def scalar_aqi(name, value):
+    """Textbook EPA formula for one concentration"""
+    c = value * UNIT_FACTORS.get(name, 1.0)
+    scale = 10 ** TRUNCATE[name]
+    c = int(c * scale + 1e-9) / scale
+    for (c_lo, c_hi), (i_lo, i_hi) in zip(BREAKPOINTS[name], INDEX_BANDS.tolist()):
+        if c <= c_hi:
+            return round((i_hi - i_lo) / (c_hi - c_lo) * (max(c, c_lo) - c_lo) + i_lo)
+    return 500
+
+
+def test_known_values():
+    aqi, dominant = compute_aqi({
+        "pm2_5": np.array([35.4, 12.0, 1.0, np.nan]), "pm10": np.array([154, 20, 1, np.nan]),
+        "o3": np.array([10, 10, 100, np.nan]), "no2": np.array([1, 1, 1, np.nan]),
+        "so2": np.array([1, 1, 1, np.nan]), "co": np.array([100, 100, 5000, np.nan]),
+    })
+    assert aqi[:3].tolist() == [100, 56, 49]
+    assert dominant.tolist() == ["pm2_5", "pm2_5", "co", ""] and np.isnan(aqi[3])
+
+
+def test_vectorized_matches_scalar():
+    rng = np.random.default_rng(7)
+    limits = {"pm2_5": 400, "pm10": 700, "o3": 450, "no2": 4000, "so2": 2800, "co": 60000}
+    values = {name: rng.uniform(0, top, 2000) for name, top in limits.items()}
+    aqi, _ = compute_aqi(values)
+    expected = [max(scalar_aqi(name, values[name][i]) for name in limits) for i in range(2000)]
+    assert aqi.tolist() == expected
+
+
+def test_refresh_against_mock(data_dir, mock_api):
+    service = AirQualityService(data_dir / "air_quality_history.csv")
+    with MockOWM() as mock:
+        use_api_root(mock.root)
+        summary = service.refresh(["Lahore", "Karachi", "Mockville", "Nowhere Town"])
+        # Bundled cities need only the pollution call; Mockville is geocoded once
+        assert mock.stats["requests"] == 5
+    assert summary["failed"] == ["Nowhere Town"]
+    df = service.history()
+    assert list(df.columns) == AIR_QUALITY_COLUMNS
+    assert df["city"].tolist() == ["Lahore", "Karachi", "Mockville"]
+    assert df["aqi"].between(0, 500).all() and df["dominant"].isin(BREAKPOINTS).all()
@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+from src.alerts import AlertEngine, AlertNotifier, AlertRule, AlertStateStore, scan_forecast
+from src.models import Observation
+
+
+def payload(temp=20, condition='Clear', wind=5):
+    return {
+        'main': {'temp': temp, 'humidity': 50},
+        'weather': [{'main': condition}],
+        'wind': {'speed': wind},
+        'sys': {}
+    }
+
+
+@pytest.mark.parametrize("temp,expected", [
+    (4.9, ["Low temperature warning: 4.9°C"]), (5.0, []),
+    (35.0, []), (35.1, ["High temperature warning: 35.1°C"])
+])
+def test_default_rules_temperature_boundaries(temp, expected):
+    assert AlertEngine.default().check(payload(temp=temp)) == expected
+
+
+def test_default_rules_keep_alert_order():
+    """Temperature, condition and wind alerts come out in rule order"""
+    alerts = AlertEngine.default().check(payload(temp=38, condition='Thunderstorm', wind=12))
+    assert len(alerts) == 3
+    assert "High temperature warning" in alerts[0]
+    assert "Weather alert: Thunderstorm" in alerts[1]
+    assert "High wind warning" in alerts[2]
+
+
+def test_check_raises_on_malformed_payload():
+    """A payload missing a rule field raises KeyError naming the field"""
+    with pytest.raises(KeyError, match="temp"):
+        AlertEngine.default().check({'weather': [{'main': 'Clear'}], 'wind': {'speed': 5}})
+    with pytest.raises(KeyError, match="condition"):
+        AlertEngine.default().check({'main': {'temp': 20}, 'weather': [], 'wind': {'speed': 5}})
+
+
+def test_batch_mask_matches_single_checks():
+    """One vectorized pass agrees with per-payload evaluation"""
+    engine = AlertEngine.default()
+    batch = [payload(t, c, w) for t, c, w in
+             [(40, 'Clear', 2), (0, 'Extreme', 15), (20, 'Rain', 10.5), (20, 'Clear', 1)]]
+    mask = engine.mask(engine.columns(batch))
+    assert mask.shape == (len(engine.rules), len(batch))
+    assert engine.evaluate(batch) == [engine.check(p) for p in batch]
+    assert mask.sum(axis=0).tolist() == [1, 3, 1, 0]
+
+
+def test_missing_fields_do_not_fire_in_batch():
+    engine = AlertEngine.default()
+    assert engine.evaluate([{'main': {}}]) == [[]]
+
+
+def test_custom_rules_and_validation():
+    engine = AlertEngine([AlertRule("humid", "humidity", ">=", 90, "Humid: {humidity}%")])
+    columns = {"humidity": np.array([89.0, 90.0, np.nan])}
+    assert engine.mask(columns)[0].tolist() == [False, True, False]
+    with pytest.raises(ValueError):
+        AlertRule("bad", "condition", ">", "Rain", "")
+    with pytest.raises(ValueError):
+        AlertRule("bad", "dew_point", ">", 1, "")
+
+
+def test_scan_forecast_merges_consecutive_slots():
+    """Back-to-back windy slots become one upcoming event"""
+    slots = [dict(payload(wind=w), dt=1000 + i * 10800) for i, w in enumerate([3, 12, 14, 4, 11])]
+    events = scan_forecast({"city": {"name": "Gwadar"}, "list": slots})
+    assert [(e["rule"], e["start"], e["end"]) for e in events] == [
+        ("high_wind", 1000 + 10800, 1000 + 2 * 10800),
+        ("high_wind", 1000 + 4 * 10800, 1000 + 4 * 10800),
+    ]
+    assert events[0]["city"] == "Gwadar"
+
+
+def test_scan_forecast_converts_imperial_units():
+    """Rules are in °C and m/s: 90°F and 20 mph are no alert, 96.8°F, 25 mph and 40°F are"""
+    slots = [dict(payload(temp=t, wind=w), dt=1000 + i * 10800)
+             for i, (t, w) in enumerate([(90, 20), (96.8, 25), (40, 5)])]
+    events = scan_forecast({"list": slots}, units="imperial")
+    assert [(e["rule"], e["start"], e["message"]) for e in events] == [
+        ("high_temp", 1000 + 10800, "High temperature warning: 36°C"),
+        ("high_wind", 1000 + 10800, "High wind warning: 11.18 m/s"),
+        ("low_temp", 1000 + 2 * 10800, "Low temperature warning: 4.44°C"),
+    ]
+    # Read as metric, every slot is hot and the first two windy
+    assert [(e["rule"], e["end"]) for e in scan_forecast({"list": slots})] == [
+        ("high_temp", 1000 + 2 * 10800), ("high_wind", 1000 + 10800)]
+
+
+def test_observations_are_read_directly_and_converted():
+    """A single parsed observation needs no batch; imperial values become metric"""
+    engine = AlertEngine.default()
+    obs = Observation.from_payload(payload(temp=96.8, wind=25))
+    assert [a.rule for a in engine.alerts([obs])] == ["high_temp", "high_wind"]
+    assert engine.evaluate([obs], units="imperial") == [
+        ["High temperature warning: 36°C", "High wind warning: 11.18 m/s"]]
+    assert engine.alerts([payload(temp=90, wind=20)], strict=True, units="imperial") == []
+
+
+def test_notifier_deduplicates_across_restarts(tmp_path):
+    sent = []
+    alert = {"rule": "high_wind", "message": "High wind warning: 12 m/s", "start": 1700000000}
+    notifier = AlertNotifier(AlertStateStore(tmp_path / "state.json"), 0,
+                             lambda title, message: sent.append(message))
+    assert notifier.submit("Lahore", [alert])
+    assert not notifier.submit("lahore", [alert])
+
+    restarted = AlertNotifier(AlertStateStore(tmp_path / "state.json"), 0,
+                              lambda title, message: sent.append(message))
+    assert not restarted.submit("Lahore", [alert])
+    assert len(sent) == 1
+
+
+def test_notifier_coalesces_within_rate_limit(tmp_path):
+    sent = []
+    notifier = AlertNotifier(AlertStateStore(tmp_path / "state.json"), 300,
+                             lambda title, message: sent.append((title, message)))
+    notifier.submit("Lahore", [{"rule": "high_temp", "message": "hot", "start": None}])
+    notifier.submit("Lahore", [{"rule": "high_wind", "message": "windy", "start": None}])
+    notifier.submit("Multan", [{"rule": "high_temp", "message": "hotter", "start": None}])
+    assert len(sent) == 1
+    assert notifier.pending_delay() > 0
+
+    notifier.flush(force=True)
+    assert sent[1] == ("Weather Alerts (2)", "windy\nhotter")
+    assert notifier.pending_delay() is None
@@ -0,0 +1,49 @@
+import time
+
+from src.autocomplete import CityIndex, bounded_distance, fold
+from src.data_handler import DataHandler
+
+
+def labels(index, text):
+    return [s.label for s in index.suggest(text)]
+
+
+def test_fold_ignores_case_accents_and_spacing():
+    assert fold("  São   PAULO ") == "sao paulo"
+    assert fold("Zürich") == fold("zurich")
+    assert bounded_distance("lahroe", "lahore", 2) == 2
+    assert bounded_distance("lahroe", "karachi", 2) == 3
+
+
+def test_prefix_word_and_typo_matches():
+    index = CityIndex.build()
+    assert labels(index, "lah")[0] == "Lahore, PK"
+    assert "New York, US" in labels(index, "york")
+    assert labels(index, "zuri") == ["Zürich, CH"]
+    assert labels(index, "lahroe")[0] == "Lahore, PK"
+    assert index.suggest("") == []
+
+
+def test_usage_and_history_rank_first():
+    index = CityIndex.build(saved=[("Larkana", 3), ("Lagos", 1)], history=["Lahore", "Lakeside"])
+    assert labels(index, "la")[:4] == ["Larkana, PK", "Lagos, NG", "Lahore, PK", "Lakeside"]
+    for _ in range(4):
+        index.record_use("lahore")
+    assert labels(index, "la")[0] == "Lahore, PK"
+
+
+def test_ambiguous_names_query_with_the_country():
+    index = CityIndex.build()
+    queries = {s.label: s.query for s in index.suggest("hyderabad")}
+    assert queries["Hyderabad, PK"] == "Hyderabad,PK"
+    assert index.suggest("karachi")[0].query == "Karachi"
+
+
+def test_keystrokes_stay_under_five_ms(data_dir):
+    DataHandler.save_location("Lahore")
+    index = CityIndex.build(saved=DataHandler.get_location_usage(), history=DataHandler.get_history_cities())
+    index.suggest("a")
+    for text in ("k", "ka", "kar", "karc", "karch", "karchi", "san j", "mumbay"):
+        start = time.perf_counter()
+        index.suggest(text)
+        assert time.perf_counter() - start < 0.005
@@ -0,0 +1,76 @@
+from datetime import datetime
+
+import pandas as pd
+
+from benchmarks.mock_owm import MockOWM, use_api_root
+from src.backfill import BackfillJob, Checkpoint, plan_chunks
+from src.weather_api import WeatherAPI
+
+START = datetime(2025, 3, 1)
+END = datetime(2025, 3, 20, 12, 30)
+
+
+def fake_fetch(chunk, units):
+    return [{"dt": dt, "main": {"temp": 20 + dt % 7, "humidity": 40, "pressure": 1000},
+             "weather": [{"main": "Clear"}], "wind": {"speed": 2}, "visibility": 10000}
+            for dt in range(chunk.start, chunk.end, 3600)]
+
+
+def test_chunks_cover_the_range_once():
+    chunks = plan_chunks("Lahore", 31.5, 74.3, START, END, chunk_hours=168)
+    assert chunks[0].start == int(START.timestamp()) and chunks[-1].end == int(datetime(2025, 3, 20, 12).timestamp())
+    assert all(a.end == b.start for a, b in zip(chunks, chunks[1:]))
+    assert all(c.start % (168 * 3600) == 0 for c in chunks[1:])
+    assert plan_chunks("Lahore", 31.5, 74.3, START, END, chunk_hours=168) == chunks
+
+
+def test_interrupted_job_resumes_without_refetching(data_dir):
+    checkpoint = Checkpoint(data_dir / "backfill.jsonl")
+    calls = []
+
+    def flaky(chunk, units):
+        calls.append(chunk.key)
+        return None if chunk.city == "Karachi" and chunk.start > START.timestamp() else fake_fetch(chunk, units)
+
+    first = BackfillJob(["Lahore", "Karachi"], START, END, checkpoint=checkpoint, retries=0,
+                        batch_chunks=2, concurrency=3, fetch=flaky).run()
+    assert (first["chunks"], first["fetched"], first["failed"]) == (8, 5, 3)
+
+    calls.clear()
+    second = BackfillJob(["Lahore", "Karachi"], START, END, checkpoint=checkpoint,
+                         fetch=lambda chunk, units: calls.append(chunk.key) or fake_fetch(chunk, units)).run()
+    assert second["skipped"] == first["fetched"] and len(calls) == first["failed"]
+
+    df = pd.read_csv(data_dir / "weather_history.csv")
+    hours = int((datetime(2025, 3, 20, 12) - START).total_seconds() // 3600)
+    assert df.groupby("city").size().to_dict() == {"Karachi": hours, "Lahore": hours}
+    assert not df.duplicated(["city", "timestamp"]).any()
+    assert df["timestamp"].min() == START.isoformat()
+
+
+def test_history_endpoint_against_mock(data_dir, mock_api):
+    with MockOWM() as mock:
+        use_api_root(mock.root)
+        data = WeatherAPI.get_historical(31.52, 74.36, START, datetime(2025, 3, 2))
+        assert data["cnt"] == 25 and data["list"][0]["dt"] == int(START.timestamp())
+        summary = BackfillJob(["Lahore"], START, datetime(2025, 3, 15),
+                              checkpoint=Checkpoint(data_dir / "backfill.jsonl")).run()
+    assert (summary["chunks"], summary["failed"], summary["rows"]) == (3, 0, 14 * 24)
+
+
+def test_backfilled_history_reads_back(data_dir):
+    """Backfilled rows have no microseconds; earlier logged rows do"""
+    from src.data_handler import DataHandler
+    (data_dir / "weather_history.csv").write_text(
+        "city,temp,humidity,conditions,pressure,wind_speed,visibility,timestamp\n"
+        "Lahore,30,40,Clear,1000,2,10,2025-01-01T09:00:00.123456\n"
+        "Lahore,31,40,Clear,1000,2,10,2025-03-25T09:00:00.654321\n", encoding="utf-8")
+    summary = BackfillJob(["Lahore"], START, datetime(2025, 3, 2), checkpoint=Checkpoint(data_dir / "backfill.jsonl"),
+                          fetch=fake_fetch).run()
+    assert summary["rows"] == 24
+
+    days = (datetime.now() - datetime(2025, 2, 1)).days
+    df = DataHandler.get_weather_history("Lahore", days=days)
+    assert len(df) == 25 and df["timestamp"].iloc[0] == pd.Timestamp(START)
+    assert DataHandler.clear_history(days) == 25
+    assert len(DataHandler.get_weather_history(days=days + 100)) == 25
@@ -0,0 +1,46 @@
+import json
+import subprocess
+import sys
+import time
+
+from config import BASE_DIR
+from src import cli
+from src.data_handler import DataHandler
+from src.weather_api import WeatherAPI
+
+
+def fake_weather(city, units="metric", priority=None, cache=True):
+    if city == "Atlantis":
+        return None
+    return {
+        'cod': 200, 'name': city, 'dt': int(time.time()),
+        'main': {'temp': 40 if city == "Jacobabad" else 20, 'humidity': 30, 'pressure': 1000},
+        'weather': [{'main': 'Clear'}], 'wind': {'speed': 3}, 'visibility': 10000
+    }
+
+
+def test_poll_prints_results_and_summary(data_dir, monkeypatch, capsys, tmp_path):
+    monkeypatch.setattr(WeatherAPI, "get_weather", staticmethod(fake_weather))
+    cities_file = tmp_path / "cities.txt"
+    cities_file.write_text("# cities\nLahore\nJacobabad\nAtlantis\n", encoding="utf-8")
+
+    code = cli.main(["poll", "--cities-file", str(cities_file), "--concurrency", "4"])
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+    assert code == 1
+    by_city = {r["city"]: r for r in records if r["event"] == "city"}
+    assert by_city["Jacobabad"]["alerts"] == ["High temperature warning: 40°C"]
+    assert not by_city["Atlantis"]["ok"]
+    summary = records[-1]
+    assert summary["event"] == "summary"
+    assert (summary["cities"], summary["ok"], summary["failed"]) == (3, 2, 1)
+    assert len(DataHandler.get_weather_history()) == 2
+
+
+def test_headless_import_skips_gui_libraries():
+    """The CLI must not pull in tkinter, matplotlib or pygame"""
+    code = ("import sys, src.cli; "
+            "print([m for m in ('tkinter', 'matplotlib', 'pygame') if m in sys.modules])")
+    out = subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR,
+                         capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "[]"
@@ -0,0 +1,73 @@
+import pytest
+from src.data_handler import DataHandler
+from src.daily_stats import DailyStats
+
+
+def make_payload(temp, humidity=50, wind=3.0):
+    return {
+        'main': {'temp': temp, 'humidity': humidity, 'pressure': 1000},
+        'weather': [{'main': 'Clear'}],
+        'wind': {'speed': wind},
+        'visibility': 10000
+    }
+
+
+def test_log_weather_updates_daily_stats(data_dir):
+    """Each logged row is folded into the city-day statistics"""
+    for temp in (20, 30, 25):
+        DataHandler.log_weather("Lahore", make_payload(temp))
+
+    day = DataHandler.get_weather_history("Lahore")['timestamp'].iloc[0].date()
+    stats = DailyStats.get("lahore", day)
+    assert stats['temp']['count'] == 3
+    assert stats['temp']['min'] == 20
+    assert stats['temp']['max'] == 30
+    assert stats['temp']['mean'] == pytest.approx(25)
+    assert stats['temp']['variance'] == pytest.approx(25)
+
+
+def test_stats_survive_reload(data_dir):
+    """Table is persisted and reloaded without rescanning history"""
+    DataHandler.log_weather("Karachi", make_payload(31))
+    DailyStats._table = None
+    assert DailyStats.summary("KARACHI")[0]['temp']['max'] == 31
+
+
+def test_rebuild_matches_incremental(data_dir):
+    """Rebuilding from the CSV gives the same numbers as incremental updates"""
+    for temp, humidity in ((10, 40), (14, 60), (12, 50)):
+        DataHandler.log_weather("Quetta", make_payload(temp, humidity))
+    incremental = DailyStats.summary("Quetta")
+    DailyStats.rebuild()
+    rebuilt = DailyStats.summary("Quetta")
+    assert rebuilt[0]['humidity'] == pytest.approx(incremental[0]['humidity'])
+
+
+def test_unknown_city_returns_none(data_dir):
+    assert DailyStats.get("Nowhere", "2025-01-01") is None
+    assert DailyStats.summary("Nowhere") == []
+
+
+def test_rows_are_journaled_then_compacted(data_dir, monkeypatch):
+    """Logging appends to the journal; the JSON file is only rewritten on compaction"""
+    import src.daily_stats as daily_stats
+    monkeypatch.setattr(daily_stats, "DAILY_STATS_COMPACT_OPS", 3)
+    DataHandler.log_weather("Multan", make_payload(35))
+    snapshot = (data_dir / "daily_stats.json").read_bytes()
+    DataHandler.log_weather("Multan", make_payload(36))
+    assert (data_dir / "daily_stats.json").read_bytes() == snapshot
+    assert len((data_dir / "daily_stats.journal").read_text().splitlines()) == 2
+
+    DataHandler.log_weather("Multan", make_payload(37))
+    assert (data_dir / "daily_stats.journal").read_bytes() == b""
+    DailyStats._table = None
+    assert DailyStats.summary("Multan")[0]['temp']['count'] == 3
+
+
+def test_other_processes_rows_are_picked_up(data_dir):
+    DataHandler.log_weather("Sukkur", make_payload(30))
+    day = DailyStats.summary("Sukkur")[0]['day']
+    # Another process appends to the same journal
+    with open(data_dir / "daily_stats.journal", 'a', encoding='utf-8') as f:
+        f.write(f'["Sukkur", "{day}", {{"temp": 40.0}}]\n')
+    assert DailyStats.get("Sukkur", day)['temp']['max'] == 40
@@ -0,0 +1,80 @@
+import csv
+from datetime import datetime
+
+import numpy as np
+
+from src.forecast_store import HEADER, RECORD, ForecastAccuracy, ForecastStore
+from src.history_writer import HISTORY_COLUMNS
+
+ISSUED = int(datetime(2025, 5, 1, 0, 0).timestamp())
+
+
+def forecast(base_temp=20.0, slots=16):
+    return {"list": [{"dt": ISSUED + 3600 * 3 * (i + 1),
+                      "main": {"temp": base_temp + i, "humidity": 50, "pressure": 1000},
+                      "wind": {"speed": 3}} for i in range(slots)]}
+
+
+def write_history(path, hours, temp=lambda h: 20.0, city="Lahore"):
+    new = not path.exists()
+    with open(path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=HISTORY_COLUMNS, lineterminator='\n')
+        if new:
+            writer.writeheader()
+        for h in hours:
+            writer.writerow({"city": city, "temp": temp(h), "humidity": 40, "conditions": "Clear",
+                             "pressure": 1000, "wind_speed": 3, "visibility": 10,
+                             "timestamp": datetime.fromtimestamp(ISSUED + h * 3600).isoformat()})
+
+
+def test_snapshots_are_compact_and_throttled(data_dir):
+    store = ForecastStore(data_dir / "snapshots.bin", interval_minutes=180)
+    assert store.record("Lahore", forecast(), issued=ISSUED) == 16
+    assert store.record(" lahore ", forecast(), issued=ISSUED + 3600) == 0
+    assert store.record("Karachi", forecast(), issued=ISSUED + 3600) == 16
+    assert store.record("Lahore", forecast(), issued=ISSUED + 3 * 3600) == 16
+    assert (data_dir / "snapshots.bin").stat().st_size == HEADER.size + 48 * RECORD.itemsize == 1404
+    # A new process sees the same cities and throttling
+    again = ForecastStore(data_dir / "snapshots.bin")
+    assert again.names() == ["Lahore", "Karachi"]
+    assert again.record("Karachi", forecast(), issued=ISSUED + 7200) == 0
+    assert again.read(16)["city"].tolist() == [1] * 16 + [0] * 16
+
+
+def test_accuracy_updates_incrementally(data_dir):
+    history = data_dir / "weather_history.csv"
+    store = ForecastStore(data_dir / "snapshots.bin")
+    store.record("Lahore", forecast(), issued=ISSUED)
+    accuracy = ForecastAccuracy(store, history, data_dir / "accuracy.npz")
+
+    write_history(history, range(0, 25))
+    first = accuracy.update(now=ISSUED + 30 * 3600)
+    # Slots up to 27 h are due; the one at 27 h has no observation yet
+    assert first == {"observations": 25, "matched": 8, "missed": 1, "pending": 7}
+
+    write_history(history, range(25, 60), temp=lambda h: 21.0)
+    write_history(history, range(0, 60), city="Unknown")
+    second = ForecastAccuracy(store, history, data_dir / "accuracy.npz").update(now=ISSUED + 70 * 3600)
+    assert second == {"observations": 35, "matched": 7, "missed": 0, "pending": 0}
+
+    reloaded = ForecastAccuracy(store, history, data_dir / "accuracy.npz")
+    report = {row["lead_hours"]: row for row in reloaded.report("Lahore")}
+    assert sorted(report) == [3 * (i + 1) for i in range(16) if i != 8]
+    # Forecast 20 + i against 20 (before 25 h) or 21 observed
+    assert report[3]["bias"] == 0 and report[24]["bias"] == 7 and report[30]["bias"] == 8
+    assert report[48]["rmse"] == report[48]["mae"] == 14
+    assert {row["bias"] for row in reloaded.report(field="humidity")} == {10}
+
+
+def test_rewritten_history_is_read_again(data_dir):
+    history = data_dir / "weather_history.csv"
+    store = ForecastStore(data_dir / "snapshots.bin")
+    store.record("Lahore", forecast(slots=4), issued=ISSUED)
+    accuracy = ForecastAccuracy(store, history, data_dir / "accuracy.npz")
+    write_history(history, range(0, 6))
+    assert accuracy.update(now=ISSUED)["observations"] == 6
+    history.unlink()
+    write_history(history, range(0, 13), temp=lambda h: 25.0)
+    summary = accuracy.update(now=ISSUED + 24 * 3600)
+    assert summary == {"observations": 13, "matched": 4, "missed": 0, "pending": 0}
+    assert np.allclose([row["bias"] for row in accuracy.report()], [-5, -4, -3, -2])
@@ -0,0 +1,48 @@
+import math
+import random
+
+from src.gazetteer import Gazetteer, build_gazetteer, read_cities_csv
+from src.weather_api import WeatherAPI
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0088 * math.asin(math.sqrt(a))
+
+
+def test_forward_lookup_prefers_country_then_population(tmp_path):
+    csv_path = tmp_path / "cities.csv"
+    csv_path.write_text("name,country,lat,lon,population\n"
+                        "Hyderabad,PK,25.396,68.3578,1733000\n"
+                        "Hyderabad,IN,17.385,78.4867,10534000\n"
+                        "Zürich,CH,47.3769,8.5417,1415000\n", encoding="utf-8")
+    assert build_gazetteer(csv_path, tmp_path / "cities.bin") == 3
+    gazetteer = Gazetteer.open(tmp_path / "cities.bin")
+    assert gazetteer.find("hyderabad").country == "IN"
+    assert gazetteer.find("Hyderabad, pk").lat == 25.396
+    assert gazetteer.find("ZURICH").name == "Zürich"
+    assert gazetteer.find("Hyderabad,GB") is None and gazetteer.find("Nowhere") is None
+
+
+def test_nearest_matches_brute_force():
+    gazetteer = Gazetteer.load()
+    cities = read_cities_csv()
+    rng = random.Random(7)
+    # Random points plus the poles and both sides of the date line
+    points = [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(300)]
+    points += [(90, 0), (-90, 0), (65, 179.9), (65, -179.9)]
+    for lat, lon in points:
+        expected = min(haversine(lat, lon, c[2], c[3]) for c in cities)
+        assert abs(gazetteer.nearest(lat, lon).distance_km - expected) < 0.5
+
+
+def test_rebuilds_when_the_csv_changes(tmp_path):
+    csv_path = tmp_path / "cities.csv"
+    csv_path.write_text("name,country,lat,lon,population\nLahore,PK,31.5204,74.3587,11126000\n", encoding="utf-8")
+    assert Gazetteer.load(tmp_path / "cities.bin", csv_path).nearest(31.6, 74.4).name == "Lahore"
+
+
+def test_weather_api_reverse_lookup_is_offline():
+    place = WeatherAPI.get_city_name(31.6, 74.4)
+    assert (place["name"], place["country"]) == ("Lahore", "PK") and place["distance_km"] < 15
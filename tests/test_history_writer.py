@@ -0,0 +1,161 @@
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from src.data_handler import DataHandler
+from src.history_writer import HISTORY_COLUMNS, HistoryWriter
+
+
+def row(city, temp, timestamp="2025-05-23T10:00:00"):
+    return {"city": city, "temp": temp, "humidity": 40, "conditions": "Clear", "pressure": 1000,
+            "wind_speed": 2.5, "visibility": 10.0, "timestamp": timestamp}
+
+
+def test_rows_are_committed_in_batches(tmp_path):
+    path = tmp_path / "history.csv"
+    writer = HistoryWriter(path, batch_rows=3, flush_seconds=60)
+    writer.submit([row("Lahore", 30), row("Karachi", 31)])
+    assert not path.exists() and writer.pending == 2
+
+    writer.submit([row("Quetta", 12)])
+    assert writer.pending == 0 and writer.commits == 1
+    df = pd.read_csv(path)
+    assert list(df.columns) == HISTORY_COLUMNS
+    assert list(df["city"]) == ["Lahore", "Karachi", "Quetta"]
+    writer.close()
+    with pytest.raises(RuntimeError):
+        writer.submit([row("Multan", 35)])
+
+
+def test_pending_rows_flush_after_the_delay(tmp_path):
+    path = tmp_path / "history.csv"
+    writer = HistoryWriter(path, batch_rows=100, flush_seconds=0.05, fsync="never")
+    writer.submit([row("Lahore", 30)])
+    deadline = time.monotonic() + 2
+    while writer.commits == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert writer.commits == 1
+    assert list(pd.read_csv(path)["city"]) == ["Lahore"]
+    writer.close()
+
+
+def test_appends_follow_the_existing_header(tmp_path):
+    path = tmp_path / "history.csv"
+    # Older file: different column order and no trailing newline
+    path.write_text("timestamp,city,temp\n2025-05-22T10:00:00,Gilgit,9", encoding="utf-8")
+    writer = HistoryWriter(path, fsync="interval", fsync_interval=0)
+    writer.submit([row("Lahore", 30, "2025-05-23T10:00:00")])
+    writer.flush()
+    assert path.read_text(encoding="utf-8").splitlines() == [
+        "timestamp,city,temp", "2025-05-22T10:00:00,Gilgit,9", "2025-05-23T10:00:00,Lahore,30"]
+
+
+def append_from_process(path, worker, count):
+    writer = HistoryWriter(path, batch_rows=7, flush_seconds=60)
+    for i in range(count):
+        writer.submit([row(f"City{worker}", i)])
+    writer.close()
+
+
+def test_concurrent_processes_do_not_lose_rows(tmp_path):
+    path = tmp_path / "history.csv"
+    context = multiprocessing.get_context("spawn")
+    procs = [context.Process(target=append_from_process, args=(path, w, 50)) for w in range(4)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join(60)
+    assert all(proc.exitcode == 0 for proc in procs)
+
+    df = pd.read_csv(path)
+    assert len(df) == 200
+    assert df.groupby("city")["temp"].apply(sorted).tolist() == [list(range(50))] * 4
+
+
+def test_data_handler_reads_its_own_writes(data_dir):
+    payload = {"main": {"temp": 30, "humidity": 40, "pressure": 1000},
+               "weather": [{"main": "Clear"}], "wind": {"speed": 2}, "visibility": 9000}
+    assert DataHandler.log_weather_many([("Lahore", payload), ("Karachi", payload)]) == 2
+    assert list(DataHandler.get_weather_history()["city"]) == ["Lahore", "Karachi"]
+
+    DataHandler.log_weather("Quetta", payload)
+    assert DataHandler.clear_history(days=1) == 3
+    assert len(pd.read_csv(data_dir / "weather_history.csv")) == 3
+
+
+def test_concurrent_save_location_keeps_every_city(data_dir):
+    cities = [f"City {i}" for i in range(40)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(DataHandler.save_location, cities + cities))
+    assert sorted(DataHandler.get_saved_locations()) == sorted(cities)
+
+
+def test_repeated_observation_is_logged_once(data_dir):
+    import src.data_handler as data_handler
+    payload = {"dt": int(time.time()) - 600, "main": {"temp": 30, "humidity": 40, "pressure": 1000},
+               "weather": [{"main": "Clear"}], "wind": {"speed": 2}, "visibility": 9000}
+    assert DataHandler.log_weather_many([("Islamabad", payload), (" islamabad", payload)]) == 1
+    DataHandler.log_weather("ISLAMABAD", payload)
+    assert DataHandler.log_weather_many([("Islamabad", dict(payload, dt=payload["dt"] + 600))]) == 1
+    DataHandler.flush_history()
+    # Another process knows the recent keys from the end of the file
+    data_handler._recent = None
+    assert DataHandler.log_weather_many([("Islamabad", payload)]) == 0
+    assert len(pd.read_csv(data_dir / "weather_history.csv")) == 2
+
+
+def test_imperial_readings_are_stored_in_metric(data_dir):
+    """History is metric like the forecast snapshots it verifies"""
+    payload = {"dt": int(time.time()) - 600, "main": {"temp": 95, "humidity": 40, "pressure": 1000},
+               "weather": [{"main": "Clear"}], "wind": {"speed": 10}, "visibility": 9000}
+    DataHandler.log_weather("Lahore", payload, units="imperial")
+    DataHandler.log_weather_many([("Multan", payload)])
+    df = DataHandler.get_weather_history()
+    assert sorted(df[["city", "temp", "wind_speed"]].values.tolist()) == [["Lahore", 35, 4.47], ["Multan", 95, 10]]
+
+
+def test_cleared_observation_can_be_logged_again(data_dir):
+    payload = {"dt": int(time.time()) - 600, "main": {"temp": 30, "humidity": 40, "pressure": 1000},
+               "weather": [{"main": "Clear"}], "wind": {"speed": 2}, "visibility": 9000}
+    assert DataHandler.log_weather_many([("Islamabad", payload)]) == 1
+    assert DataHandler.clear_history(days=0) == 0
+    assert DataHandler.log_weather_many([("Islamabad", payload)]) == 1
+    DataHandler.flush_history()
+    assert len(pd.read_csv(data_dir / "weather_history.csv")) == 1
+
+
+def test_deduplicate_history_keeps_one_row_per_observation(data_dir):
+    from src.daily_stats import DailyStats
+    (data_dir / "weather_history.csv").write_text(
+        "city,temp,humidity,conditions,timestamp,pressure,wind_speed,visibility\n"
+        "Islamabad,36.02,32,Clear,2025-05-19T19:20:04.722245,,,\n"
+        "Islamabad,36.02,32,Clear,2025-05-19T19:20:12.338939,,,\n"
+        "islamabad,31.58,42,Clear,2025-05-19T23:22:54.989033,1002.0,3.56,10.0\n"
+        "islamabad,88.84,45,Clear,2025-05-19T23:23:32.313671,1002.0,7.96,10.0\n"
+        "islamabad,31.58,42,Clear,2025-05-19T23:23:34.820821,1002.0,3.56,10.0\n"
+        "Delhi,33.98,31,Clear,2025-05-19T23:47:30,1001.0,5.13,10.0\n"
+        "delhi,34.10,31,Clear,2025-05-19T23:47:30,1001.0,5.13,10.0\n"
+        "Delhi,33.98,31,Clear,2025-05-20T00:07:48,1001.0,5.13,10.0\n", encoding="utf-8")
+    assert DataHandler.deduplicate_history() == 3
+    df = pd.read_csv(data_dir / "weather_history.csv")
+    assert df["temp"].tolist() == [36.02, 31.58, 88.84, 33.98, 33.98]
+    assert DailyStats.get("Islamabad", "2025-05-19")["temp"]["count"] == 3
+    assert DataHandler.deduplicate_history() == 0
+
+
+def test_history_with_mixed_timestamp_formats(data_dir):
+    """Older rows carry microseconds, rows stamped from dt do not; both parse"""
+    now = pd.Timestamp.now()
+    (data_dir / "weather_history.csv").write_text(
+        "city,temp,humidity,conditions,pressure,wind_speed,visibility,timestamp\n"
+        f"Lahore,30,40,Clear,1000,2,10,{(now - pd.Timedelta(days=40)).isoformat()}\n"
+        f"Lahore,31,40,Clear,1000,2,10,{(now - pd.Timedelta(hours=2)).isoformat()}\n", encoding="utf-8")
+    payload = {"dt": int(time.time()) - 600, "main": {"temp": 32, "humidity": 40, "pressure": 1000},
+               "weather": [{"main": "Clear"}], "wind": {"speed": 2}, "visibility": 9000}
+    DataHandler.log_weather("Lahore", payload)
+    assert DataHandler.get_weather_history("Lahore")["temp"].tolist() == [31, 32]
+    assert DataHandler.clear_history(30) == 2
+    assert pd.read_csv(data_dir / "weather_history.csv")["temp"].tolist() == [31, 32]
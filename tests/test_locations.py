@@ -0,0 +1,66 @@
+import json
+
+from src.data_handler import DataHandler
+from src.locations import LocationIndex
+
+
+def test_names_are_normalized_and_most_recent_first(tmp_path):
+    index = LocationIndex(tmp_path / "saved.json")
+    assert index.use("Lahore") and index.use("Karachi")
+    assert not index.use("  lahore ")
+    assert index.names() == ["Lahore", "Karachi"]
+    assert "LAHORE" in index and "Quetta" not in index
+    assert index.usage("lahore") == 2 and index.usage("Quetta") == 0
+
+    assert index.remove("karachi") and not index.remove("karachi")
+    assert index.names() == ["Lahore"]
+
+
+def test_older_files_load_without_duplicates(tmp_path):
+    path = tmp_path / "saved.json"
+    path.write_text(json.dumps({"locations": ["Islamabad", "Delhi", "islamabad", "new York"]}))
+    index = LocationIndex(path)
+    assert index.names() == ["new York", "Delhi", "Islamabad"]
+    index.use("Delhi")
+    assert index.names()[0] == "Delhi"
+
+
+def test_journal_is_replayed_and_compacted(tmp_path):
+    path = tmp_path / "saved.json"
+    index = LocationIndex(path, compact_ops=5)
+    for city in ("Lahore", "Karachi", "Lahore", "Quetta"):
+        index.use(city)
+    assert not path.exists()
+    assert len(index.journal.read_text().splitlines()) == 4
+
+    reopened = LocationIndex(path)
+    assert reopened.names() == ["Quetta", "Lahore", "Karachi"]
+    assert reopened.usage("Lahore") == 2
+
+    index.use("Multan")
+    assert index.journal.read_text() == ""
+    snapshot = json.loads(path.read_text())
+    assert snapshot["locations"] == ["Multan", "Quetta", "Lahore", "Karachi"]
+    assert snapshot["usage"]["lahore"][0] == 2
+    assert LocationIndex(path).names() == snapshot["locations"]
+
+
+def test_instances_see_each_others_changes(tmp_path):
+    path = tmp_path / "saved.json"
+    kiosk, poller = LocationIndex(path, compact_ops=3), LocationIndex(path, compact_ops=3)
+    kiosk.use("Lahore")
+    assert "Lahore" in poller
+    poller.use("Karachi")
+    poller.use("Quetta")  # compacts
+    kiosk.use("Gilgit")
+    assert kiosk.names() == poller.names() == ["Gilgit", "Quetta", "Karachi", "Lahore"]
+    assert kiosk.usage("Lahore") == poller.usage("Lahore") == 1
+
+
+def test_data_handler_uses_the_index(data_dir):
+    DataHandler.save_location("Lahore")
+    DataHandler.save_location("Karachi")
+    DataHandler.save_location("LAHORE")
+    assert DataHandler.get_saved_locations() == ["Lahore", "Karachi"]
+    assert DataHandler.remove_location("karachi")
+    assert DataHandler.get_saved_locations() == ["Lahore"]
@@ -0,0 +1,87 @@
+import smtplib
+
+import pytest
+from src.mailer import MailQueue, is_transient, render_report
+
+
+class FakeSMTP:
+    """Records connections and messages; fails the first `fail` sends"""
+    instances = []
+    fail = 0
+
+    def __init__(self, host, port):
+        self.sent = []
+        self.logged_in = False
+        FakeSMTP.instances.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        self.logged_in = True
+
+    def send_message(self, msg):
+        if FakeSMTP.fail:
+            FakeSMTP.fail -= 1
+            raise smtplib.SMTPServerDisconnected("connection lost")
+        self.sent.append(msg)
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def fake_smtp():
+    FakeSMTP.instances = []
+    FakeSMTP.fail = 0
+    return FakeSMTP
+
+
+def payload(name, temp):
+    return {
+        'name': name, 'sys': {'country': 'PK', 'sunrise': 0, 'sunset': 0},
+        'main': {'temp': temp, 'feels_like': temp, 'humidity': 40, 'pressure': 1000},
+        'weather': [{'description': 'clear sky'}], 'wind': {'speed': 2}
+    }
+
+
+def test_messages_share_one_connection(fake_smtp):
+    mailer = MailQueue("localhost", 25, "user", "secret", smtp_factory=fake_smtp)
+    futures = [mailer.send(f"user{i}@example.com", "Report", "<p>hi</p>") for i in range(20)]
+    assert [f.result(timeout=5) for f in futures][0] == "user0@example.com"
+    mailer.close()
+    assert mailer.connects == 1
+    assert len(fake_smtp.instances[0].sent) == 20
+    assert fake_smtp.instances[0].logged_in
+
+
+def test_transient_failure_is_retried(fake_smtp):
+    fake_smtp.fail = 1
+    mailer = MailQueue("localhost", 25, None, None, use_tls=False,
+                       smtp_factory=fake_smtp, retry_delay=0)
+    assert mailer.send("a@example.com", "Report", "x").result(timeout=5) == "a@example.com"
+    mailer.close()
+    assert mailer.connects == 2
+
+
+def test_batch_report_for_many_cities(fake_smtp):
+    mailer = MailQueue("localhost", 25, None, None, use_tls=False, smtp_factory=fake_smtp)
+    recipients = ["a@example.com", "b@example.com"]
+    future = mailer.send_report(recipients, "Daily", lambda: [payload("Lahore", 30), None, payload("Quetta", 12)])
+    assert future.result(timeout=5) == recipients
+    mailer.close()
+    body = fake_smtp.instances[0].sent[0].get_payload()[0].get_payload(decode=True).decode()
+    assert "Lahore" in body and "Quetta" in body
+
+
+def test_render_report_tolerates_missing_fields():
+    html = render_report([{'name': 'Gilgit'}], unit="imperial")
+    assert "Weather Report for Gilgit" in html
+    assert "N/A°F" in html
+
+
+def test_permanent_errors_are_not_transient():
+    assert is_transient(smtplib.SMTPServerDisconnected())
+    assert is_transient(smtplib.SMTPResponseException(421, b"busy"))
+    assert not is_transient(smtplib.SMTPResponseException(550, b"no such user"))
+    assert not is_transient(smtplib.SMTPRecipientsRefused({}))
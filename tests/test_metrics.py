@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+from src.metrics import Registry
+
+
+def test_render_prometheus_text():
+    registry = Registry()
+    calls = registry.counter("api_calls_total", "API calls", ["endpoint"])
+    calls.inc(endpoint="weather")
+    calls.inc(2, endpoint="weather")
+    registry.gauge("queue_depth", "Pending jobs", callback=lambda: 4)
+    latency = registry.histogram("fetch_seconds", "Fetch time", ["endpoint"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 3):
+        latency.observe(value, endpoint='say "hi"')
+
+    text = registry.render()
+    assert '# TYPE api_calls_total counter\napi_calls_total{endpoint="weather"} 3\n' in text
+    assert "queue_depth 4\n" in text
+    assert 'fetch_seconds_bucket{endpoint="say \\"hi\\"",le="0.1"} 1\n' in text
+    assert 'fetch_seconds_bucket{endpoint="say \\"hi\\"",le="1"} 2\n' in text
+    assert 'fetch_seconds_bucket{endpoint="say \\"hi\\"",le="+Inf"} 3\n' in text
+    assert 'fetch_seconds_count{endpoint="say \\"hi\\""} 3\n' in text
+
+
+def test_timers_and_quantiles():
+    registry = Registry()
+    hist = registry.histogram("step_seconds", "Steps", ["step"], buckets=(0.01, 0.1, 1.0))
+
+    @hist.timed(step="decorated")
+    def work():
+        time.sleep(0.02)
+        return 42
+
+    assert work() == 42
+    with hist.time(step="block"):
+        pass
+    assert hist.stats(step="decorated").count == 1
+    assert 0.01 < hist.quantile(0.5, ("decorated",)) <= 0.1
+    assert hist.stats(step="block").counts[0] == 1
+    rows = {r["labels"]: r for r in registry.rows()}
+    assert rows["step=decorated"]["count"] == 1
+
+
+def test_rows_while_other_threads_add_label_sets():
+    registry = Registry()
+    calls = registry.counter("calls_total", "Calls", ["key"])
+    hist = registry.histogram("work_seconds", "Work", ["key"])
+
+    def add():
+        for i in range(2000):
+            calls.inc(key=str(i))
+            hist.observe(0.01, key=str(i))
+
+    worker = threading.Thread(target=add)
+    worker.start()
+    while worker.is_alive():
+        registry.rows()
+    worker.join()
+    assert len(registry.rows()) == 4000
+
+
+def test_disabled_registry_records_nothing():
+    registry = Registry(enabled=False)
+    calls = registry.counter("calls_total", "Calls")
+    hist = registry.histogram("work_seconds", "Work")
+    calls.inc()
+    hist.observe(1.0)
+    with hist.time():
+        pass
+    assert hist.time() is registry.timer("other_seconds")
+    assert registry.render() == "\n"
+
+
+def test_kind_conflict_is_rejected():
+    registry = Registry()
+    registry.counter("thing", "A counter")
+    with pytest.raises(ValueError):
+        registry.histogram("thing", "Not a counter")
+
+
+def test_instrumented_modules_record(data_dir):
+    from src import metrics
+    from src.data_handler import STORAGE_SECONDS, DataHandler
+
+    before = STORAGE_SECONDS.stats(op="get_saved_locations")
+    before = before.count if before else 0
+    DataHandler.get_saved_locations()
+    assert STORAGE_SECONDS.stats(op="get_saved_locations").count == before + 1
+    assert "data_handler_seconds_bucket" in metrics.render()
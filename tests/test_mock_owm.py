@@ -0,0 +1,21 @@
+from benchmarks.mock_owm import MockOWM, coordinates, use_api_root
+from src.weather_api import WeatherAPI
+
+
+def test_weather_api_against_mock(data_dir, mock_api):
+    with MockOWM(rate_limit=4) as mock:
+        use_api_root(mock.root)
+        weather = WeatherAPI.get_weather("Lahore")
+        assert weather["name"] == "Lahore" and weather["cod"] == 200
+        # Bundled cities are geocoded offline; others still ask the API
+        requests = mock.stats["requests"]
+        assert WeatherAPI.get_coordinates("Lahore")["country"] == "PK"
+        assert mock.stats["requests"] == requests
+        coords = WeatherAPI.get_coordinates("Mockville")
+        assert (coords["lat"], coords["lon"]) == coordinates("Mockville")
+        assert len(WeatherAPI.get_forecast("Lahore", days=2)["list"]) == 16
+        # Unknown city, then throttled: both come back as None
+        assert WeatherAPI.get_weather("Nowhere Town") is None
+        assert WeatherAPI.get_air_quality(31.5, 74.3) is None
+    assert mock.stats["throttled"] == 1
+    assert mock.stats["not_found"] == 1
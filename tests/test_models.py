@@ -0,0 +1,61 @@
+import time
+from datetime import datetime
+
+import numpy as np
+
+from src.alerts import AlertEngine
+from src.data_handler import DataHandler
+from src.models import Observation, ObservationBatch
+
+
+def payload(name, temp, wind=3.0, **extra):
+    data = {"name": name, "dt": 1716451200, "timezone": 18000, "coord": {"lat": 31.5, "lon": 74.3},
+            "main": {"temp": temp, "humidity": 40, "pressure": 1002},
+            "weather": [{"main": "Clear", "description": "clear sky", "icon": "01d"}],
+            "wind": {"speed": wind}, "visibility": 8000, "sys": {"country": "PK", "sunrise": 1716424500}}
+    data.update(extra)
+    return data
+
+
+def test_payload_is_parsed_into_slots():
+    obs = Observation.from_payload(payload("Lahore", 36.5), city="lahore")
+    assert (obs.city, obs.name, obs.country, obs.temp, obs.condition) == ("lahore", "Lahore", "PK", 36.5, "Clear")
+    assert obs.visibility_km == 8.0 and obs.wind_gust is None
+    assert not hasattr(obs, "__dict__")
+
+    sparse = Observation.from_payload({"name": "Gilgit", "main": {"temp": 9}})
+    assert (sparse.pressure, sparse.wind_speed, sparse.icon) == (None, None, "")
+
+
+def test_batch_columns_and_rows():
+    batch = ObservationBatch.from_payloads(
+        [payload("Lahore", 36), {"name": "Broken"}, payload("Quetta", 4.5, wind=None, visibility=None)],
+        ["Lahore", "Broken", "Quetta"])
+    assert len(batch) == 2
+    assert batch.column("temp").dtype == np.float64 and np.isnan(batch.column("wind_speed")[1])
+    assert batch.value(0, "temp") == 36 and batch.value(1, "wind_speed") is None
+    assert batch[1].city == "Quetta" and batch[1].temp == 4.5
+
+    rows = batch.history_rows("2025-05-23T10:00:00")
+    assert rows[0] == {"city": "Lahore", "temp": 36, "humidity": 40, "conditions": "Clear", "pressure": 1002,
+                       "wind_speed": 3, "visibility": 8, "timestamp": "2025-05-23T10:00:00"}
+    assert rows[1]["wind_speed"] is None and rows[1]["visibility"] is None
+
+
+def test_alerts_read_batch_columns():
+    batch = ObservationBatch.from_payloads([payload("Lahore", 36), payload("Quetta", 4.5, wind=12)])
+    assert AlertEngine.default().evaluate(batch) == [
+        ["High temperature warning: 36°C"], ["Low temperature warning: 4.5°C", "High wind warning: 12 m/s"]]
+
+
+def test_history_keeps_pressure_and_wind(data_dir):
+    dt = int(time.time()) - 600
+    assert DataHandler.log_weather("Lahore", Observation.from_payload(payload("Lahore", 30, dt=dt))) is None
+    DataHandler.log_weather_many(ObservationBatch.from_payloads([payload("Karachi", 31, dt=dt)], ["Karachi"]))
+    df = DataHandler.get_weather_history()
+    assert list(df["city"]) == ["Lahore", "Karachi"]
+    # Stamped with the observation time, not the time it was logged
+    assert (df["timestamp"] == datetime.fromtimestamp(dt)).all()
+    assert df["pressure"].tolist() == [1002, 1002] and df["wind_speed"].tolist() == [3, 3]
+    assert not df[["temp", "humidity", "pressure", "wind_speed", "visibility"]].isna().any().any()
+    assert DataHandler.log_weather_many([("Gilgit", {"name": "Gilgit"})]) == 0
@@ -0,0 +1,59 @@
+import tracemalloc
+
+from src import cli
+from src.profiling import ActionProfiler
+from src.weather_api import WeatherAPI
+
+retained = []
+
+
+def leaky_render():
+    retained.append(bytearray(256 * 1024))
+
+
+def forecast():
+    return sum(i * i for i in range(20000))
+
+
+def test_actions_write_profiles_and_flag_growing_gauges(tmp_path):
+    retained.clear()
+    profiler = ActionProfiler(tmp_path, gauges={"retained": lambda: len(retained)})
+    try:
+        nested = profiler.wrap("forecast", forecast)
+        for _ in range(3):
+            with profiler.action("search"):
+                leaky_render()
+                nested()
+    finally:
+        profiler.close()
+    assert not tracemalloc.is_tracing()
+
+    names = sorted(p.name for p in tmp_path.iterdir())
+    assert "summary.txt" in names
+    assert "001_forecast.prof" in names and "002_search.prof" in names
+    assert len([n for n in names if n.endswith("_alloc.txt")]) == 6
+
+    search_stats, forecast_stats = profiler.actions["search"], profiler.actions["forecast"]
+    assert search_stats.calls == forecast_stats.calls == 3
+    # The nested action pauses the outer profile
+    assert not any(func[2] == "<genexpr>" for func in search_stats.stats.stats)
+    assert any(func[2] == "<genexpr>" for func in forecast_stats.stats.stats)
+    assert search_stats.gauges["retained"] == [1, 2, 3]
+
+    summary = (tmp_path / "summary.txt").read_text()
+    assert "=== search: 3 calls" in summary
+    assert "retained after each call: [1, 2, 3]  <-- keeps growing" in summary
+    assert "test_profiling.py:11" in summary
+    retained.clear()
+
+
+def test_cli_profile_option(data_dir, monkeypatch, tmp_path, capsys):
+    monkeypatch.setattr(WeatherAPI, "get_weather", staticmethod(
+        lambda city, units="metric", priority=None, cache=True: {
+            'cod': 200, 'name': city, 'dt': 1700000000,
+            'main': {'temp': 20, 'humidity': 30, 'pressure': 1000},
+            'weather': [{'main': 'Clear'}], 'wind': {'speed': 3}, 'visibility': 10000}))
+    assert cli.main(["--profile", str(tmp_path / "prof"), "poll", "Lahore"]) == 0
+    assert (tmp_path / "prof" / "001_poll.prof").exists()
+    assert "=== poll: 1 calls" in (tmp_path / "prof" / "summary.txt").read_text()
+    assert "Profile summary" in capsys.readouterr().err
@@ -0,0 +1,63 @@
+import threading
+import time
+
+from src.quota import BACKFILL, INTERACTIVE, SCHEDULED, QuotaManager, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_refills_over_time():
+    clock = FakeClock()
+    bucket = TokenBucket("minute", 60, 60, clock)
+    for _ in range(60):
+        assert bucket.try_take()
+    assert not bucket.try_take()
+    assert bucket.wait_time() == 1.0
+    clock.now += 2
+    assert bucket.try_take() and bucket.try_take()
+    assert not bucket.try_take()
+
+
+def test_background_cannot_drain_interactive_reserve():
+    quota = QuotaManager([("minute", 10, 60)], usage_path=None)
+    granted = 0
+    while quota.acquire(BACKFILL, timeout=0):
+        granted += 1
+    assert granted == 7  # 30% kept back from backfill
+    assert quota.acquire(SCHEDULED, timeout=0) and quota.acquire(SCHEDULED, timeout=0)
+    assert not quota.acquire(SCHEDULED, timeout=0)
+    assert quota.acquire(INTERACTIVE, timeout=0)
+    assert quota.usage_today() == {"backfill": 7, "scheduled": 2, "interactive": 1}
+
+
+def test_interactive_jumps_the_queue():
+    """A waiting interactive call is served before earlier background waiters"""
+    quota = QuotaManager([("second", 1, 0.2)], usage_path=None)
+    assert quota.acquire(INTERACTIVE, timeout=0)
+    order = []
+    background = threading.Thread(target=lambda: quota.acquire(BACKFILL, 5) and order.append("backfill"))
+    background.start()
+    time.sleep(0.02)
+    assert quota.acquire(INTERACTIVE, timeout=5)
+    order.append("interactive")
+    background.join()
+    assert order == ["interactive", "backfill"]
+
+
+def test_daily_usage_persists(tmp_path):
+    clock = FakeClock()
+    path = tmp_path / "usage.json"
+    quota = QuotaManager([("day", 100, 86400)], usage_path=path, clock=clock)
+    for _ in range(5):
+        quota.acquire(SCHEDULED, timeout=0)
+    quota.save()
+
+    restarted = QuotaManager([("day", 100, 86400)], usage_path=path, clock=clock)
+    assert restarted.remaining() == {"day": 95}
+    assert restarted.usage_today() == {"scheduled": 5}
@@ -0,0 +1,86 @@
+import random
+import time
+
+from src.data_handler import DataHandler
+from src.scheduler import PollScheduler
+
+
+class FakeClock:
+    def __init__(self, now=None):
+        # Recent, since history rows are stamped with the observation time
+        self.now = now if now is not None else float(int(time.time()))
+
+    def __call__(self):
+        return self.now
+
+
+class FakeService:
+    """Returns a fixed observation time per city, or None for failures"""
+    def __init__(self, clock):
+        self.clock = clock
+        self.dt = {}
+        self.calls = []
+
+    def current(self, city, units="metric", priority=None, cache=True):
+        assert not cache
+        self.calls.append(city)
+        dt = self.dt.get(city)
+        if dt is None:
+            return None
+        return {'cod': 200, 'dt': dt, 'main': {'temp': 20, 'humidity': 40, 'pressure': 1000},
+                'weather': [{'main': 'Clear'}], 'wind': {'speed': 2}}
+
+
+def make_scheduler(data_dir, cities):
+    clock = FakeClock()
+    service = FakeService(clock)
+    scheduler = PollScheduler(service, cities=lambda: cities, jitter=0,
+                              clock=clock, rng=random.Random(0))
+    scheduler.sync()
+    return scheduler, service, clock
+
+
+def test_next_poll_waits_for_new_observation(data_dir):
+    scheduler, service, clock = make_scheduler(data_dir, ["Lahore"])
+    service.dt["Lahore"] = clock.now - 100
+    clock.now += scheduler.min_interval
+    assert scheduler.run_pending()[0]["outcome"] == "updated"
+
+    # Next poll is planned after the expected publish time, not immediately
+    state = scheduler.states["lahore"]
+    assert state.due >= service.dt["Lahore"] + scheduler.interval
+    clock.now += 60
+    assert scheduler.run_pending() == []
+    assert len(DataHandler.get_weather_history("Lahore")) == 1
+
+
+def test_unchanged_observation_is_not_logged(data_dir):
+    scheduler, service, clock = make_scheduler(data_dir, ["Multan"])
+    service.dt["Multan"] = clock.now
+    clock.now += scheduler.min_interval
+    scheduler.run_pending()
+    clock.now = scheduler.states["multan"].due
+    assert scheduler.run_pending()[0]["outcome"] == "unchanged"
+    assert len(DataHandler.get_weather_history("Multan")) == 1
+
+
+def test_failing_city_backs_off(data_dir):
+    scheduler, service, clock = make_scheduler(data_dir, ["Atlantis"])
+    delays = []
+    for _ in range(4):
+        clock.now = scheduler.states["atlantis"].due
+        event = scheduler.run_pending()[0]
+        assert event["outcome"] == "failed"
+        delays.append(event["next_in"])
+    assert delays == sorted(delays) and delays[-1] > delays[0] * 4
+    assert max(delays) <= scheduler.max_backoff
+
+
+def test_sync_drops_removed_cities(data_dir):
+    cities = ["Lahore", "Quetta"]
+    scheduler, service, clock = make_scheduler(data_dir, cities)
+    cities.remove("Quetta")
+    scheduler.sync()
+    clock.now += scheduler.min_interval * 2
+    scheduler.run_pending()
+    assert service.calls == ["Lahore"]
@@ -0,0 +1,164 @@
+import asyncio
+import gzip
+import http.client
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.data_handler import DataHandler
+from src.server import WeatherServer
+from src.weather_api import WeatherAPI
+
+
+class SlowService:
+    """Stands in for WeatherService, counting upstream calls"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+
+    def current(self, city, units="metric", priority=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        if city == "Atlantis":
+            return None
+        return {'cod': 200, 'name': city, 'dt': 1700000000, 'main': {'temp': 21},
+                'weather': [{'main': 'Clear', 'description': 'clear sky ' * 60}]}
+
+    def forecast(self, city, units="metric", priority=None):
+        return None
+
+
+@pytest.fixture
+def server(data_dir):
+    loop = asyncio.new_event_loop()
+    service = SlowService()
+    srv = WeatherServer(service, host="127.0.0.1", port=0)
+    loop.run_until_complete(srv.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield srv
+    asyncio.run_coroutine_threadsafe(srv.close(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+
+
+def get(srv, path, headers=None, conn=None):
+    conn = conn or http.client.HTTPConnection(srv.host, srv.port, timeout=5)
+    conn.request("GET", path, headers=headers or {})
+    response = conn.getresponse()
+    return response, response.read()
+
+
+def test_concurrent_requests_share_one_upstream_fetch(server):
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda _: get(server, "/weather?city=Lahore"), range(32)))
+    assert all(r.status == 200 for r, _ in results)
+    assert {json.loads(body)["name"] for _, body in results} == {"Lahore"}
+    assert server.service.calls == 1
+    # City names are normalized, so a different spelling hits the same entry
+    get(server, "/weather?city=%20lahore")
+    assert server.service.calls == 1
+
+
+def test_etag_gzip_and_keep_alive(server):
+    conn = http.client.HTTPConnection(server.host, server.port, timeout=5)
+    first, body = get(server, "/weather?city=Lahore", {"Accept-Encoding": "gzip"}, conn)
+    assert first.getheader("Content-Encoding") == "gzip"
+    payload = json.loads(gzip.decompress(body))
+    etag = first.getheader("ETag")
+
+    second, body = get(server, "/weather?city=Lahore", {"If-None-Match": etag}, conn)
+    assert second.status == 304 and body == b""
+    plain, body = get(server, "/weather?city=Lahore", conn=conn)
+    assert plain.getheader("Content-Encoding") is None
+    assert json.loads(body) == payload
+
+
+def test_errors_are_json(server):
+    response, body = get(server, "/weather")
+    assert response.status == 400 and "error" in json.loads(body)
+    assert get(server, "/nowhere")[0].status == 404
+    assert get(server, "/weather?city=Atlantis")[0].status == 502
+    # Failures are not cached
+    get(server, "/weather?city=Atlantis")
+    assert server.service.calls == 2
+
+
+def test_history_endpoint(server):
+    DataHandler.log_weather_many([
+        ("Lahore", {'main': {'temp': 30, 'humidity': 40, 'pressure': 1000},
+                    'weather': [{'main': 'Clear'}], 'wind': {'speed': 2}, 'visibility': 9000}),
+    ])
+    response, body = get(server, "/history?city=Lahore&days=7")
+    rows = json.loads(body)["rows"]
+    assert response.status == 200
+    assert [(r["city"], r["temp"]) for r in rows] == [("Lahore", 30)]
+    # History matches the city exactly, so another spelling is not served the cached rows
+    assert json.loads(get(server, "/history?city=lahore&days=7")[1])["rows"] == []
+
+
+def test_history_empty_cells_are_null(server):
+    DataHandler.log_weather_many([
+        ("Quetta", {'main': {'temp': 12, 'humidity': 40}, 'weather': [{'main': 'Clear'}], 'wind': {}}),
+    ])
+    response, body = get(server, "/history?city=Quetta&days=7")
+    assert response.status == 200
+
+    def reject(token):
+        raise ValueError(f"non-standard JSON token {token}")
+    row, = json.loads(body, parse_constant=reject)["rows"]
+    assert (row["temp"], row["pressure"], row["wind_speed"], row["visibility"]) == (12, None, None, None)
+
+
+def test_response_cache_is_bounded(server, monkeypatch):
+    import src.server as server_module
+    monkeypatch.setattr(server_module, "SERVER_CACHE_MAX_ENTRIES", 3)
+    for days in range(1, 6):
+        assert get(server, f"/history?city=Lahore&days={days}")[0].status == 200
+    assert [key[2] for key in server._entries] == [3, 4, 5]
+
+
+def test_weather_api_cache_is_single_flight(data_dir, monkeypatch):
+    calls = []
+
+    def slow_fetch(url, params, timeout, priority):
+        calls.append(params["q"])
+        time.sleep(0.05)
+        return {"cod": 200, "name": params["q"]}
+
+    monkeypatch.setattr(WeatherAPI, "_fetch", staticmethod(slow_fetch))
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: WeatherAPI.get_weather("Lahore"), range(8)))
+    assert all(r == {"cod": 200, "name": "Lahore"} for r in results)
+    assert calls == ["Lahore"]
+    WeatherAPI.get_weather("Lahore", units="imperial")
+    assert calls == ["Lahore", "Lahore"]
+    # The scheduler asks past the cache
+    WeatherAPI.get_weather("Lahore", cache=False)
+    assert calls == ["Lahore", "Lahore", "Lahore"]
+
+
+def test_weather_api_cache_is_bounded(data_dir, monkeypatch):
+    import src.weather_api as weather_api
+    monkeypatch.setattr(weather_api, "API_CACHE_MAX_ENTRIES", 3)
+    monkeypatch.setattr(WeatherAPI, "_fetch", staticmethod(lambda url, params, timeout, priority: {"q": params["q"]}))
+    WeatherAPI._request("url", {"q": "expired"}, ttl=0.01)
+    time.sleep(0.02)
+    for city in ("a", "b", "c"):
+        WeatherAPI._request("url", {"q": city}, ttl=60)
+    # The expired entry goes first, then the oldest live one
+    assert [dict(key[1])["q"] for key in WeatherAPI._cache] == ["a", "b", "c"]
+    WeatherAPI._request("url", {"q": "d"}, ttl=60)
+    assert [dict(key[1])["q"] for key in WeatherAPI._cache] == ["b", "c", "d"]
+
+
+def test_metrics_endpoint(server):
+    get(server, "/weather?city=Lahore")
+    response, body = get(server, "/metrics")
+    assert response.getheader("Content-Type").startswith("text/plain")
+    assert 'http_requests_total{path="/weather",status="200"}' in body.decode()
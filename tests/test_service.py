@@ -0,0 +1,9 @@
+from src.service import percentile
+
+
+def test_percentile_is_nearest_rank():
+    assert percentile(range(1, 11), 50) == 5
+    assert percentile(range(1, 21), 95) == 19
+    assert percentile(range(1, 21), 100) == 20
+    assert percentile([3.0, 1.0, 2.0], 0) == 1.0
+    assert percentile([], 95) == 0.0
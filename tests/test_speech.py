@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+from src.speech import SpeechCache, SpeechService
+
+
+class FakePlayer:
+    def __init__(self, duration=0.0):
+        self.duration = duration
+        self.played = []
+        self.stopped = 0
+        self.until = 0
+
+    def play(self, path):
+        self.played.append(path)
+        self.until = time.monotonic() + self.duration
+
+    def busy(self):
+        return time.monotonic() < self.until
+
+    def stop(self):
+        self.stopped += 1
+        self.until = 0
+
+
+def wait_idle(service, timeout=5):
+    deadline = time.monotonic() + timeout
+    while service.is_speaking and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_repeat_announcement_uses_cache(tmp_path):
+    """Same text, language and speed is only synthesized once"""
+    calls = []
+
+    def synthesize(text, lang, slow, path):
+        calls.append(text)
+        path.write_bytes(b"mp3" * 10)
+
+    player = FakePlayer()
+    service = SpeechService(SpeechCache(tmp_path), synthesize, player)
+    service.speak("Sunny in Lahore")
+    wait_idle(service)
+    service.speak("Sunny in Lahore")
+    wait_idle(service)
+    service.speak("Sunny in Lahore", slow=True)
+    wait_idle(service)
+    assert calls == ["Sunny in Lahore", "Sunny in Lahore"]
+    assert len(player.played) == 3
+
+
+def test_speak_does_not_block(tmp_path):
+    release = threading.Event()
+
+    def synthesize(text, lang, slow, path):
+        release.wait(5)
+        path.write_bytes(b"x")
+
+    service = SpeechService(SpeechCache(tmp_path), synthesize, FakePlayer())
+    start = time.monotonic()
+    service.speak("Rain expected")
+    assert time.monotonic() - start < 0.1
+    assert service.is_speaking
+    release.set()
+    wait_idle(service)
+    assert not service.is_speaking
+
+
+def test_stop_interrupts_playback(tmp_path):
+    player = FakePlayer(duration=10)
+    service = SpeechService(SpeechCache(tmp_path), lambda t, l, s, p: p.write_bytes(b"x"), player)
+    service.speak("first")
+    service.speak("second")
+    while not player.played:
+        time.sleep(0.01)
+    service.stop()
+    wait_idle(service)
+    assert player.stopped == 1
+    assert len(player.played) == 1
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = SpeechCache(tmp_path, max_bytes=25)
+    for key in ("a", "b"):
+        cache.put(key, lambda p: p.write_bytes(b"x" * 10))
+    assert cache.get("a") is not None
+    cache.put("c", lambda p: p.write_bytes(b"x" * 10))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_failed_render_leaves_no_partial_file(tmp_path):
+    cache = SpeechCache(tmp_path)
+
+    def render(path):
+        path.write_bytes(b"half")
+        raise OSError("synthesis failed")
+
+    with pytest.raises(OSError):
+        cache.put("a", render)
+    assert list(tmp_path.iterdir()) == []
+    assert cache.get("a") is None
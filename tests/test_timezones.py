@@ -0,0 +1,50 @@
+import json
+import time
+
+from src.mailer import render_report
+from src.timezones import TimezoneService
+
+SUNRISE = 1716424500  # 2024-05-23 00:35 UTC
+
+
+class StubFinder:
+    """Stands in for timezonefinder.TimezoneFinder, an optional dependency"""
+
+    def __init__(self):
+        self.lookups = []
+
+    def timezone_at(self, lng, lat):
+        self.lookups.append((lat, lng))
+        return "America/New_York"
+
+
+def test_payload_offset_is_used_without_a_lookup(tmp_path):
+    service = TimezoneService(tmp_path / "tz.json")
+    data = {"timezone": 18000, "coord": {"lat": 31.52, "lon": 74.36}}
+    assert service.local_time(SUNRISE, data) == "05:35"
+    assert service.local_time(SUNRISE, {"timezone": -14400}) == "20:35"
+    assert service._finder is None and not (tmp_path / "tz.json").exists()
+
+
+def test_coordinates_are_resolved_once_and_persisted(tmp_path):
+    path = tmp_path / "tz.json"
+    service = TimezoneService(path)
+    service._finder = finder = StubFinder()
+    data = {"coord": {"lat": 40.7128, "lon": -74.006}}
+    assert service.local_time(SUNRISE, data) == "20:35"  # EDT
+    assert service.local_time(SUNRISE + 60, data) == "20:36"
+    assert finder.lookups == [(40.7128, -74.006)]
+    assert json.loads(path.read_text()) == {"40.71,-74.01": "America/New_York"}
+
+    # A new process reads the memo instead of initializing timezonefinder
+    reopened = TimezoneService(path)
+    start = time.perf_counter()
+    assert reopened.local_time(SUNRISE, {"coord": {"lat": 40.714, "lon": -74.0061}}) == "20:35"
+    assert reopened._finder is None and time.perf_counter() - start < 0.05
+
+
+def test_email_report_uses_city_time(data_dir):
+    payload = {"name": "Lahore", "timezone": 18000, "weather": [{"description": "clear sky"}],
+               "main": {"temp": 30}, "sys": {"country": "PK", "sunrise": SUNRISE, "sunset": SUNRISE + 50400}}
+    html = render_report([payload])
+    assert "<strong>Sunrise:</strong> 05:35" in html and "<strong>Sunset:</strong> 19:35" in html
@@ -0,0 +1,85 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src import tracing
+from src.tracing import Tracer
+
+
+def test_unsampled_roots_record_nothing():
+    tracer = Tracer(sample_rate=0.5, rng=lambda: 0.9)
+    with tracer.trace("search") as root:
+        with tracer.span("fetch") as child:
+            child.set(status=200)
+        # Nested roots join the unsampled trace instead of drawing again
+        assert tracer.trace("inner", force=True) is tracing.NULL_SPAN
+    assert root.trace_id is None and child is tracing.NULL_SPAN
+    assert list(tracer.spans) == []
+    assert tracer.span("outside") is tracing.NULL_SPAN
+
+
+def test_spans_nest_under_the_sampled_root():
+    tracer = Tracer(sample_rate=0.5, rng=lambda: 0.1)
+    with tracer.trace("search", city="Lahore") as root:
+        with tracer.span("fetch"):
+            with tracer.span("parse"):
+                assert tracing.current_trace_id() == root.trace_id
+    assert tracing.current_trace_id() is None
+
+    spans = {s.name: s for s in tracer.spans}
+    assert list(spans) == ["parse", "fetch", "search"]
+    assert {s.trace_id for s in spans.values()} == {root.trace_id}
+    assert spans["parse"].parent is spans["fetch"] and spans["fetch"].parent is root
+    assert spans["search"].end_ns >= spans["fetch"].end_ns >= spans["parse"].end_ns
+
+
+def test_wrap_carries_the_trace_across_threads():
+    tracer = Tracer(sample_rate=0)
+
+    def work(n):
+        with tracer.span("fetch", n=n):
+            return threading.current_thread().name
+
+    with tracer.trace("poll", force=True) as root:
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="worker") as pool:
+            names = list(pool.map(tracing.wrap(work), range(4)))
+    assert all(name.startswith("worker") for name in names)
+
+    fetches = [s for s in tracer.spans if s.name == "fetch"]
+    assert len(fetches) == 4
+    assert all(s.parent is root and s.trace_id == root.trace_id for s in fetches)
+
+    events = tracer.chrome_trace()["traceEvents"]
+    flows = [e for e in events if e["ph"] in ("s", "f")]
+    assert len(flows) == 8
+    assert {e["args"]["name"] for e in events if e["ph"] == "M"} >= {threading.current_thread().name}
+
+
+def test_finish_later_and_export(tmp_path):
+    tracer = Tracer(sample_rate=1.0)
+    with tracer.trace("search") as root:
+        root.finish_later()
+        paint = tracer.start_span("paint")
+    assert list(tracer.spans) == []
+    paint.finish()
+    root.finish()
+    with tracer.trace("other"):
+        pass
+
+    path = tracer.export(tmp_path / "traces" / "trace.json", trace_id=root.trace_id)
+    events = json.loads(path.read_text())["traceEvents"]
+    complete = {e["name"]: e for e in events if e["ph"] == "X"}
+    assert set(complete) == {"search", "paint"}
+    assert complete["paint"]["args"]["parent_id"] == complete["search"]["args"]["span_id"]
+    assert complete["search"]["dur"] >= complete["paint"]["dur"] >= 0
+    assert tracer.trace_ids() == [root.trace_id, tracer.spans[-1].trace_id]
+
+
+def test_errors_are_recorded_on_the_span():
+    tracer = Tracer(sample_rate=1.0)
+    try:
+        with tracer.trace("search"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    assert tracer.spans[0].attrs["error"] == "ValueError"
@@ -0,0 +1,61 @@
+import json
+import time
+
+from src.watchdog import StallWatchdog
+
+
+class FakeLoop:
+    """Runs after() callbacks on the calling thread, like Tk's mainloop"""
+
+    def __init__(self):
+        self.pending = []
+
+    def after(self, ms, callback):
+        self.pending.append((time.monotonic() + ms / 1000, callback))
+
+    def run(self, seconds):
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            due = [p for p in self.pending if p[0] <= time.monotonic()]
+            for entry in due:
+                self.pending.remove(entry)
+                entry[1]()
+            time.sleep(0.005)
+
+
+def blocking_call(seconds):
+    time.sleep(seconds)
+
+
+def test_stall_is_attributed_to_the_blocking_call(tmp_path):
+    loop = FakeLoop()
+    watchdog = StallWatchdog(interval=0.02, threshold=0.1, log_file=tmp_path / "stalls.log")
+    watchdog.start(loop.after)
+    try:
+        loop.run(0.15)
+        blocking_call(0.4)
+        loop.run(0.1)
+    finally:
+        watchdog.stop()
+
+    report = watchdog.report()
+    assert len(report) == 1
+    assert "test_watchdog.py" in report[0]["site"] and report[0]["site"].endswith("in blocking_call")
+    assert report[0]["count"] == 1 and 0.3 < report[0]["worst"] < 1.0
+    assert any("test_stall_is_attributed" in line for line in report[0]["stack"])
+
+    logged = [json.loads(line) for line in (tmp_path / "stalls.log").read_text().splitlines()]
+    assert [entry["site"] for entry in logged] == [report[0]["site"]]
+
+
+def test_responsive_loop_records_nothing(tmp_path):
+    loop = FakeLoop()
+    watchdog = StallWatchdog(interval=0.02, threshold=0.1, log_file=tmp_path / "stalls.log")
+    watchdog.start(loop.after)
+    try:
+        loop.run(0.3)
+    finally:
+        watchdog.stop()
+    assert watchdog.report() == []
+    assert watchdog.current_lag() < 0.1
+    assert not (tmp_path / "stalls.log").exists()